@@ -1,84 +1,453 @@
+import os
 import cv2
+import glob
+import time
+import queue
+import argparse
+import threading
 import numpy as np
 import utlis
- 
- 
+
+
 ########################################################################
 webCamFeed = True
 pathImage = "1.jpg"
-cap = cv2.VideoCapture(0)
-cap.set(10,160)
 heightImg = 640
 widthImg  = 480
+DEFAULT_THRESHOLDS = (200, 200)  # Same as the initial trackbar values
 ########################################################################
- 
-utlis.initializeTrackbars()
-count=0
- 
-while True:
- 
-    if webCamFeed:success, img = cap.read()
-    else:img = cv2.imread(pathImage)
-    img = cv2.resize(img, (widthImg, heightImg)) # RESIZE IMAGE
-    imgBlank = np.zeros((heightImg,widthImg, 3), np.uint8) # CREATE A BLANK IMAGE FOR TESTING DEBUGING IF REQUIRED
-    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) # CONVERT IMAGE TO GRAY SCALE
+
+# LABELS FOR DISPLAY
+labels = [["Original","Gray","Threshold","Contours"],
+          ["Biggest Contour","Warp Perspective","Warp Gray","Adaptive Threshold"]]
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def find_page(imgGray, thres):
+    """Full search: blur -> Canny -> dilate/erode -> biggest 4-corner contour. Returns (corners or None, edges, contours)."""
     imgBlur = cv2.GaussianBlur(imgGray, (5, 5), 1) # ADD GAUSSIAN BLUR
-    thres=utlis.valTrackbars() # GET TRACK BAR VALUES FOR THRESHOLDS
     imgThreshold = cv2.Canny(imgBlur,thres[0],thres[1]) # APPLY CANNY BLUR
     kernel = np.ones((5, 5))
     imgDial = cv2.dilate(imgThreshold, kernel, iterations=2) # APPLY DILATION
     imgThreshold = cv2.erode(imgDial, kernel, iterations=1)  # APPLY EROSION
- 
+
     ## FIND ALL COUNTOURS
-    imgContours = img.copy() # COPY IMAGE FOR DISPLAY PURPOSES
-    imgBigContour = img.copy() # COPY IMAGE FOR DISPLAY PURPOSES
     contours, hierarchy = cv2.findContours(imgThreshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE) # FIND ALL CONTOURS
-    cv2.drawContours(imgContours, contours, -1, (0, 255, 0), 10) # DRAW ALL DETECTED CONTOURS
- 
- 
+
     # FIND THE BIGGEST COUNTOUR
     biggest, maxArea = utlis.biggestContour(contours) # FIND THE BIGGEST CONTOUR
-    if biggest.size != 0:
-        biggest=utlis.reorder(biggest)
-        cv2.drawContours(imgBigContour, biggest, -1, (0, 255, 0), 20) # DRAW THE BIGGEST CONTOUR
-        imgBigContour = utlis.drawRectangle(imgBigContour,biggest,2)
-        pts1 = np.float32(biggest) # PREPARE POINTS FOR WARP
-        pts2 = np.float32([[0, 0],[widthImg, 0], [0, heightImg],[widthImg, heightImg]]) # PREPARE POINTS FOR WARP
-        matrix = cv2.getPerspectiveTransform(pts1, pts2)
+    if biggest.size == 0:
+        return None, imgThreshold, contours
+    return utlis.reorder(biggest), imgThreshold, contours
+
+
+class CornerTracker:
+    """
+    Follows a locked page quadrilateral from frame to frame instead of
+    searching the whole frame again.
+
+    Each corner is tracked with pyramidal Lucas-Kanade optical flow inside a
+    small window (`search_radius` pixels) around its previous position, so the
+    cost does not depend on the frame size. Each corner keeps its own
+    reference frame: a corner whose window still looks like the reference is
+    kept as it is, and the reference only moves on when the corner is
+    actually re-tracked, so slow drift adds up until it is followed. A track
+    is accepted only when every corner is found, the forward-backward error
+    stays under `fb_threshold` pixels, and the quad stays convex with an area
+    within `max_area_change` of the previous one. Otherwise track() returns None and the caller falls back to
+    the full contour search. The perspective matrix is reused while the
+    corners move less than `still_threshold` pixels.
+    """
+
+    def __init__(self, search_radius=48, fb_threshold=1.0, max_area_change=0.25, still_threshold=0.5,
+                 still_diff=2.0, min_area=5000, win_size=(15, 15), max_level=2):
+        self.search_radius = search_radius
+        self.fb_threshold = fb_threshold
+        self.max_area_change = max_area_change
+        self.still_threshold = still_threshold
+        self.still_diff = still_diff
+        self.min_area = min_area
+        self.lk_params = dict(winSize=win_size, maxLevel=max_level,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.reset()
+
+    def reset(self):
+        self.ref_grays = None
+        self.corners = None
+        self._matrix = None
+        self._matrix_corners = None
+
+    @property
+    def locked(self):
+        return self.corners is not None
+
+    def lock(self, gray, corners):
+        self.ref_grays = [gray] * 4
+        self.corners = np.float32(corners).reshape(4, 1, 2)
+
+    def _track_corner(self, ref_gray, gray, x, y):
+        """
+        New position of one corner, or None. Works on the window around (x, y)
+        only; returns (x, y, still) where `still` means LK was skipped.
+        """
+        h, w = gray.shape[:2]
+        r = self.search_radius
+        x0, y0 = max(0, int(x) - r), max(0, int(y) - r)
+        x1, y1 = min(w, int(x) + r + 1), min(h, int(y) + r + 1)
+        prev_win = ref_gray[y0:y1, x0:x1]
+        win = gray[y0:y1, x0:x1]
+        if cv2.absdiff(prev_win, win).mean() < self.still_diff:
+            return x, y, True
+        pt = np.float32([[[x - x0, y - y0]]])
+        new, status, _ = cv2.calcOpticalFlowPyrLK(prev_win, win, pt, None, **self.lk_params)
+        if new is None or not status[0, 0]:
+            return None
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(win, prev_win, new, None, **self.lk_params)
+        if back is None or not back_status[0, 0] or np.abs(back - pt).max() > self.fb_threshold:
+            return None
+        return new[0, 0, 0] + x0, new[0, 0, 1] + y0, False
+
+    def track(self, gray):
+        """Corners (4x1x2, reorder() order) in the new frame, or None when tracking is lost."""
+        if not self.locked:
+            return None
+        new = np.empty_like(self.corners)
+        refs = list(self.ref_grays)
+        for i, (x, y) in enumerate(self.corners.reshape(4, 2)):
+            point = self._track_corner(refs[i], gray, x, y)
+            if point is None:
+                return self.reset()
+            new[i, 0] = point[:2]
+            if not point[2]:
+                refs[i] = gray
+        # reorder() gives TL, TR, BL, BR; the polygon goes TL, TR, BR, BL
+        polygon = new[[0, 1, 3, 2]]
+        area = cv2.contourArea(polygon)
+        prev_area = cv2.contourArea(self.corners[[0, 1, 3, 2]])
+        if (area <= self.min_area or not cv2.isContourConvex(polygon)
+                or abs(area - prev_area) > self.max_area_change * prev_area):
+            return self.reset()
+        self.ref_grays = refs
+        self.corners = new
+        return new
+
+    def perspective(self, pts2):
+        """Perspective matrix for the current corners, recomputed only when they have moved."""
+        if (self._matrix is None
+                or np.abs(self.corners - self._matrix_corners).max() > self.still_threshold):
+            self._matrix = cv2.getPerspectiveTransform(np.float32(self.corners), pts2)
+            self._matrix_corners = self.corners.copy()
+        return self._matrix
+
+
+def process_frame(img, thres, mosaic=True, tracker=None):
+    """
+    Run the scanner on one frame: blur -> Canny -> dilate/erode -> biggest
+    quadrilateral -> warp -> adaptive threshold.
+
+    With a CornerTracker the page found in an earlier frame is followed by
+    optical flow and the full search only runs when tracking is lost.
+    Returns a dict with the resized frame, the corners ('biggest', None when no
+    page was found), the warped color/threshold scans, 'mode' ("track" or
+    "search") and, with mosaic=True, the 8-panel display image. On tracked
+    frames the Threshold panel is blank and Contours shows the tracked quad.
+    """
+    img = cv2.resize(img, (widthImg, heightImg)) # RESIZE IMAGE
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) # CONVERT IMAGE TO GRAY SCALE
+    pts2 = np.float32([[0, 0],[widthImg, 0], [0, heightImg],[widthImg, heightImg]]) # PREPARE POINTS FOR WARP
+
+    biggest, imgThreshold, contours = None, None, None
+    if tracker is not None:
+        biggest = tracker.track(imgGray)
+    mode = "track" if biggest is not None else "search"
+    if biggest is None:
+        biggest, imgThreshold, contours = find_page(imgGray, thres)
+        if tracker is not None and biggest is not None:
+            tracker.lock(imgGray, biggest)
+
+    result = {'img': img, 'biggest': None, 'warp': None, 'scan': None, 'mosaic': None, 'mode': mode}
+    if biggest is not None:
+        if tracker is not None:
+            matrix = tracker.perspective(pts2)
+        else:
+            matrix = cv2.getPerspectiveTransform(np.float32(biggest), pts2)
         imgWarpColored = cv2.warpPerspective(img, matrix, (widthImg, heightImg))
- 
+
         #REMOVE 20 PIXELS FORM EACH SIDE
         imgWarpColored=imgWarpColored[20:imgWarpColored.shape[0] - 20, 20:imgWarpColored.shape[1] - 20]
         imgWarpColored = cv2.resize(imgWarpColored,(widthImg,heightImg))
- 
+
         # APPLY ADAPTIVE THRESHOLD
         imgWarpGray = cv2.cvtColor(imgWarpColored,cv2.COLOR_BGR2GRAY)
         imgAdaptiveThre= cv2.adaptiveThreshold(imgWarpGray, 255, 1, 1, 7, 2)
         imgAdaptiveThre = cv2.bitwise_not(imgAdaptiveThre)
         imgAdaptiveThre=cv2.medianBlur(imgAdaptiveThre,3)
- 
-        # Image Array for Display
-        imageArray = ([img,imgGray,imgThreshold,imgContours],
-                      [imgBigContour,imgWarpColored, imgWarpGray,imgAdaptiveThre])
- 
-    else:
-        imageArray = ([img,imgGray,imgThreshold,imgContours],
-                      [imgBlank, imgBlank, imgBlank, imgBlank])
- 
-    # LABELS FOR DISPLAY
-    labels = [["Original","Gray","Threshold","Contours"],
-              ["Biggest Contour","Warp Perspective","Warp Gray","Adaptive Threshold"]]
- 
-    stackedImage = utlis.stackImages(imageArray,0.75,labels)
-    cv2.imshow("Result",stackedImage)
- 
-    # SAVE IMAGE WHEN 's' key is pressed
-    if cv2.waitKey(1) & 0xFF == ord('s'):
-        cv2.imwrite("Scanned/myImage"+str(count)+".jpg",imgWarpColored)
-        cv2.rectangle(stackedImage, ((int(stackedImage.shape[1] / 2) - 230), int(stackedImage.shape[0] / 2) + 50),
-                      (1100, 350), (0, 255, 0), cv2.FILLED)
-        cv2.putText(stackedImage, "Scan Saved", (int(stackedImage.shape[1] / 2) - 200, int(stackedImage.shape[0] / 2)),
-                    cv2.FONT_HERSHEY_DUPLEX, 3, (0, 0, 255), 5, cv2.LINE_AA)
-        cv2.imshow('Result', stackedImage)
-        cv2.waitKey(300)
-        count += 1
\ No newline at end of file
+        result.update(biggest=biggest, warp=imgWarpColored, scan=imgAdaptiveThre)
+
+    if mosaic:
+        # The display panels are only drawn when someone is looking at them
+        if imgThreshold is None:
+            # Tracked frame: there is no edge map, so show the tracked quad instead of searching again
+            imgThreshold = np.zeros_like(imgGray)
+            # reorder() gives TL, TR, BL, BR; the polygon goes TL, TR, BR, BL
+            contours = [np.int32(np.round(biggest))[[0, 1, 3, 2]]]
+        imgContours = img.copy() # COPY IMAGE FOR DISPLAY PURPOSES
+        cv2.drawContours(imgContours, contours, -1, (0, 255, 0), 10) # DRAW ALL DETECTED CONTOURS
+        if result['biggest'] is not None:
+            corners = np.int32(np.round(biggest))
+            imgBigContour = img.copy() # COPY IMAGE FOR DISPLAY PURPOSES
+            cv2.drawContours(imgBigContour, corners, -1, (0, 255, 0), 20) # DRAW THE BIGGEST CONTOUR
+            imgBigContour = utlis.drawRectangle(imgBigContour,corners,2)
+            # Image Array for Display
+            imageArray = ([img,imgGray,imgThreshold,imgContours],
+                          [imgBigContour,imgWarpColored, imgWarpGray,imgAdaptiveThre])
+        else:
+            imgBlank = np.zeros((heightImg,widthImg, 3), np.uint8) # CREATE A BLANK IMAGE FOR TESTING DEBUGING IF REQUIRED
+            imageArray = ([img,imgGray,imgThreshold,imgContours],
+                          [imgBlank, imgBlank, imgBlank, imgBlank])
+        result['mosaic'] = utlis.stackImages(imageArray,0.75,labels)
+    return result
+
+
+class FrameSource:
+    """
+    Frames from a camera index, a video file, an image sequence (directory or
+    glob pattern) or a single image. read() returns (ok, frame) like
+    cv2.VideoCapture; `repeat` replays a single image this many times.
+    """
+
+    def __init__(self, source, repeat=1):
+        self.capture = None
+        self.paths = None
+        if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+            self.capture = cv2.VideoCapture(int(source))
+            self.capture.set(10,160)
+            self.live = True
+        elif os.path.isdir(source) or any(ch in source for ch in '*?['):
+            pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+            self.paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTENSIONS))
+            self.live = False
+        elif source.lower().endswith(IMAGE_EXTENSIONS):
+            self.paths = [source] * repeat
+            self.live = False
+        else:
+            self.capture = cv2.VideoCapture(source)
+            self.live = False
+        self._index = 0
+
+    def read(self):
+        if self.capture is not None:
+            return self.capture.read()
+        if self._index >= len(self.paths):
+            return False, None
+        img = cv2.imread(self.paths[self._index])
+        self._index += 1
+        return img is not None, img
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Capture thread. With drop_stale=True only the newest frame is kept, so a
+    slow consumer always gets the latest frame and the camera never waits;
+    otherwise frames go through a small blocking queue and none are lost
+    (what a video-file benchmark wants).
+    """
+
+    def __init__(self, source, drop_stale=True, queue_size=4, max_frames=None):
+        super().__init__(daemon=True, name='scanner-capture')
+        self.source = source
+        self.drop_stale = drop_stale
+        self.max_frames = max_frames
+        self.frames = queue.Queue(maxsize=1 if drop_stale else queue_size)
+        self.captured = 0
+        self.dropped = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            if self.max_frames is not None and self.captured >= self.max_frames:
+                break
+            success, img = self.source.read()
+            if not success:
+                break
+            item = (self.captured, time.perf_counter(), img)
+            self.captured += 1
+            if self.drop_stale:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                self.frames.put_nowait(item)
+            else:
+                while not self.stopped.is_set():
+                    try:
+                        self.frames.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        self.frames.put(None)  # End of stream
+
+    def stop(self):
+        self.stopped.set()
+
+
+class FrameProcessor(threading.Thread):
+    """Processing worker: takes frames from the grabber, runs process_frame and publishes the latest result."""
+
+    def __init__(self, grabber, thresholds, mosaic=True, tracker=None):
+        super().__init__(daemon=True, name='scanner-process')
+        self.grabber = grabber
+        self.thresholds = thresholds
+        self.mosaic = mosaic
+        self.tracker = tracker
+        self.cpu_times = []
+        self.modes = {'track': 0, 'search': 0}
+        self.latest = None
+        self.latest_lock = threading.Lock()
+        self.latencies = []
+        self.process_times = []
+        self.processed = 0
+        self.finished = threading.Event()
+
+    def run(self):
+        while True:
+            item = self.grabber.frames.get()
+            if item is None:
+                break
+            index, captured_at, img = item
+            start = time.perf_counter()
+            cpu_start = time.thread_time()
+            result = process_frame(img, self.thresholds, mosaic=self.mosaic, tracker=self.tracker)
+            self.cpu_times.append(time.thread_time() - cpu_start)
+            done = time.perf_counter()
+            result['index'] = index
+            self.modes[result['mode']] += 1
+            self.process_times.append(done - start)
+            # Latency: from capture to a finished result, including time spent waiting in the queue
+            self.latencies.append(done - captured_at)
+            self.processed += 1
+            with self.latest_lock:
+                self.latest = result
+        self.finished.set()
+
+    def take_latest(self):
+        with self.latest_lock:
+            result, self.latest = self.latest, None
+        return result
+
+
+def report_stats(grabber, processor, elapsed):
+    """Print and return capture/processing FPS and per-frame latency."""
+    lat = np.asarray(processor.latencies) * 1000
+    proc = np.asarray(processor.process_times) * 1000
+    cpu = np.asarray(processor.cpu_times) * 1000
+    stats = {
+        'captured': grabber.captured,
+        'processed': processor.processed,
+        'dropped': grabber.dropped,
+        'elapsed': elapsed,
+        'capture_fps': grabber.captured / elapsed if elapsed > 0 else 0.0,
+        'process_fps': processor.processed / elapsed if elapsed > 0 else 0.0,
+        'tracked': processor.modes['track'],
+        'searched': processor.modes['search'],
+    }
+    if len(lat):
+        stats.update(latency_mean_ms=float(lat.mean()), latency_p50_ms=float(np.percentile(lat, 50)),
+                     latency_p95_ms=float(np.percentile(lat, 95)), process_mean_ms=float(proc.mean()),
+                     cpu_mean_ms=float(cpu.mean()), cpu_p95_ms=float(np.percentile(cpu, 95)))
+    print(f"Captured {stats['captured']} frames ({stats['capture_fps']:.1f} fps), processed {stats['processed']} "
+          f"({stats['process_fps']:.1f} fps), dropped {stats['dropped']} stale frames in {elapsed:.2f}s")
+    if len(lat):
+        print(f"Latency per frame: mean {stats['latency_mean_ms']:.1f} ms, p50 {stats['latency_p50_ms']:.1f} ms, "
+              f"p95 {stats['latency_p95_ms']:.1f} ms (processing {stats['process_mean_ms']:.1f} ms)")
+        print(f"CPU time per frame: mean {stats['cpu_mean_ms']:.2f} ms, p95 {stats['cpu_p95_ms']:.2f} ms "
+              f"({stats['tracked']} frames tracked, {stats['searched']} full searches)")
+    return stats
+
+
+def run_scanner(source, display=True, drop_stale=None, max_frames=None, thresholds=DEFAULT_THRESHOLDS,
+                save_dir="Scanned", repeat=1, track=False):
+    """
+    Run capture, processing and (optionally) display on separate threads.
+
+    Stale frames are dropped by default for live cameras and kept for files
+    and image sequences. With track=True the page corners are followed with
+    optical flow between full searches (see CornerTracker). Without a display
+    the run ends with the source (or after `max_frames`) and the
+    FPS/latency/CPU stats are returned.
+    """
+    frame_source = FrameSource(source, repeat=repeat)
+    if drop_stale is None:
+        drop_stale = frame_source.live
+    if display:
+        utlis.initializeTrackbars()
+    grabber = FrameGrabber(frame_source, drop_stale=drop_stale, max_frames=max_frames)
+    processor = FrameProcessor(grabber, thresholds, mosaic=display, tracker=CornerTracker() if track else None)
+    start = time.perf_counter()
+    grabber.start()
+    processor.start()
+
+    count = 0
+    last = None
+    try:
+        while not processor.finished.is_set():
+            if not display:
+                processor.finished.wait(0.1)
+                continue
+            # Trackbar values are read on the UI thread and handed to the worker
+            processor.thresholds = utlis.valTrackbars() # GET TRACK BAR VALUES FOR THRESHOLDS
+            result = processor.take_latest()
+            if result is not None:
+                last = result
+                cv2.imshow("Result", result['mosaic'])
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+            # SAVE IMAGE WHEN 's' key is pressed
+            if key == ord('s') and last is not None and last['warp'] is not None:
+                os.makedirs(save_dir, exist_ok=True)
+                cv2.imwrite(os.path.join(save_dir, "myImage"+str(count)+".jpg"),last['warp'])
+                stackedImage = last['mosaic'].copy()
+                cv2.rectangle(stackedImage, ((int(stackedImage.shape[1] / 2) - 230), int(stackedImage.shape[0] / 2) + 50),
+                              (1100, 350), (0, 255, 0), cv2.FILLED)
+                cv2.putText(stackedImage, "Scan Saved", (int(stackedImage.shape[1] / 2) - 200, int(stackedImage.shape[0] / 2)),
+                            cv2.FONT_HERSHEY_DUPLEX, 3, (0, 0, 255), 5, cv2.LINE_AA)
+                cv2.imshow('Result', stackedImage)
+                cv2.waitKey(300)
+                count += 1
+    finally:
+        grabber.stop()
+        processor.finished.wait(1.0)
+        frame_source.release()
+        if display:
+            cv2.destroyAllWindows()
+    return report_stats(grabber, processor, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Live document scanner.')
+    parser.add_argument('--source', type=str, default="0" if webCamFeed else pathImage,
+                        help='Camera index, video file, image, directory or glob of images')
+    parser.add_argument('--headless', action='store_true', help='No windows; report FPS and latency')
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--thresholds', type=int, nargs=2, default=list(DEFAULT_THRESHOLDS),
+                        help='Canny thresholds (trackbars are used when displaying)')
+    drop = parser.add_mutually_exclusive_group()
+    drop.add_argument('--drop-stale', dest='drop_stale', action='store_true', default=None,
+                      help='Only process the newest frame (default for cameras)')
+    drop.add_argument('--keep-all', dest='drop_stale', action='store_false',
+                      help='Process every frame (default for files)')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay a single image this many times')
+    parser.add_argument('--track', action='store_true',
+                        help='Follow the locked page with optical flow instead of searching every frame')
+    args = parser.parse_args()
+
+    run_scanner(args.source, display=not args.headless, drop_stale=args.drop_stale,
+                max_frames=args.max_frames, thresholds=tuple(args.thresholds), repeat=args.repeat,
+                track=args.track)
@@ -0,0 +1,77 @@
+"""
+Cold-start time of the transformer detectors, hub load vs local snapshot.
+
+    python model_snapshot.py                 # once, writes models/snapshots
+    python benchmarks/bench_cold_start.py
+
+Every measurement runs in a fresh interpreter and reports the module import,
+the model load (first use) and the first detection separately. With
+--offline the snapshot runs set HF_HUB_OFFLINE=1 to show they need no network.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(model, snapshot_dir, backend):
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from model_snapshot import make_detector
+    from PIL import Image
+    detector = make_detector(model, snapshot_dir=snapshot_dir or None, backend=backend)
+    imported = time.perf_counter()
+    detector.load()
+    loaded = time.perf_counter()
+    image = Image.new('RGB', (800, 1000), 'white')
+    detector.detect([image])
+    detected = time.perf_counter()
+    print(json.dumps({'import': imported - start, 'load': loaded - imported, 'first_detect': detected - loaded}))
+
+
+def measure(model, snapshot_dir, backend, offline, repeat):
+    env = dict(os.environ)
+    if offline and snapshot_dir:
+        env['HF_HUB_OFFLINE'] = '1'
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--model', model,
+                               '--snapshot-dir', snapshot_dir, '--backend', backend],
+                              capture_output=True, text=True, env=env)
+        total = time.perf_counter() - start
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:])
+            raise RuntimeError(f"{model} cold start failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['process'] = total
+        runs.append(result)
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure detector cold-start time.')
+    parser.add_argument('--model', choices=['table', 'layout', 'all'], default='all')
+    parser.add_argument('--snapshot-dir', type=str, default=os.path.join(ROOT, 'models', 'snapshots'))
+    parser.add_argument('--backend', type=str, default='torch')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh processes per setting (best is reported)')
+    parser.add_argument('--skip-hub', action='store_true', help='Only measure the snapshot load')
+    parser.add_argument('--offline', action='store_true', help='Set HF_HUB_OFFLINE=1 for snapshot runs')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.model, args.snapshot_dir, args.backend)
+        sys.exit(0)
+
+    print(f"{'model':>7} {'source':>9} {'import s':>9} {'load s':>8} {'1st det s':>10} {'process s':>10}")
+    for model in (['table', 'layout'] if args.model == 'all' else [args.model]):
+        sources = [('snapshot', args.snapshot_dir)] if args.skip_hub else [('hub', ''), ('snapshot', args.snapshot_dir)]
+        for source, snapshot_dir in sources:
+            r = measure(model, snapshot_dir, args.backend, args.offline, args.repeat)
+            print(f"{model:>7} {source:>9} {r['import']:>9.2f} {r['load']:>8.2f} "
+                  f"{r['first_detect']:>10.2f} {r['process']:>10.2f}")
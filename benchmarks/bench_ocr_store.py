@@ -0,0 +1,161 @@
+"""
+OCRStore at scale: document lookups, /documents pages, /save inserts and /search.
+
+    python benchmarks/bench_ocr_store.py                       # 100k documents / 5M items
+    python benchmarks/bench_ocr_store.py --documents 10000     # quicker run
+
+The database is generated once into --db (reused when it already has the
+requested size). The previous access patterns are measured on the same
+file: item lookups with the index disabled (NOT INDEXED, as in the schema
+without idx_ocr_text_item_document), LIMIT/OFFSET pages, and inserting a
+document's items one statement and one commit at a time. Searches are
+compared with a full LIKE '%word%' scan of ocr_text_item.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr_store import OCRStore, item_row, match_query  # noqa: E402
+
+WORDS = ("visita de controle data observacoes nome paciente idade peso altura pressao "
+         "temperatura medicamento dose assinatura medico enfermeiro retorno exame resultado").split()
+SYLLABLES = "ba be bi bo ca de di fa fe ga gu la le li lo ma me mi mo na ne ni no pa pe ra re ri ro sa se so ta te to va".split()
+
+
+def make_names(n, rng):
+    """Made-up names: a vocabulary of less frequent words, like patient names in handwritten fields."""
+    return sorted({''.join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(n)})
+
+
+def item_text(rng, names):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 4))]
+    if rng.random() < 0.5:
+        words.append(rng.choice(names))
+    if rng.random() < 0.2:
+        words.append(f"n{rng.randrange(10_000_000)}")
+    return ' '.join(words)
+
+
+def populate(store, documents, items_per_doc, chunk=1000):
+    rng = random.Random(0)
+    names = make_names(5000, rng)
+    base = datetime(2024, 1, 1)
+    start = time.perf_counter()
+    for first in range(0, documents, chunk):
+        with store.transaction() as conn:
+            docs, items = [], []
+            for n in range(first, min(first + chunk, documents)):
+                doc_id = f"doc-{n:08d}"
+                docs.append((doc_id, f"Document {n}", f"scan_{n}.jpg", (base + timedelta(seconds=n)).isoformat(),
+                             f"preprocessed/{doc_id}.jpg", f"uploads/{doc_id}.jpg"))
+                for _ in range(items_per_doc):
+                    text = item_text(rng, names)
+                    items.append(item_row(doc_id, {'text': text, 'confidence': rng.random(),
+                                                   'is_handwritten': rng.random() < 0.3,
+                                                   'text_region': [[0, 0], [10, 0], [10, 10], [0, 10]]}))
+            conn.executemany("INSERT INTO ocr_document VALUES (?, ?, ?, ?, ?, ?)", docs)
+            conn.executemany("INSERT INTO ocr_text_item (document_id, text, confidence, is_handwritten, "
+                             "text_region, edited) VALUES (?, ?, ?, ?, ?, ?)", items)
+        print(f"\r{min(first + chunk, documents)}/{documents} documents", end='', flush=True)
+    print(f"\nGenerated in {time.perf_counter() - start:.1f}s")
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def report(name, new_ms, old_ms):
+    print(f"{name:<34} {new_ms:>10.3f} {old_ms:>12.3f} {old_ms / new_ms:>9.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the OCR results store.')
+    parser.add_argument('--db', type=str, default='output/bench_ocr_store.db')
+    parser.add_argument('--documents', type=int, default=100_000)
+    parser.add_argument('--items-per-doc', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    store = OCRStore(args.db)
+    stats = store.stats()
+    if stats['documents'] != args.documents or stats['items'] != args.documents * args.items_per_doc:
+        store.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        store = OCRStore(args.db)
+        populate(store, args.documents, args.items_per_doc)
+        store.conn.execute("ANALYZE")
+        store.optimize_search()
+    print(store.stats())
+    conn = store.conn
+    rng = random.Random(1)
+
+    print(f"{'':<34} {'new ms':>10} {'previous ms':>12} {'speedup':>10}")
+
+    doc_ids = [f"doc-{rng.randrange(args.documents):08d}" for _ in range(args.repeat)]
+    it = iter(doc_ids * 2)
+    new = timed(lambda: store.get_document(next(it)), args.repeat)
+    scan_repeat = max(3, args.repeat // 10)
+    old = timed(lambda: conn.execute("SELECT * FROM ocr_text_item NOT INDEXED WHERE document_id = ?",
+                                     (next(it),)).fetchall(), scan_repeat)
+    report("/documents/<id> (items lookup)", new, old)
+
+    # Page deep into the list: follow cursors vs OFFSET
+    depth = min(args.documents - 100, 90_000)
+    page, cursor = 0, None
+    while page * 500 < depth:
+        _, cursor = store.list_documents(500, cursor)
+        page += 1
+    cursor_at_depth = cursor
+    new = timed(lambda: store.list_documents(50, cursor_at_depth), args.repeat)
+    old = timed(lambda: conn.execute(
+        "SELECT d.*, (SELECT COUNT(*) FROM ocr_text_item t WHERE t.document_id = d.id) "
+        "FROM ocr_document d ORDER BY created_at DESC, id DESC LIMIT 50 OFFSET ?", (depth,)).fetchall(),
+        scan_repeat)
+    report(f"/documents page at offset {depth}", new, old)
+    print(f"{'/documents first page':<34} {timed(lambda: store.list_documents(50), args.repeat):>10.3f}")
+
+    items = [{'text': 'bench', 'confidence': 0.9, 'is_handwritten': True, 'text_region': [[0, 0], [1, 1]]}
+             for _ in range(args.items_per_doc)]
+    saved = []
+    new = timed(lambda: saved.append(store.save_document(items, 'bench')), max(5, args.repeat // 5))
+
+    def save_row_by_row():
+        doc_id = f"bench-{len(saved)}"
+        saved.append(doc_id)
+        conn.execute("INSERT INTO ocr_document (id, document_name, created_at) VALUES (?, ?, ?)",
+                     (doc_id, 'bench', datetime.now().isoformat()))
+        for item in items:
+            conn.execute("INSERT INTO ocr_text_item (document_id, text, confidence, is_handwritten, text_region, "
+                         "edited) VALUES (?, ?, ?, ?, ?, ?)", item_row(doc_id, item))
+    old = timed(save_row_by_row, max(5, args.repeat // 5))
+    report(f"/save ({args.items_per_doc} items)", new, old)
+
+    # Search: a rare code, a name, a name prefix, two words, and one of the most common words
+    code = conn.execute("SELECT text FROM ocr_text_item WHERE text LIKE '% n%' LIMIT 1").fetchone()[0].split()[-1]
+    name = make_names(5000, random.Random(0))[123]
+    for label, query, like in (('rare code', code, code), ('name', name, name), ('name prefix', name[:4], name[:4]),
+                               ('name + word', f"{name} controle", name), ('common word', 'resultado', 'resultado')):
+        hits = conn.execute("SELECT COUNT(*) FROM ocr_text_fts WHERE ocr_text_fts MATCH ?",
+                            (match_query(query, prefix=label == 'name prefix'),)).fetchone()[0]
+        new = timed(lambda: store.search(query), args.repeat)
+        old = timed(lambda: conn.execute("SELECT * FROM ocr_text_item WHERE text LIKE ?",
+                                         (f"%{like}%",)).fetchall(), scan_repeat)
+        report(f"/search {label} ({hits} hits)", new, old)
+
+    for doc_id in saved:
+        store.delete_document(doc_id)
+    store.close()
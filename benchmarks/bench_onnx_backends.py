@@ -0,0 +1,120 @@
+"""
+Accuracy vs latency of the torch / onnx / onnx-int8 backends for both transformer detectors.
+
+    python benchmarks/bench_onnx_backends.py --images inputs
+
+For each backend the detections are matched against the torch backend
+(same label, IoU >= 0.5) and the per-image latency is reported. Without
+--images a set of synthetic table pages is used.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from onnx_backend import BACKENDS, DEFAULT_ONNX_DIR
+from bench_table_detector import synthetic_pages, load_images
+
+
+def load_layout_module():
+    # The layout script has a hyphen in its file name, so it is loaded by path
+    spec = importlib.util.spec_from_file_location('detr_layout_detection',
+                                                  os.path.join(ROOT, 'detr-layout-detection.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, candidate, iou_threshold=0.5):
+    """Greedy one-to-one matching of candidate detections to the reference ones."""
+    matched, ious, score_diffs = 0, [], []
+    used = set()
+    for ref in reference:
+        best, best_j = 0.0, None
+        for j, cand in enumerate(candidate):
+            if j in used or cand['label'] != ref['label']:
+                continue
+            value = iou(ref['bbox'], cand['bbox'])
+            if value > best:
+                best, best_j = value, j
+        if best_j is not None and best >= iou_threshold:
+            used.add(best_j)
+            matched += 1
+            ious.append(best)
+            score_diffs.append(abs(ref['score'] - candidate[best_j]['score']))
+    return matched, ious, score_diffs
+
+
+def table_objects(detector, images, threshold):
+    results = detector.detect(images)
+    return [[o for o in objects if o['score'] >= threshold] for objects in results]
+
+
+def layout_objects(detector, images, threshold):
+    results = []
+    for image in images:
+        pred = detector.detect([image])[0]
+        results.append([{'label': int(label), 'score': float(score), 'bbox': box.tolist()}
+                        for score, label, box in zip(pred['scores'], pred['labels'], pred['boxes'])])
+    return results
+
+
+def run(name, make_detector, collect, images, threshold):
+    print(f"\n{name}")
+    print(f"{'backend':>10} {'ms/img':>8} {'dets':>6} {'matched':>8} {'mean IoU':>9} {'max |dscore|':>13}")
+    reference = None
+    for backend in BACKENDS:
+        detector = make_detector(backend)
+        collect(detector, images[:1], threshold)  # warm-up
+        start = time.perf_counter()
+        objects = collect(detector, images, threshold)
+        elapsed = 1000 * (time.perf_counter() - start) / len(images)
+        if reference is None:
+            reference = objects
+        total = sum(len(o) for o in objects)
+        matched, ious, diffs = 0, [], []
+        for ref, cand in zip(reference, objects):
+            m, i, d = compare(ref, cand)
+            matched += m
+            ious += i
+            diffs += d
+        print(f"{backend:>10} {elapsed:>8.0f} {total:>6} {matched:>8} "
+              f"{(np.mean(ious) if ious else float('nan')):>9.4f} {(max(diffs) if diffs else 0.0):>13.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare torch and ONNX Runtime detector backends.')
+    parser.add_argument('--images', type=str, default=None, help='Folder of fixture images')
+    parser.add_argument('--count', type=int, default=8, help='Number of synthetic pages')
+    parser.add_argument('--threshold', type=float, default=0.4)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--onnx-dir', type=str, default=DEFAULT_ONNX_DIR)
+    parser.add_argument('--only', choices=['table', 'layout'], default=None)
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_pages(args.count)
+
+    if args.only in (None, 'table'):
+        from microsoft_table_transformer_detection import TableDetector
+        run("table-transformer-detection",
+            lambda backend: TableDetector(backend=backend, num_threads=args.threads, onnx_dir=args.onnx_dir),
+            table_objects, images, args.threshold)
+    if args.only in (None, 'layout'):
+        layout = load_layout_module()
+        run("detr-layout-detection",
+            lambda backend: layout.LayoutDetector(backend=backend, threshold=args.threshold,
+                                                  num_threads=args.threads, onnx_dir=args.onnx_dir),
+            layout_objects, images, args.threshold)
@@ -0,0 +1,102 @@
+"""
+Benchmark sanitize_for_json on a synthetic multi-table PPStructure page.
+
+Compares the previous implementation (json.dumps probe per dict key) with the
+single-pass converter in ocr_serialization. Run from the repo root:
+
+    python benchmarks/bench_sanitize.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr_serialization import sanitize_for_json, encode_result
+
+
+def legacy_sanitize_for_json(obj):
+    """The converter used before: probes every dict value with json.dumps."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, (int, float, str, bool, type(None))):
+        return obj
+    elif isinstance(obj, list):
+        return [legacy_sanitize_for_json(item) for item in obj]
+    elif isinstance(obj, dict):
+        sanitized = {}
+        for key, value in obj.items():
+            if key in ['img', 'image', '_PlaceholderType']:
+                continue
+            try:
+                json.dumps({key: value})
+                sanitized[key] = value
+            except (TypeError, OverflowError):
+                sanitized[key] = legacy_sanitize_for_json(value)
+        return sanitized
+    else:
+        try:
+            return str(obj)
+        except:
+            return "UNSERIALIZABLE_OBJECT"
+
+
+def make_page(n_tables=6, rows=25, cols=6, n_text=80, seed=0):
+    """Region list shaped like PPStructure output: tables with cell boxes, text regions with line boxes."""
+    rng = np.random.default_rng(seed)
+    regions = []
+    for t in range(n_tables):
+        cells = rows * cols
+        regions.append({
+            'type': 'table',
+            'bbox': rng.integers(0, 3000, 4),
+            'img': rng.integers(0, 255, (400, 900, 3), dtype=np.uint8),
+            'res': {
+                'cell_bbox': [rng.random(8).astype(np.float32) * 3000 for _ in range(cells)],
+                'html': '<table>' + '<tr>' + '<td>cell</td>' * cols + '</tr>' * rows + '</table>',
+                'boxes': [rng.random((4, 2)).astype(np.float32) * 3000 for _ in range(cells)],
+                'rec_res': [(f'value {i}', np.float32(rng.random())) for i in range(cells)],
+            },
+            'img_idx': 0,
+            'score': np.float32(0.97),
+        })
+    for t in range(n_text):
+        regions.append({
+            'type': 'text',
+            'bbox': rng.integers(0, 3000, 4),
+            'img': rng.integers(0, 255, (60, 600, 3), dtype=np.uint8),
+            'res': [{'text': f'line {t}.{i}', 'confidence': np.float32(rng.random()),
+                     'text_region': rng.random((4, 2)).astype(np.float32) * 3000}
+                    for i in range(3)],
+            'img_idx': 0,
+        })
+    return regions
+
+
+def best_of(fn, arg, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark OCR result sanitizing.')
+    parser.add_argument('--tables', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_page(n_tables=args.tables)
+    legacy = best_of(legacy_sanitize_for_json, page, args.repeat)
+    single = best_of(sanitize_for_json, page, args.repeat)
+    arrays = best_of(lambda p: sanitize_for_json(p, keep_arrays=True), page, args.repeat)
+
+    json_bytes = len(encode_result({'res': sanitize_for_json(page)})[0])
+    print(f"Page: {args.tables} tables, {len(page)} regions, {json_bytes / 1024:.0f} KiB as JSON")
+    print(f"legacy sanitize_for_json       {legacy * 1000:8.1f} ms")
+    print(f"single-pass sanitize_for_json  {single * 1000:8.1f} ms  ({legacy / single:.1f}x)")
+    print(f"single-pass, keep_arrays=True  {arrays * 1000:8.1f} ms  ({legacy / arrays:.1f}x)")
@@ -0,0 +1,66 @@
+"""
+CPU throughput of TableDetector for several mini-batch sizes.
+
+    python benchmarks/bench_table_detector.py --images inputs --batch-sizes 1 4 8
+
+Without --images a set of synthetic table pages is generated.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from microsoft_table_transformer_detection import TableDetector
+
+
+def synthetic_pages(count, size=(1240, 1754), seed=0):
+    """White pages with one or two ruled tables each."""
+    rng = np.random.default_rng(seed)
+    pages = []
+    for _ in range(count):
+        page = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(page)
+        for t in range(int(rng.integers(1, 3))):
+            x0, y0 = 100, 150 + t * 750
+            rows, cols = int(rng.integers(5, 12)), int(rng.integers(3, 7))
+            cw, rh = 1000 // cols, 50
+            for r in range(rows + 1):
+                draw.line([(x0, y0 + r * rh), (x0 + cols * cw, y0 + r * rh)], fill="black", width=2)
+            for c in range(cols + 1):
+                draw.line([(x0 + c * cw, y0), (x0 + c * cw, y0 + rows * rh)], fill="black", width=2)
+            for r in range(rows):
+                for c in range(cols):
+                    draw.text((x0 + c * cw + 8, y0 + r * rh + 18), f"{r}.{c}", fill="black")
+        pages.append(page)
+    return pages
+
+
+def load_images(folder):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(('.png', '.jpg', '.jpeg')))
+    return [Image.open(os.path.join(folder, n)).convert("RGB") for n in names]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark TableDetector mini-batch sizes on CPU.')
+    parser.add_argument('--images', type=str, default=None, help='Folder of fixture images')
+    parser.add_argument('--count', type=int, default=16, help='Number of synthetic pages')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--threads', type=int, default=None, help='torch CPU threads')
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_pages(args.count)
+    detector = TableDetector(device="cpu", num_threads=args.threads)
+    # Warm-up so one-off allocations are not counted
+    detector.detect(images[:1])
+
+    print(f"{len(images)} images, {detector.model.device}, {__import__('torch').get_num_threads()} threads")
+    print(f"{'batch':>5} {'total s':>8} {'img/s':>7} {'ms/img':>7}")
+    for batch_size in args.batch_sizes:
+        detector.batch_size = batch_size
+        start = time.perf_counter()
+        detector.detect(images)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>5} {elapsed:>8.2f} {len(images) / elapsed:>7.2f} {1000 * elapsed / len(images):>7.0f}")
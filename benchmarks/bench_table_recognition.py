@@ -0,0 +1,50 @@
+"""
+PaddleX table_recognition (batched) vs paddle_OCR_detection on the same images.
+
+    python benchmarks/bench_table_recognition.py --images inputs --batch-sizes 1 4 8
+
+Both runs skip caches and visualizations so only recognition and result
+writing are timed. Each line reports throughput and per-image latency.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from paddleX_table_recognition import TableRecognitionRunner, latency_summary, print_summary, iter_image_inputs
+
+
+def bench_paddlex(paths, batch_size, output_dir):
+    runner = TableRecognitionRunner(batch_size=batch_size, output_dir=output_dir, save=('json',))
+    runner.pipeline  # build outside the timed run
+    return runner.run(paths)
+
+
+def bench_paddle_ocr(paths, output_dir):
+    from paddle_OCR_detection import run_paddle_ocr, warm_up_engine
+    warm_up_engine()
+    latencies = []
+    start = time.perf_counter()
+    for path in paths:
+        t = time.perf_counter()
+        run_paddle_ocr(path, output_dir, use_cache=False, visualize=False)
+        latencies.append(time.perf_counter() - t)
+    return latency_summary(latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare PaddleX table recognition with paddle_OCR_detection.')
+    parser.add_argument('--images', type=str, default='inputs', help='Directory, glob pattern or manifest file')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--skip-paddleocr', action='store_true')
+    args = parser.parse_args()
+
+    paths = list(iter_image_inputs(args.images))
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in args.batch_sizes:
+            stats = bench_paddlex(paths, batch_size, os.path.join(tmp, f'paddlex_b{batch_size}'))
+            print_summary(f"PaddleX table_recognition (batch {batch_size})", stats)
+        if not args.skip_paddleocr:
+            print_summary("paddle_OCR_detection", bench_paddle_ocr(paths, os.path.join(tmp, 'paddleocr')))
@@ -0,0 +1,207 @@
+import os
+import cv2
+import argparse
+import threading
+import numpy as np
+
+import ocr_cache
+import crop_model1
+from ocr_serialization import sanitize_for_json
+from detection_postprocess import merge_region_proposals
+
+# The transformer models are heavy, so they are only loaded when their detector is used
+_LAYOUT_DETECTOR = None
+_TABLE_DETECTOR = None
+_DETECTOR_LOCK = threading.Lock()
+
+
+def _get_layout_detector():
+    global _LAYOUT_DETECTOR
+    with _DETECTOR_LOCK:
+        if _LAYOUT_DETECTOR is None:
+            import importlib.util
+            # The layout script has a hyphen in its file name, so it is loaded by path
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'detr-layout-detection.py')
+            spec = importlib.util.spec_from_file_location('detr_layout_detection', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _LAYOUT_DETECTOR = module.LayoutDetector()
+        return _LAYOUT_DETECTOR
+
+
+def _get_table_detector():
+    global _TABLE_DETECTOR
+    with _DETECTOR_LOCK:
+        if _TABLE_DETECTOR is None:
+            from microsoft_table_transformer_detection import TableDetector
+            _TABLE_DETECTOR = TableDetector()
+        return _TABLE_DETECTOR
+
+
+def _detector_regions(img, detector):
+    """Regions from one detector, as [x1, y1, x2, y2] boxes or {'bbox', 'score', 'label'} dicts."""
+    if callable(detector):
+        return [list(map(float, box)) for box in detector(img)]
+    if detector == 'contours':
+        return crop_model1.find_card_boxes(img, max_dim=crop_model1.DETECT_MAX_DIM)
+    if detector in ('layout', 'table'):
+        from PIL import Image
+        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        if detector == 'table':
+            # detect() takes a list of images and returns one list of {'label', 'score', 'bbox'} per image;
+            # "no object" queries are already dropped by postprocess_detections
+            return _get_table_detector().detect([pil_img])[0]
+        pred = _get_layout_detector().detect([pil_img])[0]
+        return [{'bbox': box, 'score': score, 'label': label}
+                for box, score, label in zip(pred['boxes'].tolist(), pred['scores'].tolist(),
+                                             pred['labels'].tolist())]
+    raise ValueError(f"Unknown region detector: {detector}")
+
+
+def propose_regions(img, detector='contours', iou_threshold=0.5):
+    """
+    Candidate [x1, y1, x2, y2] regions worth OCRing.
+
+    `detector` is "contours" (crop_model1 card/table outlines, cheap), "layout"
+    (DETR layout model), "table" (table-transformer), a callable taking the
+    BGR image and returning boxes, or a list of these. The proposals of a
+    list are merged with cross-detector NMS at `iou_threshold`.
+    """
+    detectors = detector if isinstance(detector, (list, tuple)) else [detector]
+    sources = {(d if isinstance(d, str) else f"custom{i}"): _detector_regions(img, d)
+               for i, d in enumerate(detectors)}
+    if len(sources) == 1:
+        regions = next(iter(sources.values()))
+        return [list(map(float, r['bbox'] if isinstance(r, dict) else r)) for r in regions]
+    return [r['bbox'] for r in merge_region_proposals(sources, iou_threshold=iou_threshold)]
+
+
+def expand_box(box, margin, width, height):
+    """Grow a box by `margin` (a fraction of its size) on every side, clipped to the image, as ints."""
+    x1, y1, x2, y2 = box
+    mx, my = margin * (x2 - x1), margin * (y2 - y1)
+    return [max(0, int(x1 - mx)), max(0, int(y1 - my)),
+            min(width, int(np.ceil(x2 + mx))), min(height, int(np.ceil(y2 + my)))]
+
+
+def merge_overlapping(boxes):
+    """Union boxes that overlap so no pixel is sent to OCR twice."""
+    boxes = [list(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        while boxes:
+            a = boxes.pop()
+            for b in boxes:
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes.remove(b)
+                    boxes.append([min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])])
+                    merged = True
+                    break
+            else:
+                out.append(a)
+        boxes = out
+    # Top-to-bottom, left-to-right reading order
+    return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+
+def _offset_points(values, dx, dy):
+    """Shift a flat [x, y, x, y, ...] list or a list of [x, y] points."""
+    if values and isinstance(values[0], list):
+        return [_offset_points(v, dx, dy) for v in values]
+    return [v + (dx if i % 2 == 0 else dy) for i, v in enumerate(values)]
+
+
+def offset_region(region, dx, dy):
+    """Move a sanitized PPStructure region from crop coordinates to page coordinates (in place)."""
+    if region.get('bbox'):
+        region['bbox'] = _offset_points(region['bbox'], dx, dy)
+    res = region.get('res')
+    if isinstance(res, list):
+        for item in res:
+            if isinstance(item, dict) and item.get('text_region'):
+                item['text_region'] = _offset_points(item['text_region'], dx, dy)
+    elif isinstance(res, dict):
+        for key in ('cell_bbox', 'boxes'):
+            if res.get(key):
+                res[key] = _offset_points(res[key], dx, dy)
+    return region
+
+
+def run_cascaded_ocr(image_path, output_folder, detector='contours', margin=0.02, use_cache=True):
+    """
+    OCR only the regions proposed by a cheap detector and map the results back to the page.
+
+    Proposed boxes are grown by `margin`, merged where they overlap and passed
+    to PPStructure one crop at a time. When no region is found the whole page
+    goes through run_paddle_ocr instead. Returns the same text entries as
+    run_paddle_ocr.
+    """
+    # Imported here so region proposal (and its tests) work without paddleocr installed
+    from paddle_OCR_detection import (run_paddle_ocr, run_engine, enhanced_save_structure_res,
+                                      region_text_items, DEFAULT_ENGINE_KWARGS, ENGINE_VERSION)
+
+    os.makedirs(output_folder, exist_ok=True)
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        raise ValueError(f"Could not read image from {image_path}")
+
+    cache = None
+    sanitized_result = None
+    detectors = detector if isinstance(detector, (list, tuple)) else [detector]
+    if use_cache and not ocr_cache.cache_disabled() and not any(callable(d) for d in detectors):
+        cache = ocr_cache.get_cache('ocr')
+        params = dict(DEFAULT_ENGINE_KWARGS, cascade=list(detectors), margin=margin)
+        cache_key = ocr_cache.make_key(data, params, version=ENGINE_VERSION)
+        sanitized_result = cache.get_json(cache_key)
+        if sanitized_result is not None:
+            print(f"Using cached cascaded OCR results for {image_path}")
+
+    if sanitized_result is None:
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Could not read image from {image_path}")
+        h, w = img.shape[:2]
+        boxes = merge_overlapping([expand_box(box, margin, w, h) for box in propose_regions(img, detector)])
+        if not boxes:
+            print("No regions proposed, falling back to full-page OCR")
+            return run_paddle_ocr(image_path, output_folder, use_cache=use_cache)
+
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in boxes) / float(w * h)
+        print(f"Running OCR on {len(boxes)} regions ({covered:.0%} of the page)")
+        sanitized_result = []
+        for x1, y1, x2, y2 in boxes:
+            regions = sanitize_for_json(run_engine(img[y1:y2, x1:x2]))
+            sanitized_result.extend(offset_region(region, x1, y1) for region in regions)
+        if cache is not None:
+            cache.put_json(cache_key, sanitized_result)
+
+    processed_results = []
+    for region in sanitized_result:
+        processed_results.extend(region_text_items(region))
+
+    base_name = os.path.basename(image_path).split('.')[0]
+    try:
+        enhanced_save_structure_res(sanitized_result, output_folder, base_name)
+    except Exception as e:
+        print(f"Error saving OCR results: {e}")
+
+    return processed_results if processed_results else sanitized_result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='OCR only the regions found by a table/card detector.')
+    parser.add_argument('--image', type=str, required=True, help='Path to input image')
+    parser.add_argument('--output', type=str, required=True, help='Path to save OCR results')
+    parser.add_argument('--detector', type=str, nargs='+', choices=['contours', 'layout', 'table'],
+                        default=['contours'], help='One or more region detectors (merged with NMS)')
+    parser.add_argument('--margin', type=float, default=0.02, help='Margin around each region (fraction of its size)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the OCR result cache')
+    args = parser.parse_args()
+
+    results = run_cascaded_ocr(args.image, args.output, detector=args.detector, margin=args.margin,
+                               use_cache=not args.no_cache)
+    print(f"Extracted {len(results)} text entries")
@@ -1,12 +1,32 @@
+import os
 import cv2
+import time
+import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-def find_multiple_cards_and_crop(image_path, output_dir=None):
-    # 1) Read image
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"Error: Could not read {image_path}")
-        return []
+from image_preprocess import refine_corners, collect_input_images
+
+# Long side of the image the contour search runs on in find_card_crops
+DETECT_MAX_DIM = 1024
+
+def detect_card_quads(img, min_area_ratio=0.05, max_dim=None, kernel_size=7):
+    """
+    Find rectangular card/table outlines in a BGR image.
+    Returns (contour index, approx polygon, ordered corners) for every candidate.
+
+    With `max_dim` the search runs on a copy downscaled to that long side and
+    the polygons/corners are mapped back to full-resolution coordinates.
+    """
+    scale = 1.0
+    if max_dim and max(img.shape[:2]) > max_dim:
+        scale = max_dim / float(max(img.shape[:2]))
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        # Shrink the closing kernel too, or the outlines grow by a kernel width in full-res pixels
+        small_kernel = max(3, int(round(kernel_size * scale)) | 1)
+        quads = detect_card_quads(small, min_area_ratio=min_area_ratio, kernel_size=small_kernel)
+        return [(i, np.round(approx / scale).astype(approx.dtype), rect / scale)
+                for i, approx, rect in quads]
 
     # 2) Convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -16,7 +36,7 @@ def find_multiple_cards_and_crop(image_path, output_dir=None):
     edges = cv2.Canny(gray, 30, 200)
 
     # 4) Morphological close
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7,7))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
     edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
     edges = cv2.dilate(edges, kernel, iterations=1)
 
@@ -28,14 +48,11 @@ def find_multiple_cards_and_crop(image_path, output_dir=None):
     # 6) Sort contours by area descending (so we see biggest first if we want)
     contours = sorted(contours, key=cv2.contourArea, reverse=True)
 
-    # Instead of keeping only the "best_crop," let's keep *all* valid crops
-    all_crops = []
-    debug_img = img.copy()
-
+    quads = []
     for i, c in enumerate(contours):
         area = cv2.contourArea(c)
         # Adjust threshold
-        if area < 0.05 * img_area:
+        if area < min_area_ratio * img_area:
             continue
 
         peri = cv2.arcLength(c, True)
@@ -43,9 +60,6 @@ def find_multiple_cards_and_crop(image_path, output_dir=None):
 
         # If we have 4 corners, it might be a table/card
         if len(approx) == 4:
-            # Draw contour for debugging
-            cv2.drawContours(debug_img, [approx], -1, (0, 255, 0), 3)
-
             # Reorder corners
             pts = approx.reshape((4,2))
             rect = order_points(pts)
@@ -59,27 +73,179 @@ def find_multiple_cards_and_crop(image_path, output_dir=None):
 
             # If this ratio check is too strict, remove or relax it
             if 0.3 <= aspect_ratio <= 2.0:
-                cropped = four_point_transform(img, rect)
-                all_crops.append(cropped)
-
-                # Optionally save each crop to a folder
-                if output_dir:
-                    outpath = f"{output_dir}/crop_{i}.jpg"
-                    cv2.imwrite(outpath, cropped)
-                    print(f"Saved: {outpath}")
-
-    # Debug image: save in the same output directory if specified
-    if output_dir:
-        debug_path = f"{output_dir}/debug_contours.jpg"
-    else:
-        debug_path = "debug_contours.jpg"
-    cv2.imwrite(debug_path, debug_img)
-    
-    if output_dir:
+                quads.append((i, approx, rect))
+    return quads
+
+def find_card_boxes(img, min_area_ratio=0.05, max_dim=None):
+    """Axis-aligned [x1, y1, x2, y2] boxes around the detected cards/tables."""
+    boxes = []
+    for _, _, rect in detect_card_quads(img, min_area_ratio=min_area_ratio, max_dim=max_dim):
+        x1, y1 = rect.min(axis=0)
+        x2, y2 = rect.max(axis=0)
+        boxes.append([float(x1), float(y1), float(x2), float(y2)])
+    return boxes
+
+class CardCrop:
+    """
+    One detected card: full-resolution corners plus a reference to the source
+    image (no pixels are copied). warp() produces the top-down crop on demand.
+    """
+
+    __slots__ = ('image', 'index', 'approx', 'corners')
+
+    def __init__(self, image, index, approx, corners):
+        self.image = image
+        self.index = index
+        self.approx = approx
+        self.corners = corners
+
+    @property
+    def bbox(self):
+        x1, y1 = self.corners.min(axis=0)
+        x2, y2 = self.corners.max(axis=0)
+        return [float(x1), float(y1), float(x2), float(y2)]
+
+    @property
+    def size(self):
+        """(width, height) of the warped crop, without warping."""
+        (tl, tr, br, bl) = self.corners
+        return (int(max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl))),
+                int(max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl))))
+
+    def warp(self):
+        return four_point_transform(self.image, self.corners)
+
+    def save(self, path):
+        cv2.imwrite(path, self.warp())
+        return path
+
+    def __repr__(self):
+        return f"CardCrop(index={self.index}, bbox={[round(v, 1) for v in self.bbox]}, size={self.size})"
+
+def find_card_crops(image, min_area_ratio=0.05, max_dim=DETECT_MAX_DIM, refine=True):
+    """
+    Lightweight crop descriptors for every card in a BGR image (or image path).
+
+    Detection runs on a copy downscaled to `max_dim`; with `refine` the
+    corners are snapped back onto the full-resolution edges with sub-pixel
+    refinement. Nothing is warped until CardCrop.warp() is called.
+    """
+    img = cv2.imread(image) if isinstance(image, str) else image
+    if img is None:
+        print(f"Error: Could not read {image}")
+        return []
+    crops = []
+    for i, approx, rect in detect_card_quads(img, min_area_ratio=min_area_ratio, max_dim=max_dim):
+        if refine and max_dim and max(img.shape[:2]) > max_dim:
+            # The search window has to cover the ~one-downscaled-pixel error plus the edge blur
+            radius = max(4, 2 * int(np.ceil(max(img.shape[:2]) / max_dim)))
+            rect = refine_corners(img, rect, radius=radius)
+        crops.append(CardCrop(img, i, approx, rect.astype(np.float32)))
+    return crops
+
+def draw_debug(img, crops):
+    """Copy of the image with every detected outline drawn in green."""
+    debug_img = img.copy()
+    for crop in crops:
+        cv2.drawContours(debug_img, [crop.corners.astype(np.int32).reshape(-1, 1, 2)], -1, (0, 255, 0), 3)
+    return debug_img
+
+def find_multiple_cards_and_crop(image_path, output_dir=None, debug=False, max_dim=None):
+    """
+    Warp every detected card and return the crops as arrays.
+
+    Crops are saved to `output_dir` when given; the debug image with all
+    outlines is only written with debug=True. `max_dim` detects on a
+    downscaled copy (see find_card_crops).
+    """
+    # 1) Read image
+    img = cv2.imread(image_path)
+    if img is None:
+        print(f"Error: Could not read {image_path}")
+        return []
+
+    # Instead of keeping only the "best_crop," let's keep *all* valid crops
+    crops = find_card_crops(img, max_dim=max_dim, refine=bool(max_dim))
+    all_crops = []
+    for crop in crops:
+        cropped = crop.warp()
+        all_crops.append(cropped)
+
+        # Optionally save each crop to a folder
+        if output_dir:
+            outpath = f"{output_dir}/crop_{crop.index}.jpg"
+            cv2.imwrite(outpath, cropped)
+            print(f"Saved: {outpath}")
+
+    if debug:
+        # Debug image: save in the same output directory if specified
+        debug_path = os.path.join(output_dir or ".", "debug_contours.jpg")
+        cv2.imwrite(debug_path, draw_debug(img, crops))
         print(f"Saved debug image: {debug_path}")
 
     return all_crops  # return a list of all cropped rectangles
 
+def _init_crop_worker():
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+
+def _crop_worker(image_path, output_dir, max_dim, debug):
+    """Detect and save the crops of one image; only corners and paths go back to the parent."""
+    start = time.perf_counter()
+    crops = find_card_crops(image_path, max_dim=max_dim)
+    saved = []
+    if output_dir and crops:
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        folder = os.path.join(output_dir, stem)
+        os.makedirs(folder, exist_ok=True)
+        saved = [crop.save(os.path.join(folder, f"crop_{crop.index}.jpg")) for crop in crops]
+        if debug:
+            cv2.imwrite(os.path.join(folder, "debug_contours.jpg"), draw_debug(crops[0].image, crops))
+    return {'corners': [crop.corners.tolist() for crop in crops], 'crops': saved,
+            'elapsed': time.perf_counter() - start}
+
+def crop_images(source, output_dir=None, workers=None, max_in_flight=None, max_dim=DETECT_MAX_DIM, debug=False):
+    """
+    Find (and, with `output_dir`, save) the cards of many images on a process pool.
+
+    `source` is a directory, glob pattern, manifest file or list of paths.
+    Crops of each image go to <output_dir>/<image stem>/crop_<i>.jpg.
+    Returns {image path: {'corners', 'crops', 'elapsed'}} and per-file errors.
+    """
+    paths = list(source) if isinstance(source, (list, tuple)) else collect_input_images(source)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    total = len(paths)
+    print(f"Cropping cards from {total} images with {workers} workers")
+
+    results, errors = {}, {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_crop_worker) as executor:
+        pending = {}
+        path_iter = iter(paths)
+        while True:
+            for path in path_iter:
+                pending[executor.submit(_crop_worker, path, output_dir, max_dim, debug)] = path
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = pending.pop(future)
+                try:
+                    results[path] = future.result()
+                    print(f"[{len(results) + len(errors)}/{total}] {path}: "
+                          f"{len(results[path]['corners'])} cards ({results[path]['elapsed']:.2f}s)")
+                except Exception as e:
+                    errors[path] = str(e)
+                    print(f"[{len(results) + len(errors)}/{total}] FAILED {path}: {e}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Finished: {sum(len(r['corners']) for r in results.values())} cards from {len(results)} images "
+          f"in {elapsed:.1f}s, {len(errors)} failed")
+    return {'results': results, 'errors': errors, 'elapsed': elapsed}
+
 def order_points(pts):
     """Order rectangle corners: [top-left, top-right, bottom-right, bottom-left]."""
     rect = np.zeros((4, 2), dtype="float32")
@@ -113,7 +279,23 @@ def four_point_transform(image, rect):
     return warped
 
 # Example usage:
-all_tables = find_multiple_cards_and_crop("inputs/IMG_5056.png", output_dir="output/crop_model1")
-print(f"Found {len(all_tables)} rectangular tables.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Find and crop rectangular cards/tables.')
+    parser.add_argument('--batch', type=str, help='Directory, glob pattern or manifest file of images')
+    parser.add_argument('--output-dir', type=str, default="output/crop_model1")
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--max-dim', type=int, default=DETECT_MAX_DIM, help='Long side used for detection')
+    parser.add_argument('--debug', action='store_true', help='Also save the outline debug image')
+    args = parser.parse_args()
+
+    if args.batch:
+        summary = crop_images(args.batch, args.output_dir, workers=args.workers, max_dim=args.max_dim,
+                              debug=args.debug)
+        if summary['errors']:
+            raise SystemExit(1)
+    else:
+        all_tables = find_multiple_cards_and_crop("inputs/IMG_5056.png", output_dir="output/crop_model1",
+                                                  debug=args.debug)
+        print(f"Found {len(all_tables)} rectangular tables.")
 
 #this model is not working well on "bad" images.
\ No newline at end of file
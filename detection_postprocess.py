@@ -0,0 +1,126 @@
+import torch
+
+# torchvision's compiled NMS is used when available
+try:
+    from torchvision.ops import batched_nms as _tv_batched_nms
+except ImportError:
+    _tv_batched_nms = None
+
+
+def box_cxcywh_to_xyxy(boxes):
+    """(..., 4) center/size boxes to corner boxes, without splitting into Python lists."""
+    centers, sizes = boxes[..., :2], boxes[..., 2:]
+    return torch.cat([centers - 0.5 * sizes, centers + 0.5 * sizes], dim=-1)
+
+
+def postprocess_detections(logits, pred_boxes, target_sizes, threshold=0.0, keep_labels=None,
+                           include_no_object=True):
+    """
+    Vectorized DETR-style post-processing for a whole batch.
+
+    `logits` is (B, Q, C + 1) with the last class meaning "no object",
+    `pred_boxes` is (B, Q, 4) normalized cxcywh and `target_sizes` is a list of
+    (width, height). With include_no_object=True a query is kept when its best
+    class (over all classes) is a real one, as in the table-transformer
+    examples; otherwise the best real class is used, as in
+    post_process_object_detection. Scores must exceed `threshold`, and
+    `keep_labels` optionally restricts the label ids.
+
+    Returns one dict of 'scores', 'labels', 'boxes' (xyxy pixels) and 'queries'
+    (indices of the kept queries) tensors per image.
+    """
+    probs = logits.softmax(-1)
+    no_object = probs.shape[-1] - 1
+    if include_no_object:
+        scores, labels = probs.max(-1)
+        keep = labels != no_object
+    else:
+        scores, labels = probs[..., :-1].max(-1)
+        keep = torch.ones_like(scores, dtype=torch.bool)
+    if threshold > 0:
+        keep &= scores > threshold
+    if keep_labels is not None:
+        keep &= torch.isin(labels, torch.as_tensor(list(keep_labels), device=labels.device))
+
+    sizes = torch.as_tensor(target_sizes, dtype=pred_boxes.dtype, device=pred_boxes.device)
+    scale = sizes.repeat(1, 2)[:, None, :]  # (B, 1, 4) as [w, h, w, h]
+    boxes = box_cxcywh_to_xyxy(pred_boxes) * scale
+
+    return [{'scores': scores[b][keep[b]], 'labels': labels[b][keep[b]], 'boxes': boxes[b][keep[b]],
+             'queries': torch.nonzero(keep[b]).flatten()}
+            for b in range(logits.shape[0])]
+
+
+def detections_to_objects(detections, id2label):
+    """[{'label', 'score', 'bbox'}] dicts from one image's postprocess_detections output."""
+    return [{'label': id2label[label], 'score': score, 'bbox': bbox}
+            for label, score, bbox in zip(detections['labels'].tolist(),
+                                          detections['scores'].tolist(),
+                                          detections['boxes'].tolist())]
+
+
+def _nms(boxes, scores, iou_threshold):
+    """Plain torch NMS used when torchvision is not installed."""
+    order = scores.argsort(descending=True)
+    boxes = boxes[order]
+    x1, y1, x2, y2 = boxes.unbind(-1)
+    areas = (x2 - x1).clamp(min=0) * (y2 - y1).clamp(min=0)
+    ix1 = torch.maximum(x1[:, None], x1[None, :])
+    iy1 = torch.maximum(y1[:, None], y1[None, :])
+    ix2 = torch.minimum(x2[:, None], x2[None, :])
+    iy2 = torch.minimum(y2[:, None], y2[None, :])
+    inter = (ix2 - ix1).clamp(min=0) * (iy2 - iy1).clamp(min=0)
+    iou = inter / (areas[:, None] + areas[None, :] - inter).clamp(min=1e-9)
+    suppressed = torch.zeros(len(order), dtype=torch.bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_threshold
+    return order[torch.as_tensor(keep, dtype=torch.long)]
+
+
+def batched_nms(boxes, scores, groups, iou_threshold=0.5):
+    """NMS applied independently per group id; returns kept indices sorted by score."""
+    if boxes.numel() == 0:
+        return torch.empty(0, dtype=torch.long)
+    if _tv_batched_nms is not None:
+        return _tv_batched_nms(boxes, scores, groups, iou_threshold)
+    # Shift each group far apart so a single NMS pass never compares across groups
+    offsets = groups.to(boxes.dtype) * (boxes.max() + 1)
+    return _nms(boxes + offsets[:, None], scores, iou_threshold)
+
+
+def merge_region_proposals(sources, iou_threshold=0.5, class_agnostic=True, default_score=0.5):
+    """
+    Merge region proposals from several detectors into one deduplicated list.
+
+    `sources` maps a detector name to a list of regions: dicts with 'bbox'
+    ([x1, y1, x2, y2]) and optionally 'score' and 'label', or bare boxes (as
+    returned by crop_model1.find_card_boxes) which get `default_score`.
+    Overlapping regions are suppressed with NMS, across detectors when
+    class_agnostic is True and per label otherwise. Each kept region records
+    the detector it came from under 'source'.
+    """
+    regions = []
+    for source, items in sources.items():
+        for item in items:
+            if not isinstance(item, dict):
+                item = {'bbox': item}
+            regions.append({'bbox': [float(v) for v in item['bbox']],
+                            'score': float(item.get('score', default_score)),
+                            'label': item.get('label', 'region'),
+                            'source': source})
+    if not regions:
+        return []
+
+    boxes = torch.tensor([r['bbox'] for r in regions], dtype=torch.float32)
+    scores = torch.tensor([r['score'] for r in regions], dtype=torch.float32)
+    if class_agnostic:
+        groups = torch.zeros(len(regions), dtype=torch.long)
+    else:
+        label_ids = {label: i for i, label in enumerate(sorted({str(r['label']) for r in regions}))}
+        groups = torch.tensor([label_ids[str(r['label'])] for r in regions], dtype=torch.long)
+    keep = batched_nms(boxes, scores, groups, iou_threshold)
+    return [regions[i] for i in keep.tolist()]
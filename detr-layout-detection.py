@@ -1,88 +1,194 @@
 import torch
 from PIL import Image
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+import threading
 
-from transformers import AutoImageProcessor
-from transformers.models.detr import DetrForSegmentation
+from onnx_backend import build_runner, DEFAULT_ONNX_DIR
+from model_snapshot import load_pretrained, DEFAULT_SNAPSHOT_DIR
+from detection_postprocess import postprocess_detections
+from overlay_render import render_layout_detections, save_image
 
-# Load your image here
-image_path = "inputs/IMG_5056.png"
-img = Image.open(image_path)  # Load the image
+MODEL_NAME = "cmarkea/detr-layout-detection"
 
-# Convert image to RGB format to ensure compatibility
-img = img.convert('RGB')
 
-img_proc = AutoImageProcessor.from_pretrained(
-    "cmarkea/detr-layout-detection"
-)
-model = DetrForSegmentation.from_pretrained(
-    "cmarkea/detr-layout-detection"
-)
+class LayoutDetector:
+    """
+    DETR layout model loaded once and reused for many images.
 
-with torch.inference_mode():
-    input_ids = img_proc(img, return_tensors='pt')
-    output = model(**input_ids)
+    `backend` is "torch", "onnx" or "onnx-int8"; the ONNX backends export only the
+    detection head, so segmentation masks need the torch backend. The model
+    is loaded on first use, from the model_snapshot.py snapshot in
+    `snapshot_dir` when there is one.
+    """
 
-threshold = 0.4
+    snapshot_name = "detr-layout-detection"
 
-segmentation_mask = img_proc.post_process_segmentation(
-    output,
-    threshold=threshold,
-    target_sizes=[img.size[::-1]]
-)
+    def __init__(self, model_name=MODEL_NAME, threshold=0.4, num_threads=None,
+                 backend="torch", onnx_dir=DEFAULT_ONNX_DIR, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model_name = model_name
+        self.threshold = threshold
+        self.num_threads = num_threads
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.snapshot_dir = snapshot_dir
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Build the model, processor and backend runner if that has not happened yet; returns self."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from transformers import AutoImageProcessor
+                    from transformers.models.detr import DetrForSegmentation
+                    model, self._img_proc = load_pretrained(DetrForSegmentation, AutoImageProcessor,
+                                                            self.model_name, self.snapshot_name,
+                                                            self.snapshot_dir)
+                    # Boxes only need the inner object-detection model, not the mask head
+                    self._runner = build_runner(model.detr, self.backend, self.onnx_dir,
+                                                self.snapshot_name, self.num_threads)
+                    self._model = model
+        return self
+
+    @property
+    def model(self):
+        return self.load()._model
+
+    @property
+    def img_proc(self):
+        return self.load()._img_proc
+
+    # Same name as TableDetector, used by model_snapshot.py
+    image_processor = img_proc
+
+    @property
+    def runner(self):
+        return self.load()._runner
+
+    def _forward(self, images, runner):
+        input_ids = self.img_proc(images, return_tensors='pt')
+        with torch.inference_mode():
+            return runner(**input_ids), input_ids
+
+    def detect(self, images, masks="none"):
+        """
+        Boxes, scores and labels per image (post_process_object_detection format).
+
+        `masks` adds a 'masks' entry for the kept detections only:
+        "none" (default, the mask head is not run), "rle" (one run-length
+        encoded mask per detection, see rle_encode) or "full" (a K x H x W
+        bool tensor). Masks need the torch model, whatever the backend.
+        """
+        if masks not in ("none", "rle", "full"):
+            raise ValueError(f"masks must be 'none', 'rle' or 'full', not {masks!r}")
+        images = [image.convert('RGB') for image in images]
+        target_sizes = [image.size[::-1] for image in images]
+        output, input_ids = self._forward(images, self.runner if masks == "none" else self.model)
+        # Same scores as post_process_object_detection, in one vectorized pass (sizes as width, height)
+        results = postprocess_detections(output.logits, output.pred_boxes,
+                                         [image.size for image in images],
+                                         threshold=self.threshold, include_no_object=False)
+        if masks == "none":
+            return results
+
+        pixel_mask = input_ids.get('pixel_mask')
+        for b, result in enumerate(results):
+            query_masks = output.pred_masks[b, result['queries']]
+            if pixel_mask is not None:
+                # Drop the batch padding before resizing to the original image
+                in_h, in_w = pixel_mask.shape[-2:]
+                valid_h = int(pixel_mask[b].any(1).sum())
+                valid_w = int(pixel_mask[b].any(0).sum())
+                mask_h, mask_w = query_masks.shape[-2:]
+                query_masks = query_masks[:, :int(round(valid_h * mask_h / in_h)), :int(round(valid_w * mask_w / in_w))]
+            result['masks'] = upsample_masks(query_masks, target_sizes[b], rle=(masks == "rle"))
+        return results
+
+
+def upsample_masks(query_masks, size, rle=False, mask_threshold=0.5):
+    """
+    Resize low-resolution mask logits (K x h x w) to `size` and binarize them.
+    With rle=True each mask is encoded right away, so only one full-size mask exists at a time.
+    """
+    if not rle:
+        full = torch.nn.functional.interpolate(query_masks[:, None], size=tuple(size), mode="bilinear")
+        return full[:, 0].sigmoid() > mask_threshold
+    encoded = []
+    for query_mask in query_masks:
+        full = torch.nn.functional.interpolate(query_mask[None, None], size=tuple(size), mode="bilinear")
+        encoded.append(rle_encode((full[0, 0].sigmoid() > mask_threshold).numpy()))
+    return encoded
+
+
+def rle_encode(mask):
+    """
+    COCO-style uncompressed RLE of a 2-D bool mask: column-major run lengths,
+    starting with a (possibly empty) run of zeros.
+    """
+    flat = np.asarray(mask, dtype=bool).ravel(order='F')
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    counts = np.diff(bounds).tolist()
+    if flat.size and flat[0]:
+        counts = [0] + counts
+    return {'size': [int(mask.shape[0]), int(mask.shape[1])], 'counts': counts}
+
+
+def rle_decode(rle):
+    """Inverse of rle_encode."""
+    h, w = rle['size']
+    values = np.zeros(len(rle['counts']), dtype=bool)
+    values[1::2] = True
+    flat = np.repeat(values, rle['counts'])
+    return flat.reshape((h, w), order='F')
 
-bbox_pred = img_proc.post_process_object_detection(
-    output,
-    threshold=threshold,
-    target_sizes=[img.size[::-1]]
-)
 
 # Function to visualize results
 def visualize_results(image, segmentation_mask, bbox_pred, save_path=None):
-    # Reduce figure size from 15,15 to 8,8
-    plt.figure(figsize=(8, 8))
-    
-    # Convert image to numpy array
-    image_np = np.array(image)
-    
-    # Display the image
-    plt.imshow(image_np)
-    
-    # Plot segmentation mask
+    """
+    Draw the first image's masks and boxes with the headless overlay renderer.
+
+    Saves to `save_path` when given and returns the rendered RGB array;
+    safe to call from several threads at once.
+    """
+    masks = []
     if len(segmentation_mask) > 0:
-        mask = segmentation_mask[0]['masks']  # Get the masks from the dictionary
-        if len(mask) > 0:  # Check if there are any masks
-            mask_array = mask[0].squeeze().numpy()  # Convert first mask tensor to numpy
-            plt.imshow(mask_array, alpha=0.5)  # Overlay the mask
-    
-    # Plot bounding boxes
-    for box in bbox_pred[0]['boxes']:
-        x1, y1, x2, y2 = box.tolist()
-        plt.gca().add_patch(plt.Rectangle((x1, y1), x2 - x1, y2 - y1,
-                                        edgecolor='red', facecolor='none', linewidth=2))
-    
-    plt.axis('off')
-    plt.title("Detected Tables and Segmentation Masks", fontsize=10)
-    plt.tight_layout()
-    
+        masks = segmentation_mask[0].get('masks', [])  # Get the masks from the dictionary
+        masks = [rle_decode(mask) if isinstance(mask, dict) else mask for mask in masks]
+
+    rendered = render_layout_detections(image, bbox_pred[0]['boxes'].tolist(), masks,
+                                        title="Detected Tables and Segmentation Masks")
+
     if save_path:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path)
+        save_image(rendered, save_path)
         print(f"Visualization saved to {save_path}")
-    else:
-        plt.show()
+    return rendered
+
+
+if __name__ == "__main__":
+    # Load your image here
+    image_path = "inputs/IMG_5056.png"
+    img = Image.open(image_path)  # Load the image
+
+    # Convert image to RGB format to ensure compatibility
+    img = img.convert('RGB')
+
+    detector = LayoutDetector(threshold=0.4)
+    # Run-length masks for the kept detections only; boxes come with them
+    bbox_pred = detector.detect([img], masks="rle")
+    segmentation_mask = bbox_pred
 
-# Create output path
-output_dir = "output/detr-layout-detection"
-os.makedirs(output_dir, exist_ok=True)
+    # Create output path
+    output_dir = "output/detr-layout-detection"
+    os.makedirs(output_dir, exist_ok=True)
 
-# Get the filename without extension
-image_filename = os.path.basename(image_path)
-image_name = os.path.splitext(image_filename)[0]
-output_path = os.path.join(output_dir, f"{image_name}_detection.png")
+    # Get the filename without extension
+    image_filename = os.path.basename(image_path)
+    image_name = os.path.splitext(image_filename)[0]
+    output_path = os.path.join(output_dir, f"{image_name}_detection.png")
 
-# Call the visualization function with save path
-visualize_results(img, segmentation_mask, bbox_pred, save_path=output_path)
\ No newline at end of file
+    # Call the visualization function with save path
+    visualize_results(img, segmentation_mask, bbox_pred, save_path=output_path)
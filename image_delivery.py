@@ -0,0 +1,314 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+import cv2
+import numpy as np
+
+from ocr_cache import DEFAULT_CACHE_DIR, get_cache, make_key
+from overlay_render import encode_image
+
+# Longest side in pixels per rendition; None keeps the original size
+RENDITIONS = {'thumb': 320, 'preview': 1280, 'full': None}
+FORMATS = {'jpeg': ('.jpg', 'image/jpeg'), 'webp': ('.webp', 'image/webp')}
+DEFAULT_QUALITY = int(os.environ.get('IMAGE_QUALITY', 85))
+SOURCE_EXT = '.src'
+# File tokens are signed paths relative to one of these folders (os.pathsep-separated; default: working directory)
+IMAGE_ROOTS = [root for root in os.environ.get('IMAGE_ROOTS', '').split(os.pathsep) if root] or ['.']
+# Signing key shared by every worker; generated into TOKEN_KEY_FILE on first use unless IMAGE_TOKEN_SECRET is set
+TOKEN_KEY_FILE = os.environ.get('IMAGE_TOKEN_KEY_FILE', os.path.join(DEFAULT_CACHE_DIR, 'image_token.key'))
+
+
+class Rendition:
+    __slots__ = ('data', 'etag', 'last_modified', 'mimetype', 'immutable')
+
+    def __init__(self, data, etag, last_modified, mimetype, immutable=False):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.mimetype = mimetype
+        self.immutable = immutable
+
+
+def is_not_modified(etag, last_modified, if_none_match=None, if_modified_since=None):
+    """
+    Conditional GET check (RFC 9110): If-None-Match wins when present,
+    otherwise If-Modified-Since is compared at one-second resolution.
+    """
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/').strip('"') == etag for tag in tags)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def negotiate_format(requested=None, accept=''):
+    """'jpeg' or 'webp': an explicit request wins, 'auto'/None picks WebP when the client accepts it."""
+    if requested in FORMATS:
+        return requested
+    return 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+
+
+def load_token_secret(key_file=TOKEN_KEY_FILE):
+    """IMAGE_TOKEN_SECRET, or the key stored in `key_file` (created once, race-free across processes)."""
+    secret = os.environ.get('IMAGE_TOKEN_SECRET')
+    if secret:
+        return secret.encode('utf-8')
+    try:
+        with open(key_file, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(key_file) or '.', exist_ok=True)
+    tmp_path = f"{key_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(os.urandom(32))
+    try:
+        # link() fails if another process got there first; everyone then reads the same key
+        os.link(tmp_path, key_file)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(key_file, 'rb') as f:
+        return f.read()
+
+
+def resize_to(image, max_side):
+    h, w = image.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return image
+    scale = max_side / max(h, w)
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+class ImageDelivery:
+    """
+    Binary, cacheable image renditions for the web UI.
+
+    Images are addressed by a token: register_file() hands one out for an
+    image on disk (document and upload images), publish_array() stores an
+    in-memory image such as the annotated OCR result under its content hash.
+    get() returns the encoded bytes of a rendition together with its ETag;
+    renditions are built once and kept in the 'images' result cache.
+
+    File tokens carry the file's path relative to one of `roots` plus an
+    HMAC of it, so no token table is kept: they stay valid across restarts
+    and in every worker that shares the signing key, and a token can only
+    name a file under the roots.
+
+    A file's ETag comes from its path, mtime and size, so checking a
+    conditional request only needs a stat() and never touches the pixels.
+    """
+
+    def __init__(self, cache=None, quality=DEFAULT_QUALITY, url_prefix='/images', roots=None, secret=None):
+        self.cache = cache or get_cache('images')
+        self.quality = quality
+        self.url_prefix = url_prefix
+        self.roots = [os.path.realpath(root) for root in (roots or IMAGE_ROOTS)]
+        self._secret = secret.encode('utf-8') if isinstance(secret, str) else (secret or load_token_secret())
+
+    def _sign(self, index, relpath):
+        return hmac.new(self._secret, f"{index}:{relpath}".encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def register_file(self, path):
+        """Token for an image file under one of the roots; raises ValueError for any other path."""
+        path = os.path.realpath(path)
+        for index, root in enumerate(self.roots):
+            if os.path.commonpath([root, path]) == root:
+                relpath = os.path.relpath(path, root)
+                encoded = base64.urlsafe_b64encode(relpath.encode('utf-8')).decode('ascii').rstrip('=')
+                return f"f{index}.{encoded}.{self._sign(index, relpath)}"
+        raise ValueError(f"{path} is not under an image root ({', '.join(self.roots)})")
+
+    def _file_path(self, token):
+        """Path named by a file token, or None (content tokens, bad signatures, paths outside the roots)."""
+        parts = token.split('.')
+        if len(parts) != 3 or not parts[0][1:].isdigit() or parts[0][0] != 'f':
+            return None
+        index, encoded, signature = int(parts[0][1:]), parts[1], parts[2]
+        if index >= len(self.roots):
+            return None
+        try:
+            relpath = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode('utf-8')
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(index, relpath)):
+            return None
+        root = self.roots[index]
+        path = os.path.realpath(os.path.join(root, relpath))
+        return path if os.path.commonpath([root, path]) == root else None
+
+    def publish_array(self, image):
+        """Store an RGB array (losslessly, as PNG) and return its content token."""
+        data = encode_image(image, '.png')
+        token = make_key(data)
+        self.cache.put(token, data, SOURCE_EXT)
+        return token
+
+    def url(self, token, size='full'):
+        return f"{self.url_prefix}/{token}" + ('' if size == 'full' else f"?size={size}")
+
+    def result_image_urls(self, original, annotated=None):
+        """
+        The /process_image image fields as URLs instead of base64 strings.
+        Both arguments may be a path or an RGB array.
+        """
+        urls = {}
+        for field, image in (('original_image', original), ('image', annotated)):
+            if image is None:
+                continue
+            token = self.register_file(image) if isinstance(image, str) else self.publish_array(image)
+            urls[f"{field}_url"] = self.url(token, 'preview')
+            urls[f"{field}_full_url"] = self.url(token)
+        return urls
+
+    def _version(self, token):
+        """(version string, last-modified timestamp, immutable) or None for an unknown token."""
+        path = self._file_path(token)
+        if path is not None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            return f"{path}:{st.st_mtime_ns}:{st.st_size}", st.st_mtime, False
+        if not self.cache.contains(token, SOURCE_EXT):
+            return None
+        # Content-addressed tokens never change
+        return token, None, True
+
+    def etag(self, token, size='full', fmt='jpeg'):
+        version = self._version(token)
+        if version is None:
+            return None
+        key = make_key(version[0].encode('utf-8'), {'size': size, 'fmt': fmt, 'quality': self.quality})
+        return key[:32], version[1], version[2]
+
+    def _load_source(self, token):
+        path = self._file_path(token)
+        if path is not None:
+            with open(path, 'rb') as f:
+                return f.read(), os.path.splitext(path)[1].lower()
+        return self.cache.get(token, SOURCE_EXT), '.png'
+
+    def _build(self, token, size, fmt):
+        data, ext = self._load_source(token)
+        if data is None:
+            return None, False
+        target_ext = FORMATS[fmt][0]
+        # Originals already in the requested format are sent as they are
+        if size == 'full' and ext in (('.jpg', '.jpeg') if fmt == 'jpeg' else ('.webp',)):
+            return data, True
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not decode image {token}")
+        image = resize_to(image, RENDITIONS[size])
+        return encode_image(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), target_ext, quality=self.quality), False
+
+    def get(self, token, size='full', fmt='jpeg'):
+        """The Rendition for this token, size and format (built and cached on first use), or None."""
+        if size not in RENDITIONS:
+            raise ValueError(f"Unknown rendition: {size}")
+        tag = self.etag(token, size, fmt)
+        if tag is None:
+            return None
+        etag, last_modified, immutable = tag
+        ext = FORMATS[fmt][0]
+        data = self.cache.get(etag, ext)
+        if data is None:
+            data, passthrough = self._build(token, size, fmt)
+            if data is None:
+                return None
+            if not passthrough:
+                self.cache.put(etag, data, ext)
+        return Rendition(data, etag, last_modified, FORMATS[fmt][1], immutable)
+
+    def precompute(self, token, sizes=('thumb', 'preview'), formats=('jpeg', 'webp')):
+        """Build renditions ahead of the first request (e.g. right after a document is saved)."""
+        for size in sizes:
+            for fmt in formats:
+                self.get(token, size, fmt)
+
+
+def cache_headers(rendition):
+    headers = {'ETag': f'"{rendition.etag}"', 'Vary': 'Accept'}
+    if rendition.last_modified is not None:
+        headers['Last-Modified'] = formatdate(rendition.last_modified, usegmt=True)
+    # Content-addressed images can be cached forever, files are revalidated with the ETag
+    headers['Cache-Control'] = ('public, max-age=31536000, immutable' if rendition.immutable
+                                else 'private, no-cache')
+    return headers
+
+
+def register_image_routes(app, delivery, document_image_path):
+    """
+    Add binary image routes to a Flask app.
+
+        GET /documents/<document_id>/image   the document's image
+        GET {delivery.url_prefix}/<token>    an image from result_image_urls()
+
+    Both take ?size=thumb|preview|full (default full) and ?format=jpeg|webp
+    (default: WebP when the browser accepts it) and answer conditional
+    requests with 304. `document_image_path(document_id)` returns the stored
+    image path of a document, or None.
+    """
+    from flask import Response, jsonify, request
+
+    def serve(token):
+        size = request.args.get('size', 'full')
+        if size not in RENDITIONS:
+            return jsonify({'success': False, 'error': f"Unknown size: {size}"}), 400
+        fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+        tag = delivery.etag(token, size, fmt)
+        if tag is None:
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        etag, last_modified, immutable = tag
+        if is_not_modified(etag, last_modified, request.headers.get('If-None-Match'),
+                           request.headers.get('If-Modified-Since')):
+            headers = cache_headers(Rendition(None, etag, last_modified, None, immutable))
+            return Response(status=304, headers=headers)
+        rendition = delivery.get(token, size, fmt)
+        if rendition is None:
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        return Response(rendition.data, mimetype=rendition.mimetype, headers=cache_headers(rendition))
+
+    def document_image(document_id):
+        path = document_image_path(document_id)
+        if not path or not os.path.exists(path):
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        try:
+            token = delivery.register_file(path)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        return serve(token)
+
+    app.add_url_rule('/documents/<document_id>/image', 'document_image', document_image, methods=['GET'])
+    app.add_url_rule(f"{delivery.url_prefix}/<token>", 'image_rendition', serve, methods=['GET'])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute thumbnail and preview renditions for images.')
+    parser.add_argument('images', nargs='+', help='Image files')
+    parser.add_argument('--sizes', nargs='+', default=['thumb', 'preview'], choices=list(RENDITIONS))
+    parser.add_argument('--formats', nargs='+', default=['jpeg', 'webp'], choices=list(FORMATS))
+    args = parser.parse_args()
+
+    delivery = ImageDelivery(roots=sorted({os.path.dirname(os.path.abspath(path)) for path in args.images}))
+    for path in args.images:
+        start = time.perf_counter()
+        token = delivery.register_file(path)
+        delivery.precompute(token, args.sizes, args.formats)
+        sizes = {f"{size}/{fmt}": len(delivery.get(token, size, fmt).data)
+                 for size in args.sizes for fmt in args.formats}
+        print(f"{path}: {sizes} in {time.perf_counter() - start:.2f}s")
@@ -1,7 +1,14 @@
 import cv2
 import numpy as np
 import argparse
+import glob
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import ocr_cache
 
 
 #Deskew – Corrects small rotations in the image
@@ -29,6 +36,96 @@ def deskew_image(image):
                              borderMode=cv2.BORDER_REPLICATE)
     return rotated
 
+def _skew_mask(image, max_dim):
+    """Otsu foreground (text) mask of a downscaled copy of the image, used only to estimate the skew angle."""
+    h, w = image.shape[:2]
+    scale = min(1.0, max_dim / float(max(h, w)))
+    if scale < 1.0:
+        # Shrink before converting so no full-resolution gray/mask copy is ever made
+        image = cv2.resize(image, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))),
+                           interpolation=cv2.INTER_AREA)
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return mask
+
+def _skew_minarea(mask, max_angle, max_points=200000):
+    pts = cv2.findNonZero(mask)  # int32 (x, y) pairs instead of int64 np.where output
+    if pts is None or len(pts) < 5:
+        return 0.0
+    if len(pts) > max_points:
+        pts = np.ascontiguousarray(pts[::int(np.ceil(len(pts) / max_points))])
+    angle = cv2.minAreaRect(pts)[-1]
+    # Normalise to the rectangle's tilt in (-45, 45]; works for both minAreaRect angle conventions
+    angle = (angle + 45.0) % 90.0 - 45.0
+    if abs(angle) > max_angle:
+        return 0.0
+    return angle
+
+def _skew_projection(mask, max_angle, step=0.5):
+    """Pick the rotation whose horizontal projection profile has the sharpest peaks (text lines)."""
+    h, w = mask.shape[:2]
+    center = (w / 2.0, h / 2.0)
+
+    def score(angle):
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(mask, M, (w, h), flags=cv2.INTER_NEAREST)
+        profile = cv2.reduce(rotated, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel().astype(np.float64)
+        return np.sum(np.diff(profile) ** 2)
+
+    best = max(np.arange(-max_angle, max_angle + step, step), key=score)
+    # Refine around the coarse optimum
+    fine = np.arange(best - step, best + step + 0.1, 0.1)
+    return float(max(fine, key=score))
+
+def _skew_hough(mask, max_angle):
+    """Median angle of the long, nearly horizontal line segments (text lines merged by a wide close)."""
+    h, w = mask.shape[:2]
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, w // 50), 1))
+    merged = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    edges = cv2.Canny(merged, 50, 150)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 720, threshold=max(20, w // 10),
+                            minLineLength=w // 4, maxLineGap=max(5, w // 100))
+    if lines is None:
+        return 0.0
+    x1, y1, x2, y2 = lines.reshape(-1, 4).T.astype(np.float64)
+    angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+    angles = angles[np.abs(angles) <= max_angle]
+    if angles.size == 0:
+        return 0.0
+    return float(np.median(angles))
+
+def estimate_skew_angle(image, method="minarea", max_dim=1000, max_angle=45.0):
+    """
+    Estimate the rotation (degrees, as passed to cv2.getRotationMatrix2D) that deskews the image.
+    The estimate runs on a copy whose longest side is at most `max_dim` pixels.
+    `method` is "minarea", "projection" or "hough".
+    """
+    mask = _skew_mask(image, max_dim)
+    if method == "minarea":
+        return _skew_minarea(mask, max_angle)
+    if method == "projection":
+        return _skew_projection(mask, max_angle)
+    if method == "hough":
+        return _skew_hough(mask, max_angle)
+    raise ValueError(f"Unknown deskew method: {method}")
+
+def rotate_image(image, angle):
+    """Rotate around the image center, keeping the original size."""
+    (h, w) = image.shape[:2]
+    center = (w / 2.0, h / 2.0)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(image, M, (w, h),
+                          flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+def fast_deskew_image(image, method="minarea", max_dim=1000, max_angle=45.0, min_angle=0.1):
+    """Estimate the skew on a downscaled mask, then rotate once at full resolution."""
+    angle = estimate_skew_angle(image, method=method, max_dim=max_dim, max_angle=max_angle)
+    if abs(angle) < min_angle:
+        # Not worth a full-resolution resample
+        return image
+    return rotate_image(image, angle)
+
 #CLAHE – Corrects uneven lighting
 def clahe_enhance(image):
     """Apply CLAHE for local contrast enhancement."""
@@ -47,8 +144,11 @@ def gamma_correction(image, gamma=1.2):
                       for i in range(256)]).astype("uint8")
     return cv2.LUT(image, table)
 
-def find_document_corners(image, min_area_ratio=0.3):
-    """Try to locate a rectangular contour that occupies at least `min_area_ratio` of the image."""
+# Longest side (in pixels) of the copy used to look for the page outline
+CORNER_DETECT_MAX_DIM = 1024
+
+def _find_quad(image, min_area_ratio):
+    """Contour search for the largest 4-sided polygon covering at least `min_area_ratio` of the image."""
     h, w = image.shape[:2]
     img_area = h * w
     
@@ -61,20 +161,70 @@ def find_document_corners(image, min_area_ratio=0.3):
     edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
 
     contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    contours = sorted(contours, key=cv2.contourArea, reverse=True)
+    # Drop contours too small to be the full document before sorting the rest
+    min_area = min_area_ratio * img_area
+    candidates = [(area, c) for area, c in ((cv2.contourArea(c), c) for c in contours) if area >= min_area]
+    candidates.sort(key=lambda item: item[0], reverse=True)
 
-    for c in contours:
-        area = cv2.contourArea(c)
-        if area < min_area_ratio * img_area:
-            # skip if too small to be the full document
-            continue
-        
+    for _, c in candidates:
         peri = cv2.arcLength(c, True)
         approx = cv2.approxPolyDP(c, 0.02 * peri, True)
         
         if len(approx) == 4:
             return approx.reshape((4, 2))
     return None
+
+def refine_corners(image, corners, radius=8):
+    """
+    Sub-pixel refinement of approximate corners on the full-resolution image.
+    Only a small window around each corner is converted to gray; corners that
+    drift further than `radius` are kept at their approximate position.
+    """
+    h, w = image.shape[:2]
+    refined = corners.astype(np.float32).copy()
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+    pad = 2 * radius + 2
+    for i, (x, y) in enumerate(corners):
+        x0, y0 = max(0, int(x) - pad), max(0, int(y) - pad)
+        x1, y1 = min(w, int(x) + pad + 1), min(h, int(y) + pad + 1)
+        patch = image[y0:y1, x0:x1]
+        if patch.shape[0] <= 2 * radius + 4 or patch.shape[1] <= 2 * radius + 4:
+            continue
+        if patch.ndim == 3:
+            patch = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        pt = np.array([[[x - x0, y - y0]]], dtype=np.float32)
+        cv2.cornerSubPix(patch, pt, (radius, radius), (-1, -1), criteria)
+        new_x, new_y = pt[0, 0, 0] + x0, pt[0, 0, 1] + y0
+        if np.hypot(new_x - x, new_y - y) <= radius:
+            refined[i] = (new_x, new_y)
+    return refined
+
+def find_document_corners(image, min_area_ratio=0.3, scale=1.0):
+    """
+    Try to locate a rectangular contour that occupies at least `min_area_ratio` of the image.
+
+    With `scale` < 1 the contour search runs on a copy resized by that factor and
+    the corners are mapped back and refined at full resolution. `scale=None` picks
+    a factor so the longest side is CORNER_DETECT_MAX_DIM pixels.
+    """
+    h, w = image.shape[:2]
+    if scale is None:
+        scale = CORNER_DETECT_MAX_DIM / float(max(h, w))
+    if scale >= 1.0:
+        return _find_quad(image, min_area_ratio)
+
+    small_w, small_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    small = cv2.resize(image, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    corners = _find_quad(small, min_area_ratio)
+    if corners is None:
+        return None
+
+    # Map pixel centers back to the original grid
+    fx, fy = w / float(small_w), h / float(small_h)
+    corners = corners.astype(np.float32)
+    corners[:, 0] = (corners[:, 0] + 0.5) * fx - 0.5
+    corners[:, 1] = (corners[:, 1] + 0.5) * fy - 0.5
+    return refine_corners(image, corners, radius=max(4, int(np.ceil(max(fx, fy))) * 2))
 #Order points – Orders the corner points of the document
 def order_points(pts):
     """Order corner points [top-left, top-right, bottom-right, bottom-left]."""
@@ -89,13 +239,8 @@ def order_points(pts):
     
     return rect
 
-def dewarp_image(image, min_area_ratio=0.3):
-    """Perform perspective transform if a 4-corner document is detected."""
-    corners = find_document_corners(image, min_area_ratio=min_area_ratio)
-    if corners is None:
-        # No suitable rectangle found, return as-is
-        return image
-    
+def dewarp_transform(corners):
+    """Perspective matrix and output size that map the document corners to an upright rectangle."""
     rect = order_points(corners)
     (tl, tr, br, bl) = rect
     widthA = np.linalg.norm(br - bl)
@@ -113,75 +258,324 @@ def dewarp_image(image, min_area_ratio=0.3):
         [0, maxHeight - 1]], dtype="float32")
     
     M = cv2.getPerspectiveTransform(rect, dst)
-    warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
+    return M, (maxWidth, maxHeight)
+
+def dewarp_image(image, min_area_ratio=0.3, scale=None):
+    """
+    Perform perspective transform if a 4-corner document is detected.
+    Corners are searched on a downscaled copy (see find_document_corners); only the
+    final warp runs at full resolution. Pass scale=1.0 for the full-resolution search.
+    """
+    corners = find_document_corners(image, min_area_ratio=min_area_ratio, scale=scale)
+    if corners is None:
+        # No suitable rectangle found, return as-is
+        return image
+    
+    M, size = dewarp_transform(corners)
+    warped = cv2.warpPerspective(image, M, size)
     return warped
 
 
+# Steps used by preprocess_image: dewarp -> CLAHE -> gamma
+DEFAULT_PIPELINE_STEPS = [
+    ("dewarp", {"min_area_ratio": 0.3}),
+    ("clahe", {"clip_limit": 2.0, "tile_grid_size": (8, 8)}),
+    ("gamma", {"gamma": 1.2}),
+]
+
+# Colour space each step expects its input in; CLAHE leaves the image in LAB so
+# that consecutive LAB steps do not pay for a BGR round trip.
+_STEP_INPUT_SPACE = {"deskew": "BGR", "dewarp": "BGR", "clahe": "LAB", "gamma": "BGR"}
+
+def _gamma_table(gamma):
+    invGamma = 1.0 / gamma
+    return (((np.arange(256) / 255.0) ** invGamma) * 255).astype("uint8")
+
+class PreprocessPipeline:
+    """
+    Preprocessing steps compiled once from a config and reused across images.
+
+    `steps` is an ordered list of (name, params) with names "deskew", "dewarp",
+    "clahe" and "gamma". Gamma LUTs and CLAHE objects are built up front,
+    consecutive gamma steps are folded into one LUT, and scratch buffers are
+    reused for images of the same size. One pipeline should be used by one
+    thread at a time (CLAHE objects are not thread-safe).
+    """
+
+    def __init__(self, steps=None, max_buffer_shapes=4):
+        self.steps = []
+        for name, params in (DEFAULT_PIPELINE_STEPS if steps is None else steps):
+            params = dict(params or {})
+            if name == "deskew":
+                compiled = params
+            elif name == "dewarp":
+                compiled = {"min_area_ratio": params.get("min_area_ratio", 0.3),
+                            "scale": params.get("scale")}
+            elif name == "clahe":
+                compiled = cv2.createCLAHE(clipLimit=params.get("clip_limit", 2.0),
+                                           tileGridSize=tuple(params.get("tile_grid_size", (8, 8))))
+            elif name == "gamma":
+                table = _gamma_table(params.get("gamma", 1.2))
+                if self.steps and self.steps[-1][0] == "gamma":
+                    # Two LUTs in a row are one LUT
+                    self.steps[-1] = ("gamma", table[self.steps[-1][1]])
+                    continue
+                compiled = table
+            else:
+                raise ValueError(f"Unknown preprocessing step: {name}")
+            self.steps.append((name, compiled))
+        self.max_buffer_shapes = max_buffer_shapes
+        self._buffers = {}
+
+    def _buffer(self, key, shape):
+        """Scratch array for (key, shape), allocated once and reused for later images of the same size."""
+        buf = self._buffers.get((key, shape))
+        if buf is None:
+            if len(self._buffers) >= self.max_buffer_shapes * 4:
+                self._buffers.clear()
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[(key, shape)] = buf
+        return buf
+
+    def _scratch(self, current, shape):
+        """One of two ping-pong buffers, never the array currently being read."""
+        buf = self._buffer("a", shape)
+        if buf is current:
+            buf = self._buffer("b", shape)
+        return buf
+
+    def _convert(self, image, space, target):
+        if space == target:
+            return image
+        code = cv2.COLOR_BGR2LAB if target == "LAB" else cv2.COLOR_LAB2BGR
+        return cv2.cvtColor(image, code, dst=self._scratch(image, image.shape))
+
+    def run(self, image, on_step=None, copy=True):
+        """
+        Run all steps on a BGR image and return the BGR result.
+
+        `on_step(name, bgr_image)` is called after each step (used for debug output).
+        With copy=False the result may be a scratch buffer that the next run() overwrites.
+        The input image is never modified.
+        """
+        current, space = image, "BGR"
+        for name, compiled in self.steps:
+            current = self._convert(current, space, _STEP_INPUT_SPACE[name])
+            space = _STEP_INPUT_SPACE[name]
+            if name == "deskew":
+                params = {k: v for k, v in compiled.items() if k != "min_angle"}
+                angle = estimate_skew_angle(current, **params)
+                if abs(angle) >= compiled.get("min_angle", 0.1):
+                    h, w = current.shape[:2]
+                    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+                    current = cv2.warpAffine(current, M, (w, h), dst=self._scratch(current, current.shape),
+                                             flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+            elif name == "dewarp":
+                corners = find_document_corners(current, **compiled)
+                if corners is not None:
+                    M, (out_w, out_h) = dewarp_transform(corners)
+                    out_shape = (out_h, out_w) + current.shape[2:]
+                    current = cv2.warpPerspective(current, M, (out_w, out_h),
+                                                  dst=self._scratch(current, out_shape))
+            elif name == "clahe":
+                # current is always a scratch LAB buffer here; equalise L in place instead of split/merge
+                l_channel = self._buffer("L", current.shape[:2])
+                cv2.extractChannel(current, 0, dst=l_channel)
+                compiled.apply(l_channel, dst=l_channel)
+                cv2.insertChannel(l_channel, current, 0)
+            elif name == "gamma":
+                current = cv2.LUT(current, compiled, dst=self._scratch(current, current.shape))
+            if on_step is not None:
+                on_step(name, current if space == "BGR" else cv2.cvtColor(current, cv2.COLOR_LAB2BGR))
+
+        current = self._convert(current, space, "BGR")
+        return current.copy() if copy else current
+
+
+_PIPELINES = threading.local()
+
+def get_pipeline(deskew=False):
+    """Per-thread cached pipeline for the standard steps, optionally preceded by deskew."""
+    cache = getattr(_PIPELINES, "cache", None)
+    if cache is None:
+        cache = _PIPELINES.cache = {}
+    pipeline = cache.get(deskew)
+    if pipeline is None:
+        steps = ([("deskew", {})] if deskew else []) + DEFAULT_PIPELINE_STEPS
+        pipeline = cache[deskew] = PreprocessPipeline(steps)
+    return pipeline
+
+
 def debug_preprocessing(img_path, output_prefix="debug_step"):
     """Debug function that outputs each preprocessing step as a separate image."""
-    import os
-    
     # Create output directory if it doesn't exist
     output_dir = "output/image-preprocessing"
     os.makedirs(output_dir, exist_ok=True)
 
     # Load original
     image = cv2.imread(img_path)
-    step_count = 1
+    step_count = [1]
 
     # Step 0: Save the original to compare later
-    cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count}_original.jpg", image)
-    step_count += 1
+    cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count[0]}_original.jpg", image)
+    step_count[0] += 1
 
-    # Step 1: Deskew
-    #deskewed = deskew_image(image)
-    #cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count}_deskewed.jpg", deskewed)
-    #step_count += 1
+    # Steps 1-4: deskew, dewarp, CLAHE, gamma; each intermediate result is written out
+    labels = {"deskew": "deskewed", "dewarp": "dewarped", "clahe": "clahe", "gamma": "gamma"}
 
-    # Step 2: Dewarp
-    dewarped = dewarp_image(image, min_area_ratio=0.3)
-    cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count}_dewarped.jpg", dewarped)
-    step_count += 1
+    def save_step(name, step_image):
+        cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count[0]}_{labels[name]}.jpg", step_image)
+        step_count[0] += 1
 
-    # Step 3: CLAHE
-    clahe_result = clahe_enhance(dewarped)
-    cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count}_clahe.jpg", clahe_result)
-    step_count += 1
+    return get_pipeline(deskew=True).run(image, on_step=save_step)
 
-    # Step 4: Gamma correction
-    gamma_result = gamma_correction(clahe_result, gamma=1.2)
-    cv2.imwrite(f"{output_dir}/{output_prefix}_{step_count}_gamma.jpg", gamma_result)
-    step_count += 1
+# Bump when the preprocessing code changes in a way that alters its output
+PREPROCESS_VERSION = 1
 
-    return gamma_result
+# Output formats whose written pixels differ from the array that was encoded
+LOSSY_EXTENSIONS = ('.jpg', '.jpeg', '.webp')
 
 # Add new function for command-line usage without modifying existing code
-def preprocess_image(input_path, output_path):
-    """Process an image through the full preprocessing pipeline and save the result."""
+def preprocess_image(input_path, output_path, deskew=False, use_cache=True):
+    """
+    Process an image through the full preprocessing pipeline and save the result.
+    Results are cached by image content and settings; pass use_cache=False to bypass the cache.
+    Returns the pixels of the written file, so the result is the same on cache hits and misses.
+    """
     # Make sure output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    # Load image
-    image = cv2.imread(input_path)
+    # Load image bytes once: they are both hashed for the cache and decoded
+    try:
+        with open(input_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        data = b''
+    ext = os.path.splitext(output_path)[1].lower() or '.jpg'
+    cache = None
+    if use_cache and data and not ocr_cache.cache_disabled():
+        cache = ocr_cache.get_cache('preprocess')
+        key = ocr_cache.make_key(data, {'deskew': deskew, 'steps': DEFAULT_PIPELINE_STEPS, 'ext': ext},
+                                 version=(PREPROCESS_VERSION, cv2.__version__))
+        encoded = cache.get(key, ext)
+        if encoded is not None:
+            with open(output_path, 'wb') as f:
+                f.write(encoded)
+            print(f"Processed image saved to {output_path} (cached)")
+            return cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None
     if image is None:
         raise ValueError(f"Could not read image from {input_path}")
     
-    # Apply preprocessing steps (similar to debug_preprocessing)
-    # Step 1: Dewarp
-    dewarped = dewarp_image(image, min_area_ratio=0.3)
-    
-    # Step 2: CLAHE
-    clahe_result = clahe_enhance(dewarped)
-    
-    # Step 3: Gamma correction
-    final_result = gamma_correction(clahe_result, gamma=1.2)
+    # Dewarp -> CLAHE -> gamma (optionally deskew first), with cached LUTs and buffers
+    final_result = get_pipeline(deskew=deskew).run(image)
     
     # Save the result
-    cv2.imwrite(output_path, final_result)
+    ok, encoded = cv2.imencode(ext, final_result)
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    with open(output_path, 'wb') as f:
+        f.write(encoded.tobytes())
+    if cache is not None:
+        cache.put(key, encoded.tobytes(), ext)
     print(f"Processed image saved to {output_path}")
     
+    if ext in LOSSY_EXTENSIONS:
+        # What a cache hit returns: the encoded file, not the pre-compression array
+        return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
     return final_result
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+def collect_input_images(source):
+    """Resolve a directory, glob pattern or manifest file (one path per line) into a sorted list of image paths."""
+    if os.path.isdir(source):
+        paths = [os.path.join(root, name)
+                 for root, _, files in os.walk(source)
+                 for name in files
+                 if name.lower().endswith(IMAGE_EXTENSIONS)]
+    elif os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        # Manifest file: relative entries are resolved against the manifest's folder
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = [line.strip() for line in f]
+        paths = [entry if os.path.isabs(entry) else os.path.join(base_dir, entry)
+                 for entry in entries if entry and not entry.startswith('#')]
+    else:
+        paths = [p for p in glob.glob(source, recursive=True)
+                 if p.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(paths)
+
+def batch_output_path(input_path, output_dir, taken, suffix="_processed", ext=".jpg"):
+    """Stable output name: <stem><suffix><ext>, plus a short hash of the source path if the stem is already used."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    name = f"{stem}{suffix}{ext}"
+    if name in taken:
+        digest = hashlib.sha1(os.path.abspath(input_path).encode('utf-8')).hexdigest()[:8]
+        name = f"{stem}_{digest}{suffix}{ext}"
+    taken.add(name)
+    return os.path.join(output_dir, name)
+
+def _init_batch_worker():
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+
+def _batch_worker(input_path, output_path, deskew, use_cache):
+    start = time.perf_counter()
+    preprocess_image(input_path, output_path, deskew=deskew, use_cache=use_cache)
+    return time.perf_counter() - start
+
+def preprocess_batch(source, output_dir, workers=None, max_in_flight=None, suffix="_processed",
+                     deskew=False, use_cache=True):
+    """
+    Run dewarp -> CLAHE -> gamma over many images on a process pool.
+
+    `source` is a directory, glob pattern, manifest file or list of paths. At most
+    `max_in_flight` images are queued at once (default: twice the worker count).
+    Returns a summary dict with the processed outputs and per-file errors.
+    """
+    paths = list(source) if isinstance(source, (list, tuple)) else collect_input_images(source)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    taken = set()
+    jobs = [(path, batch_output_path(path, output_dir, taken, suffix=suffix)) for path in paths]
+    total = len(jobs)
+    print(f"Preprocessing {total} images with {workers} workers")
+
+    outputs, errors = {}, {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as executor:
+        pending = {}
+        job_iter = iter(jobs)
+        done_count = 0
+        while True:
+            # Keep the queue topped up without loading every image at once
+            for input_path, output_path in job_iter:
+                future = executor.submit(_batch_worker, input_path, output_path, deskew, use_cache)
+                pending[future] = (input_path, output_path)
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                input_path, output_path = pending.pop(future)
+                done_count += 1
+                try:
+                    elapsed = future.result()
+                    outputs[input_path] = output_path
+                    print(f"[{done_count}/{total}] OK {input_path} -> {output_path} ({elapsed:.2f}s)")
+                except Exception as e:
+                    errors[input_path] = str(e)
+                    print(f"[{done_count}/{total}] FAILED {input_path}: {e}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Batch finished: {len(outputs)} ok, {len(errors)} failed in {elapsed:.1f}s")
+    return {'outputs': outputs, 'errors': errors, 'elapsed': elapsed}
+
 # Only add this part to enable command-line arguments without affecting existing code
 if __name__ == "__main__":
     # If arguments are provided, use them
@@ -190,12 +584,30 @@ if __name__ == "__main__":
         parser = argparse.ArgumentParser(description='Preprocess an image for OCR.')
         parser.add_argument('--input', type=str, help='Path to input image')
         parser.add_argument('--output', type=str, help='Path to save processed image')
+        parser.add_argument('--deskew', action='store_true',
+                            help='Correct small rotations before dewarping (fast estimator)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Bypass the preprocessing result cache')
+        parser.add_argument('--batch', type=str,
+                            help='Directory, glob pattern or manifest file of images to preprocess')
+        parser.add_argument('--output-dir', type=str, help='Folder for batch outputs')
+        parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Maximum number of images queued at once')
         
         args = parser.parse_args()
         
+        if args.batch:
+            if not args.output_dir:
+                parser.error("--output-dir is required with --batch")
+            summary = preprocess_batch(args.batch, args.output_dir, workers=args.workers,
+                                       max_in_flight=args.max_in_flight, deskew=args.deskew,
+                                       use_cache=not args.no_cache)
+            if summary['errors']:
+                os.sys.exit(1)
         # If both input and output are provided, run preprocessing
-        if args.input and args.output:
-            preprocess_image(args.input, args.output)
+        elif args.input and args.output:
+            preprocess_image(args.input, args.output, deskew=args.deskew, use_cache=not args.no_cache)
         else:
             print("Both --input and --output arguments are required.")
     else:
@@ -1,203 +1,183 @@
-# Load model directly
-from transformers import AutoImageProcessor, TableTransformerForObjectDetection
+# transformers is imported when the model is first loaded (see TableDetector.load)
 from PIL import Image
-from huggingface_hub import hf_hub_download
-from torchvision import transforms
+import numpy as np
+import itertools
+import threading
 import torch
 import os
 
-# Initialize the model directly from pretrained
-image_processor = AutoImageProcessor.from_pretrained("microsoft/table-transformer-detection")
-model = TableTransformerForObjectDetection.from_pretrained("microsoft/table-transformer-detection")
+from onnx_backend import build_runner, DEFAULT_ONNX_DIR
+from model_snapshot import load_pretrained, DEFAULT_SNAPSHOT_DIR
+from detection_postprocess import box_cxcywh_to_xyxy, postprocess_detections, detections_to_objects
+from overlay_render import render_table_detections, save_image
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model.to(device)
-print(f"Model loaded successfully and moved to {device}")
+MODEL_NAME = "microsoft/table-transformer-detection"
 
-# let's load an example image
-file_path = 'inputs/IMG_5056.png'
-print(f"Loading image from: {file_path}")
-image = Image.open(file_path).convert("RGB")
-print("Image loaded successfully.")
-# let's display it a bit smaller
-width, height = image.size
-
-
-
-class MaxResize(object):
-    def __init__(self, max_size=800):
-        self.max_size = max_size
-
-    def __call__(self, image):
-        width, height = image.size
-        current_max_size = max(width, height)
-        scale = self.max_size / current_max_size
-        resized_image = image.resize((int(round(scale*width)), int(round(scale*height))))
-
-        return resized_image
-
-detection_transform = transforms.Compose([
-    MaxResize(800),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-])
-
-
-class MaxResize(object):
-    def __init__(self, max_size=800):
-        self.max_size = max_size
-
-    def __call__(self, image):
-        width, height = image.size
-        current_max_size = max(width, height)
-        scale = self.max_size / current_max_size
-        resized_image = image.resize((int(round(scale*width)), int(round(scale*height))))
-
-        return resized_image
-
-detection_transform = transforms.Compose([
-    MaxResize(800),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-])
-
-
-# Prepare image for the model
-inputs = image_processor(images=image, return_tensors="pt").to(device)
-
-# Run inference
-with torch.no_grad():
-    print("Running model inference...")
-    outputs = model(**inputs)
-    print("Model inference completed.")
-    
-    # Debugging: Print raw outputs
-    print(f"Raw outputs: {outputs}")
 
 # for output bounding box post-processing
-def box_cxcywh_to_xyxy(x):
-    x_c, y_c, w, h = x.unbind(-1)
-    b = [(x_c - 0.5 * w), (y_c - 0.5 * h), (x_c + 0.5 * w), (y_c + 0.5 * h)]
-    return torch.stack(b, dim=1)
-
-
 def rescale_bboxes(out_bbox, size):
     img_w, img_h = size
     b = box_cxcywh_to_xyxy(out_bbox)
-    b = b * torch.tensor([img_w, img_h, img_w, img_h], dtype=torch.float32)
-    return b
-
-
-# update id2label to include "no object"
-id2label = model.config.id2label
-id2label[len(model.config.id2label)] = "no object"
-
-
-def outputs_to_objects(outputs, img_size, id2label):
-    m = outputs.logits.softmax(-1).max(-1)
-    pred_labels = list(m.indices.detach().cpu().numpy())[0]
-    pred_scores = list(m.values.detach().cpu().numpy())[0]
-    pred_bboxes = outputs['pred_boxes'].detach().cpu()[0]
-    pred_bboxes = [elem.tolist() for elem in rescale_bboxes(pred_bboxes, img_size)]
-
-    objects = []
-    for label, score, bbox in zip(pred_labels, pred_scores, pred_bboxes):
-        class_label = id2label[int(label)]
-        if not class_label == 'no object':
-            objects.append({'label': class_label, 'score': float(score),
-                            'bbox': [float(elem) for elem in bbox]})
-
-    return objects
-     
-
-# Process outputs
-objects = outputs_to_objects(outputs, image.size, id2label)
-print(f"Detected objects: {objects}")
-
-# Check if any objects were detected
-if not objects:
-    print("No objects detected. Please check the image quality or model suitability.")
-else:
-    print(f"Detected objects: {objects}")
-
-
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import Patch
-
-def fig2img(fig):
-    """Convert a Matplotlib figure to a PIL Image and return it"""
-    import io
-    buf = io.BytesIO()
-    fig.savefig(buf)
-    buf.seek(0)
-    img = Image.open(buf)
-    return img
+    return b * b.new_tensor([img_w, img_h, img_w, img_h])
+
+
+def outputs_to_objects(outputs, img_size, id2label, index=0):
+    """Detections for image `index` of a (possibly batched) model output, in pixel coordinates."""
+    detections = postprocess_detections(outputs.logits[index:index + 1].detach().cpu(),
+                                        outputs['pred_boxes'][index:index + 1].detach().cpu(),
+                                        [img_size])[0]
+    return detections_to_objects(detections, id2label)
+
+
+def load_rgb_image(image):
+    """Accept a file path, a PIL image or an RGB numpy array and return an RGB PIL image."""
+    if isinstance(image, str):
+        return Image.open(image).convert("RGB")
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image).convert("RGB")
+    return image.convert("RGB")
+
+
+class TableDetector:
+    """
+    Table-transformer detection model loaded once and reused for many images.
+
+    Images are run through the model in padded mini-batches of `batch_size`
+    under torch.inference_mode(); `num_threads` sets the CPU intra-op threads.
+    `backend` is "torch", "onnx" or "onnx-int8"; the ONNX files are exported to
+    `onnx_dir` on first use and give the same post-processed objects.
+
+    Nothing is loaded until the first detection (or an explicit load()); a
+    snapshot saved with model_snapshot.py in `snapshot_dir` is preferred
+    over the Hugging Face hub.
+    """
+
+    snapshot_name = "table-transformer-detection"
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=1, num_threads=None, device=None,
+                 backend="torch", onnx_dir=DEFAULT_ONNX_DIR, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.snapshot_dir = snapshot_dir
+        if backend != "torch":
+            # onnxruntime runs on the CPU
+            device = "cpu"
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Build the model, processor and backend runner if that has not happened yet; returns self."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from transformers import AutoImageProcessor, TableTransformerForObjectDetection
+                    model, self._image_processor = load_pretrained(
+                        TableTransformerForObjectDetection, AutoImageProcessor,
+                        self.model_name, self.snapshot_name, self.snapshot_dir)
+                    model.to(self.device)
+                    self._runner = build_runner(model, self.backend, self.onnx_dir, self.snapshot_name,
+                                                self.num_threads)
+                    # update id2label to include "no object"
+                    self._id2label = dict(model.config.id2label)
+                    self._id2label[len(model.config.id2label)] = "no object"
+                    self._model = model
+                    print(f"Model loaded successfully and moved to {self.device} ({self.backend} backend)")
+        return self
+
+    @property
+    def model(self):
+        return self.load()._model
+
+    @property
+    def image_processor(self):
+        return self.load()._image_processor
+
+    @property
+    def runner(self):
+        return self.load()._runner
+
+    @property
+    def id2label(self):
+        return self.load()._id2label
+
+    def detect_batch(self, images):
+        """Run one padded mini-batch; returns one list of objects per image."""
+        self.load()
+        images = [load_rgb_image(image) for image in images]
+        # The processor resizes each image and pads the batch to a common size (with a pixel mask)
+        inputs = self.image_processor(images=images, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            outputs = self.runner(**inputs)
+        # One vectorized post-processing pass for the whole batch
+        detections = postprocess_detections(outputs.logits.cpu(), outputs.pred_boxes.cpu(),
+                                            [image.size for image in images])
+        return [detections_to_objects(d, self.id2label) for d in detections]
+
+    def iter_detect(self, images):
+        """Yield detections image by image for a list or iterator of images."""
+        images = iter(images)
+        while True:
+            batch = list(itertools.islice(images, self.batch_size))
+            if not batch:
+                return
+            for objects in self.detect_batch(batch):
+                yield objects
+
+    def detect(self, images):
+        """Detections for every image, in input order."""
+        return list(self.iter_detect(images))
 
 
 def visualize_detected_tables(img, det_tables, out_path=None):
-    plt.imshow(img, interpolation="lanczos")
-    fig = plt.gcf()
-    fig.set_size_inches(8, 8)
-    ax = plt.gca()
-
-    for det_table in det_tables:
-        bbox = det_table['bbox']
-
-        if det_table['label'] == 'table':
-            facecolor = (1, 0, 0.45)
-            edgecolor = (1, 0, 0.45)
-            alpha = 0.3
-            linewidth = 2
-            hatch='//////'
-        elif det_table['label'] == 'table rotated':
-            facecolor = (0.95, 0.6, 0.1)
-            edgecolor = (0.95, 0.6, 0.1)
-            alpha = 0.3
-            linewidth = 2
-            hatch='//////'
-        else:
-            continue
-
-        rect = patches.Rectangle(bbox[:2], bbox[2]-bbox[0], bbox[3]-bbox[1], linewidth=linewidth,
-                                    edgecolor='none',facecolor=facecolor, alpha=0.1)
-        ax.add_patch(rect)
-        rect = patches.Rectangle(bbox[:2], bbox[2]-bbox[0], bbox[3]-bbox[1], linewidth=linewidth,
-                                    edgecolor=edgecolor,facecolor='none',linestyle='-', alpha=alpha)
-        ax.add_patch(rect)
-        rect = patches.Rectangle(bbox[:2], bbox[2]-bbox[0], bbox[3]-bbox[1], linewidth=0,
-                                    edgecolor=edgecolor,facecolor='none',linestyle='-', hatch=hatch, alpha=0.2)
-        ax.add_patch(rect)
-
-    plt.xticks([], [])
-    plt.yticks([], [])
-
-    legend_elements = [Patch(facecolor=(1, 0, 0.45), edgecolor=(1, 0, 0.45),
-                                label='Table', hatch='//////', alpha=0.3),
-                        Patch(facecolor=(0.95, 0.6, 0.1), edgecolor=(0.95, 0.6, 0.1),
-                                label='Table (rotated)', hatch='//////', alpha=0.3)]
-    plt.legend(handles=legend_elements, bbox_to_anchor=(0.5, -0.02), loc='upper center', borderaxespad=0,
-                    fontsize=8, ncol=2)
-    plt.axis('off')
-
+    """
+    Draw the detected tables (fill, outline, hatching and legend) with the
+    headless OpenCV renderer; no pyplot state is touched, so this is safe to
+    call from several threads. Returns the rendered RGB array and saves it
+    to `out_path` when given.
+    """
+    rendered = render_table_detections(img, det_tables)
     if out_path is not None:
-      plt.savefig(out_path, bbox_inches='tight', dpi=150)
+        save_image(rendered, out_path)
+    return rendered
 
-    return fig
 
-# Create output directory if it doesn't exist
-output_dir = "output/Microsoft-table-transformer"
-os.makedirs(output_dir, exist_ok=True)
+if __name__ == "__main__":
+    detector = TableDetector(batch_size=1)
 
-# Get the filename from the input path
-input_filename = os.path.basename(file_path)
-output_filename = os.path.splitext(input_filename)[0] + "_detected.png"
-output_path = os.path.join(output_dir, output_filename)
+    # let's load an example image
+    file_path = 'inputs/IMG_5056.png'
+    print(f"Loading image from: {file_path}")
+    image = Image.open(file_path).convert("RGB")
+    print("Image loaded successfully.")
 
-# Visualize and save the result
-fig = visualize_detected_tables(image, objects, out_path=output_path)
-print(f"Visualization saved to: {output_path}")
+    # Run inference
+    print("Running model inference...")
+    objects = detector.detect([image])[0]
+    print("Model inference completed.")
+    print(f"Detected objects: {objects}")
 
-# Remove the plt.show() call to prevent popup
-plt.close(fig)  # Close the figure to free memory
-print("Processing complete.")
\ No newline at end of file
+    # Check if any objects were detected
+    if not objects:
+        print("No objects detected. Please check the image quality or model suitability.")
+    else:
+        print(f"Detected objects: {objects}")
+
+    # Create output directory if it doesn't exist
+    output_dir = "output/Microsoft-table-transformer"
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Get the filename from the input path
+    input_filename = os.path.basename(file_path)
+    output_filename = os.path.splitext(input_filename)[0] + "_detected.png"
+    output_path = os.path.join(output_dir, output_filename)
+
+    # Visualize and save the result
+    visualize_detected_tables(image, objects, out_path=output_path)
+    print(f"Visualization saved to: {output_path}")
+    print("Processing complete.")
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import argparse
+
+DEFAULT_SNAPSHOT_DIR = os.environ.get('MODEL_SNAPSHOT_DIR', 'models/snapshots')
+MANIFEST_NAME = 'snapshot.json'
+
+
+def snapshot_path(snapshot_dir, name):
+    return os.path.join(snapshot_dir, name)
+
+
+def has_snapshot(snapshot_dir, name):
+    return bool(snapshot_dir) and os.path.exists(os.path.join(snapshot_path(snapshot_dir, name), MANIFEST_NAME))
+
+
+def load_pretrained(model_cls, processor_cls, model_name, name, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """
+    (model, processor) from the local snapshot `name` when one exists, otherwise from `model_name`.
+
+    Snapshots are read with local_files_only=True, so a start from a
+    snapshot never touches the network.
+    """
+    start = time.perf_counter()
+    if has_snapshot(snapshot_dir, name):
+        source = snapshot_path(snapshot_dir, name)
+        kwargs = {'local_files_only': True}
+    else:
+        source, kwargs = model_name, {}
+    processor = processor_cls.from_pretrained(source, **kwargs)
+    model = model_cls.from_pretrained(source, **kwargs)
+    model.eval()
+    print(f"Loaded {name} from {source} in {time.perf_counter() - start:.2f}s")
+    return model, processor
+
+
+def save_snapshot(model, processor, model_name, path):
+    """
+    Write a self-contained safetensors weights + config + processor bundle.
+
+    The backbone is marked as not pretrained in the saved config: its weights
+    are already in the checkpoint, and loading must not download timm ones.
+    """
+    os.makedirs(path, exist_ok=True)
+    config = model.config
+    if getattr(config, 'use_pretrained_backbone', False):
+        config.use_pretrained_backbone = False
+    model.save_pretrained(path, safe_serialization=True)
+    processor.save_pretrained(path)
+
+    import transformers
+    manifest = {'model_name': model_name, 'model_class': type(model).__name__,
+                'transformers_version': transformers.__version__, 'created': time.time()}
+    with open(os.path.join(path, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Saved snapshot of {model_name} to {path}")
+    return path
+
+
+def _load_layout_module():
+    import importlib.util
+    # The layout script has a hyphen in its file name, so it is loaded by path
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'detr-layout-detection.py')
+    spec = importlib.util.spec_from_file_location('detr_layout_detection', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_detector(model, snapshot_dir=DEFAULT_SNAPSHOT_DIR, **kwargs):
+    """TableDetector ('table') or LayoutDetector ('layout') reading snapshots from `snapshot_dir`."""
+    if model == 'table':
+        from microsoft_table_transformer_detection import TableDetector
+        return TableDetector(snapshot_dir=snapshot_dir, **kwargs)
+    if model == 'layout':
+        return _load_layout_module().LayoutDetector(snapshot_dir=snapshot_dir, **kwargs)
+    raise ValueError(f"Unknown model: {model}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Save offline snapshots of the transformer detectors.')
+    parser.add_argument('--model', choices=['table', 'layout', 'all'], default='all')
+    parser.add_argument('--output', type=str, default=DEFAULT_SNAPSHOT_DIR, help='Snapshot directory')
+    parser.add_argument('--onnx', action='store_true',
+                        help='Also export the onnx and onnx-int8 graphs so later starts skip the export')
+    args = parser.parse_args()
+
+    for model in (['table', 'layout'] if args.model == 'all' else [args.model]):
+        # Always snapshot the hub weights, not an older snapshot
+        detector = make_detector(model, snapshot_dir=None)
+        save_snapshot(detector.model, detector.image_processor, detector.model_name,
+                      snapshot_path(args.output, detector.snapshot_name))
+        if args.onnx:
+            for backend in ('onnx', 'onnx-int8'):
+                make_detector(model, snapshot_dir=args.output, backend=backend).load()
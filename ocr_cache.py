@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+# Defaults can be overridden per process through the environment
+DEFAULT_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', 'output/.cache')
+DEFAULT_MAX_BYTES = int(float(os.environ.get('OCR_CACHE_MAX_MB', 512)) * 1024 * 1024)
+
+
+def cache_disabled():
+    """True when caching is switched off for this process (OCR_CACHE_DISABLE=1)."""
+    return os.environ.get('OCR_CACHE_DISABLE', '').lower() in ('1', 'true', 'yes')
+
+
+def make_key(data, params=None, version=None):
+    """Content address: sha256 of the image bytes plus the processing parameters and engine/model version."""
+    h = hashlib.sha256()
+    h.update(data)
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    h.update(str(version or '').encode('utf-8'))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk cache of processing results, addressed by make_key().
+
+    Each entry is one file named after its key. A hit refreshes the file's
+    modification time, and once the folder grows past `max_bytes` the least
+    recently used files are removed. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running size estimate so a put() only rescans the folder when eviction is due
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, ext):
+        # Fan out into sub-folders so a large cache does not end up in one directory
+        return os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+
+    def get(self, key, ext=''):
+        """Return the cached bytes for this key, or None on a miss."""
+        path = self._path(key, ext)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def contains(self, key, ext=''):
+        """True if an entry exists, without reading it or counting a hit/miss."""
+        return os.path.exists(self._path(key, ext))
+
+    def put(self, key, data, ext=''):
+        """Store bytes under this key, then evict old entries if the cache is over its size limit."""
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(data) - replaced
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def get_json(self, key):
+        data = self.get(key, '.json')
+        return None if data is None else json.loads(data.decode('utf-8'))
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), '.json')
+
+    def invalidate(self, key, ext=''):
+        """Remove a single entry; returns True if it existed."""
+        try:
+            os.remove(self._path(key, ext))
+            return True
+        except OSError:
+            return False
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                self._total_bytes = total
+                return 0
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            self._total_bytes = total
+            return removed
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(namespace):
+    """Shared cache for one kind of result (e.g. 'preprocess', 'ocr'), created on first use."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(namespace)
+        if cache is None:
+            cache = ResultCache(os.path.join(DEFAULT_CACHE_DIR, namespace))
+            _CACHES[namespace] = cache
+        return cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Inspect or clear the preprocessing/OCR result cache.')
+    parser.add_argument('--namespace', type=str, nargs='+', default=['preprocess', 'ocr'],
+                        help='Cache namespaces to act on')
+    parser.add_argument('--clear', action='store_true', help='Remove all cached entries')
+    args = parser.parse_args()
+
+    for namespace in args.namespace:
+        cache = get_cache(namespace)
+        if args.clear:
+            start = time.perf_counter()
+            cache.clear()
+            print(f"Cleared {namespace} cache in {time.perf_counter() - start:.2f}s")
+        print(f"{namespace}: {cache.stats()}")
@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for the in-process queue, overridable per deployment
+DEFAULT_WORKERS = int(os.environ.get('OCR_JOB_WORKERS', 2))
+DEFAULT_MAX_QUEUE = int(os.environ.get('OCR_JOB_QUEUE', 8))
+DEFAULT_JOB_TTL = float(os.environ.get('OCR_JOB_TTL', 3600))
+# Jobs that make progress at the same time. ocr_image_job runs every job's OCR on the one
+# lock-guarded engine of this process, so more workers only overlap preprocessing/rendering with it
+DEFAULT_CONCURRENCY = int(os.environ.get('OCR_JOB_CONCURRENCY', 1))
+# Seconds between status requests that clients are told to use
+DEFAULT_POLL_INTERVAL = float(os.environ.get('OCR_JOB_POLL_INTERVAL', 1.0))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when the queue is at capacity; maps to HTTP 429."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    State of one background job. Every change bumps `version` and wakes
+    threads blocked in wait(), which is what long-polling and SSE use.
+    """
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.state = QUEUED
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def update(self, **changes):
+        with self._cond:
+            for key, value in changes.items():
+                setattr(self, key, value)
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, since_version, timeout=None):
+        """Block until the job changes after `since_version` (or the timeout); returns the current version."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since_version or self.done, timeout=timeout)
+            return self.version
+
+    @property
+    def done(self):
+        return self.state in (DONE, FAILED)
+
+    def to_dict(self, include_result=True, build_result=None):
+        """Status as JSON-ready data; `build_result` turns the stored result into the one sent to clients."""
+        data = {'job_id': self.id, 'state': self.state, 'stage': self.stage,
+                'progress': round(self.progress, 3), 'created': self.created,
+                'started': self.started, 'finished': self.finished}
+        if self.error is not None:
+            data['error'] = self.error
+        if include_result and self.state == DONE:
+            data['result'] = self.result if build_result is None else build_result(self.result)
+        return data
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue.
+
+    At most `workers` jobs run at once and at most `max_queue` more wait;
+    submit() raises QueueFull beyond that so the web layer can answer 429
+    instead of tying up request threads. Finished jobs are kept for `ttl`
+    seconds so clients can fetch their results.
+
+    For OCR jobs `workers` is the concurrency of the non-OCR stages
+    (preprocessing, rendering, encoding): the OCR itself is serialized on the
+    process's single engine, so OCR_JOB_WORKERS > 1 overlaps those stages
+    but does not add OCR throughput. `concurrency` is how many jobs really
+    progress at once and is what the Retry-After estimate is based on.
+
+    Job functions are called as fn(*args, progress=callback, **kwargs) where
+    callback(stage, fraction) publishes progress.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, ttl=DEFAULT_JOB_TTL,
+                 concurrency=DEFAULT_CONCURRENCY):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.concurrency = max(1, min(concurrency, workers))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-job')
+        self._jobs = {}
+        # Finished jobs in the order they finished, so expiry never waits behind a long-running job
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._durations = []
+
+    def _retry_after(self):
+        # Rough time until a slot frees up, from recent job durations and the jobs that can progress at once
+        recent = self._durations[-20:]
+        average = sum(recent) / len(recent) if recent else 5.0
+        return max(1, int(round(average * (self._active - self.workers + 1) / self.concurrency)))
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if job.finished >= cutoff:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job.id, None)
+
+    def check_capacity(self):
+        """None while a job can be accepted, otherwise the suggested Retry-After in seconds."""
+        with self._lock:
+            if self._active >= self.workers + self.max_queue:
+                return self._retry_after()
+            return None
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._expire()
+            if self._active >= self.workers + self.max_queue:
+                raise QueueFull(self._retry_after())
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._active += 1
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.update(state=RUNNING, stage='started', started=time.time())
+
+        def progress(stage, fraction=None):
+            job.update(stage=stage, progress=job.progress if fraction is None else fraction)
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            job.update(state=DONE, stage='done', progress=1.0, result=result, finished=time.time())
+        except Exception as e:
+            # The traceback stays on the job for the server side; clients only get the message
+            details = traceback.format_exc()
+            print(f"Job {job.id} failed: {e}\n{details}")
+            job.update(state=FAILED, stage='failed', error=str(e), traceback=details, finished=time.time())
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._finished[job.id] = job
+                self._durations.append(job.finished - job.started)
+                del self._durations[:-100]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.state == RUNNING)
+            return {'workers': self.workers, 'concurrency': self.concurrency, 'max_queue': self.max_queue,
+                    'active': self._active,
+                    'running': running, 'queued': self._active - running, 'tracked': len(self._jobs)}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def iter_job_events(job, heartbeat=15.0, include_result=True, build_result=None):
+    """
+    Server-Sent Events stream for a job: one 'progress' event per change, a
+    comment line every `heartbeat` seconds of silence (keeps proxies from
+    closing the connection) and a final 'done' or 'failed' event, whose
+    result goes through `build_result` when given.
+
+    The stream stays open for the whole job, so it needs an async or
+    greenlet server (see register_job_routes).
+    """
+    version = -1
+    while True:
+        current = job.wait(version, timeout=heartbeat)
+        if current == version and not job.done:
+            yield ": keep-alive\n\n"
+            continue
+        version = current
+        if job.done:
+            payload = json.dumps(job.to_dict(include_result=include_result, build_result=build_result))
+            yield f"event: {job.state}\ndata: {payload}\n\n"
+            return
+        yield f"event: progress\ndata: {json.dumps(job.to_dict(include_result=False))}\n\n"
+
+
+def ocr_image_job(image_path, output_folder, preprocess=True, processed_path=None, use_cache=True, progress=None):
+    """
+    The /process_image work as a job: preprocess_image, PPStructure with
+    per-region progress, then the annotated result.jpg. Returns the text
+    entries and the paths of the original, processed and annotated images
+    (annotated_image_path is None if drawing failed).
+    """
+    import cv2
+    from image_preprocess import preprocess_image
+    from paddle_OCR_detection import iter_paddle_ocr, render_visualization, visualization_path
+
+    progress = progress or (lambda stage, fraction=None: None)
+    ocr_input = image_path
+    if preprocess:
+        progress('preprocessing', 0.05)
+        processed_path = processed_path or os.path.join(
+            output_folder, os.path.splitext(os.path.basename(image_path))[0] + '_processed.jpg')
+        preprocess_image(image_path, processed_path, use_cache=use_cache)
+        ocr_input = processed_path
+
+    progress('ocr', 0.2)
+    summary = None
+    regions = []
+    for event in iter_paddle_ocr(ocr_input, output_folder, use_cache=use_cache):
+        if event['event'] == 'region':
+            regions.append(event['region'])
+            # The region count is unknown up front, so progress approaches 0.9 asymptotically
+            progress(f"ocr region {event['index'] + 1}", 0.9 - 0.7 / (event['index'] + 2))
+        else:
+            summary = event
+
+    # Drawn from this run's regions, so an older result.jpg for the same file name is replaced
+    progress('rendering', 0.95)
+    try:
+        annotated_path = render_visualization(cv2.imread(ocr_input), regions,
+                                              visualization_path(output_folder, ocr_input))
+    except Exception as e:
+        print(f"Error creating visualization for {ocr_input}: {e}")
+        annotated_path = None
+    return {'ocr_results': summary['items'], 'regions': summary['regions'],
+            'original_image_path': image_path, 'processed_image_path': ocr_input,
+            'annotated_image_path': annotated_path,
+            'result_path': summary['result_path'], 'elapsed': summary['elapsed']}
+
+
+def file_base64(path):
+    if not path:
+        return None
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('ascii')
+
+
+def process_image_response(result, delivery=None):
+    """
+    The /process_image JSON for an ocr_image_job result: the job output plus
+    the images as original_image/image base64 strings, or as
+    original_image_url/image_url (and *_full_url) when an
+    image_delivery.ImageDelivery is given.
+    """
+    data = dict(result, success=True)
+    if delivery is not None:
+        data.update(delivery.result_image_urls(result['original_image_path'], result['annotated_image_path']))
+    else:
+        data['original_image'] = file_base64(result['original_image_path'])
+        data['image'] = file_base64(result['annotated_image_path'])
+    return data
+
+
+def register_job_routes(app, queue, save_upload, build_result=None, prefix='/jobs', delivery=None,
+                        streaming=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Add the asynchronous /process_image flow to a Flask app.
+
+        POST {prefix}                  upload ('image_file'); 202 with the job id, 429 when full
+        GET  {prefix}/<job_id>         status, progress and (when done) the result
+        GET  {prefix}/<job_id>/events  the same as Server-Sent Events (streaming=True only)
+
+    Clients short-poll the status route every `poll_interval` seconds, so a
+    request thread is only busy for the length of one status lookup. With
+    streaming=True the events route and ?wait=<s>&since=<version> long-polls
+    are enabled as well; both hold a request for the whole wait, so turn
+    this on only behind a server that does not tie up a worker thread per
+    open request (gevent/eventlet workers, or a threaded server with far
+    more threads than expected concurrent jobs).
+
+    `save_upload(file_storage)` stores the upload and returns
+    (image_path, output_folder). `build_result(job_result)` turns the job
+    output into the JSON the client expects; by default that is
+    process_image_response() with `delivery`, i.e. the old /process_image
+    response shape. It runs when a finished job's status is fetched, so a
+    job only keeps the image paths for its TTL, never the encoded images.
+    """
+    from flask import jsonify, request, Response, url_for
+
+    build_result = build_result or (lambda result: process_image_response(result, delivery))
+
+    def submit_job():
+        upload = request.files.get('image_file')
+        if upload is None or not upload.filename:
+            return jsonify({'success': False, 'error': 'Image file is required'}), 400
+        try:
+            # Refuse before saving the upload when there is no room (submit() checks again under the lock)
+            retry_after = queue.check_capacity()
+            if retry_after is not None:
+                raise QueueFull(retry_after)
+            image_path, output_folder = save_upload(upload)
+            job = queue.submit(lambda progress: ocr_image_job(image_path, output_folder, progress=progress))
+        except QueueFull as e:
+            response = jsonify({'success': False, 'error': str(e), 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        body = {'success': True, 'job_id': job.id, 'poll_interval': poll_interval,
+                'status_url': url_for('ocr_job_status', job_id=job.id)}
+        if streaming:
+            body['events_url'] = url_for('ocr_job_events', job_id=job.id)
+        response = jsonify(body)
+        response.headers['Location'] = body['status_url']
+        return response, 202
+
+    def job_status(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Unknown job'}), 404
+        # Long-poll (streaming only): ?wait=<seconds>&since=<version> returns as soon as something changes
+        try:
+            wait = float(request.args.get('wait') or 0) if streaming else 0.0
+            since = int(request.args.get('since') or -1)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'wait must be a number and since an integer'}), 400
+        wait = max(0.0, min(wait, 30.0))
+        if wait > 0 and not job.done:
+            job.wait(since, timeout=wait)
+        return jsonify(dict(job.to_dict(build_result=build_result), success=True, version=job.version))
+
+    def job_events(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Unknown job'}), 404
+        return Response(iter_job_events(job, build_result=build_result), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    app.add_url_rule(prefix, 'ocr_job_submit', submit_job, methods=['POST'])
+    app.add_url_rule(f"{prefix}/<job_id>", 'ocr_job_status', job_status, methods=['GET'])
+    if streaming:
+        app.add_url_rule(f"{prefix}/<job_id>/events", 'ocr_job_events', job_events, methods=['GET'])
+    return app
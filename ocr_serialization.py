@@ -0,0 +1,91 @@
+import json
+import numpy as np
+
+# Optional compact binary encoding for saved results
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Fields holding image crops or other non-data objects; dropped without being converted
+SKIPPED_FIELDS = frozenset(['img', 'image', '_PlaceholderType'])
+
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def sanitize_for_json(obj, keep_arrays=False):
+    """
+    Convert PaddleOCR output to plain Python types in a single pass.
+
+    Numpy arrays become nested lists (or stay arrays with keep_arrays=True,
+    for binary encoders), numpy scalars become Python numbers, tuples become
+    lists, and 'img'-style fields are dropped. Anything else is stringified.
+    """
+    if isinstance(obj, _PLAIN_TYPES):
+        return obj
+    if isinstance(obj, dict):
+        return {key: sanitize_for_json(value, keep_arrays)
+                for key, value in obj.items() if key not in SKIPPED_FIELDS}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize_for_json(item, keep_arrays) for item in obj]
+    if isinstance(obj, np.ndarray):
+        if keep_arrays and obj.dtype != object:
+            return obj
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    # For other types, convert to string representation
+    try:
+        return str(obj)
+    except Exception:
+        return "UNSERIALIZABLE_OBJECT"
+
+
+def _msgpack_default(obj):
+    # Arrays kept by sanitize_for_json(keep_arrays=True) are stored as raw buffers
+    if isinstance(obj, np.ndarray):
+        return {'__ndarray__': True, 'dtype': obj.dtype.str, 'shape': list(obj.shape),
+                'data': np.ascontiguousarray(obj).tobytes()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def _msgpack_object_hook(obj):
+    if obj.get('__ndarray__'):
+        return np.frombuffer(obj['data'], dtype=np.dtype(obj['dtype'])).reshape(obj['shape'])
+    return obj
+
+
+def encode_result(payload, fmt='json', compress=False):
+    """Encode a result payload; returns (bytes, file extension)."""
+    if fmt == 'json':
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        ext = '.json'
+    elif fmt == 'msgpack':
+        if msgpack is None:
+            raise ImportError("msgpack is required for fmt='msgpack' (pip install msgpack)")
+        data = msgpack.packb(payload, use_bin_type=True, default=_msgpack_default)
+        ext = '.msgpack'
+    else:
+        raise ValueError(f"Unknown result format: {fmt}")
+    if compress:
+        import gzip
+        data = gzip.compress(data, compresslevel=6)
+        ext += '.gz'
+    return data, ext
+
+
+def decode_result(data, ext):
+    """Inverse of encode_result, selected by the file extension it returned."""
+    if ext.endswith('.gz'):
+        import gzip
+        data = gzip.decompress(data)
+        ext = ext[:-3]
+    if ext == '.json':
+        return json.loads(data.decode('utf-8'))
+    if ext == '.msgpack':
+        if msgpack is None:
+            raise ImportError("msgpack is required to read .msgpack results (pip install msgpack)")
+        return msgpack.unpackb(data, raw=False, object_hook=_msgpack_object_hook)
+    raise ValueError(f"Unknown result format: {ext}")
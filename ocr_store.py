@@ -0,0 +1,405 @@
+import os
+import re
+import html
+import json
+import time
+import uuid
+import base64
+import sqlite3
+import argparse
+import threading
+import contextlib
+from datetime import datetime
+
+DEFAULT_DB_PATH = os.environ.get('OCR_DB_PATH', 'ocr_results.db')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS ocr_document (
+        id TEXT PRIMARY KEY,
+        document_name TEXT,
+        filename TEXT,
+        created_at TEXT,
+        image_path TEXT,
+        original_image_path TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS ocr_text_item (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_id TEXT,
+        text TEXT,
+        confidence REAL,
+        is_handwritten INTEGER,
+        text_region TEXT,
+        edited INTEGER DEFAULT 0,
+        FOREIGN KEY (document_id) REFERENCES ocr_document (id)
+    )""",
+    # Item lookups by document (and the item counts in the list) use this instead of a full scan
+    "CREATE INDEX IF NOT EXISTS idx_ocr_text_item_document ON ocr_text_item (document_id, id)",
+    # Newest-first keyset pagination of /documents
+    "CREATE INDEX IF NOT EXISTS idx_ocr_document_created ON ocr_document (created_at, id)",
+]
+
+# Per-connection settings; journal_mode=WAL is stored in the database file itself
+PRAGMAS = {
+    'synchronous': 'NORMAL',    # with WAL: durable at checkpoints, no fsync per commit
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,       # ms to wait for a writer instead of failing with "database is locked"
+    'cache_size': -65536,       # 64 MB page cache
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,     # 256 MB memory-mapped reads
+}
+
+# Full-text index over the item text. It is an external-content table: the
+# text lives only in ocr_text_item, and the triggers keep the index in step
+# with every insert (/save), text update (/update_text) and delete.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS ocr_text_fts USING fts5(
+        text, content='ocr_text_item', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_item_fts_insert AFTER INSERT ON ocr_text_item BEGIN
+        INSERT INTO ocr_text_fts (rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_item_fts_delete AFTER DELETE ON ocr_text_item BEGIN
+        INSERT INTO ocr_text_fts (ocr_text_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_item_fts_update AFTER UPDATE OF text ON ocr_text_item BEGIN
+        INSERT INTO ocr_text_fts (ocr_text_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO ocr_text_fts (rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+# Control characters mark the matches in snippets so the text can be HTML-escaped before adding <mark>
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+SNIPPET_TOKENS = 12
+# BM25 scores every match, so queries matching more items than this rank only the newest RANK_WINDOW of them
+RANK_WINDOW = int(os.environ.get('OCR_SEARCH_RANK_WINDOW', 2000))
+
+DOCUMENT_COLUMNS = ('id', 'document_name', 'filename', 'created_at', 'image_path', 'original_image_path')
+ITEM_COLUMNS = ('id', 'document_id', 'text', 'confidence', 'is_handwritten', 'text_region', 'edited')
+
+
+def encode_cursor(created_at, document_id):
+    """Opaque /documents page cursor for the last document of a page."""
+    raw = json.dumps([created_at, document_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, document_id = json.loads(raw)
+        return created_at, document_id
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def match_query(text, prefix=True):
+    """
+    FTS5 MATCH expression for free text typed by a user: every word must
+    appear (each quoted, so FTS5 operators and punctuation are inert), and
+    with `prefix` the last word also matches as a prefix for search-as-you-type.
+    """
+    words = re.findall(r"\w+", text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    return html.escape(snippet).replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>')
+
+
+def item_row(document_id, item):
+    """ocr_text_item values for one entry of the OCR results."""
+    region = item.get('text_region')
+    handwritten = item.get('is_handwritten', item.get('handwritten', False))
+    return (document_id, item.get('text', ''), item.get('confidence'), int(bool(handwritten)),
+            region if region is None or isinstance(region, str) else json.dumps(region),
+            int(bool(item.get('edited', False))))
+
+
+class OCRStore:
+    """
+    SQLite storage of saved OCR documents (ocr_results.db).
+
+    Every thread gets its own connection, opened on first use with the
+    PRAGMAS above and reused afterwards, so request handlers do not pay a
+    connect per call and never share a connection across threads. The
+    database runs in WAL mode: readers do not block the writer and a
+    document save is a single transaction with one executemany for its items.
+    Item text is also kept in the ocr_text_fts full-text index for search().
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=PRAGMAS['busy_timeout'] / 1000, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    @property
+    def conn(self):
+        """This thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT on this thread's connection, rolled back on error."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def init_db(self):
+        conn = self.conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        with self.transaction():
+            for statement in SCHEMA:
+                conn.execute(statement)
+            fts_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ocr_text_fts'").fetchone()
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+            if not fts_exists:
+                # Index the items saved before full-text search existed
+                start = time.perf_counter()
+                conn.execute("INSERT INTO ocr_text_fts (ocr_text_fts) VALUES ('rebuild')")
+                print(f"Built the full-text index in {time.perf_counter() - start:.2f}s")
+
+    def optimize_search(self):
+        """Merge the FTS5 index segments into one (worth it after large imports)."""
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO ocr_text_fts (ocr_text_fts) VALUES ('optimize')")
+
+    def close(self):
+        """Close every pooled connection (each thread reconnects on next use)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Connections of other threads can only be closed from those threads on old sqlite3 builds
+                pass
+        self._local = threading.local()
+
+    # -- writes ------------------------------------------------------------
+
+    def save_document(self, items, document_name=None, filename=None, image_path=None,
+                      original_image_path=None, document_id=None, created_at=None):
+        """Insert a document and all its text items in one transaction; returns the document id."""
+        document_id = document_id or str(uuid.uuid4())
+        created_at = created_at or datetime.now().isoformat()
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO ocr_document (id, document_name, filename, created_at, image_path, "
+                         "original_image_path) VALUES (?, ?, ?, ?, ?, ?)",
+                         (document_id, document_name, filename, created_at, image_path, original_image_path))
+            conn.executemany("INSERT INTO ocr_text_item (document_id, text, confidence, is_handwritten, "
+                             "text_region, edited) VALUES (?, ?, ?, ?, ?, ?)",
+                             (item_row(document_id, item) for item in items))
+        return document_id
+
+    def update_item_text(self, item_id, text):
+        """Change the text of a saved item and mark it edited; returns False if there is no such item."""
+        with self.transaction() as conn:
+            cursor = conn.execute("UPDATE ocr_text_item SET text = ?, edited = 1 WHERE id = ?", (text, item_id))
+        return cursor.rowcount > 0
+
+    def delete_document(self, document_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM ocr_text_item WHERE document_id = ?", (document_id,))
+            cursor = conn.execute("DELETE FROM ocr_document WHERE id = ?", (document_id,))
+        return cursor.rowcount > 0
+
+    # -- reads -------------------------------------------------------------
+
+    def list_documents(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        One page of documents, newest first, with their item counts.
+
+        Returns (documents, next_cursor); next_cursor is None on the last
+        page. Pages continue after the (created_at, id) of the cursor, so
+        page 1000 costs the same as page 1, unlike LIMIT/OFFSET.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = '', []
+        if cursor:
+            where = 'WHERE (d.created_at, d.id) < (?, ?)'
+            params.extend(decode_cursor(cursor))
+        rows = self.conn.execute(
+            f"SELECT d.*, (SELECT COUNT(*) FROM ocr_text_item t WHERE t.document_id = d.id) AS text_items_count "
+            f"FROM ocr_document d {where} ORDER BY d.created_at DESC, d.id DESC LIMIT ?",
+            params + [limit + 1]).fetchall()
+        documents = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = documents[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return documents, next_cursor
+
+    def get_document(self, document_id):
+        """(document, text_items) or (None, []) when the id is unknown."""
+        row = self.conn.execute("SELECT * FROM ocr_document WHERE id = ?", (document_id,)).fetchone()
+        if row is None:
+            return None, []
+        items = [dict(item) for item in self.conn.execute(
+            "SELECT * FROM ocr_text_item WHERE document_id = ? ORDER BY id", (document_id,))]
+        document = dict(row)
+        document['text_items_count'] = len(items)
+        return document, items
+
+    def search(self, query, limit=20, page=1, prefix=True):
+        """
+        Text items matching `query`, best BM25 rank first.
+
+        Returns (results, has_more, truncated). Each result carries the
+        item, its document and an HTML snippet with the matched words in
+        <mark>. Snippets are built only for the rows of the page. Ranking is
+        limited to the newest RANK_WINDOW matches: walking the match list
+        by rowid is cheap, scoring it is not. `truncated` is True when older
+        matches were left out, so callers can ask for a narrower query. With `prefix` the last word
+        always matches as a prefix ("pa" finds "paciente" even though "pa"
+        is itself a word); the index's 2- and 3-character prefix entries
+        keep short prefixes cheap.
+        """
+        conn = self.conn
+        expression = match_query(query, prefix=prefix)
+        if expression is None:
+            return [], False, False
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = (max(1, int(page)) - 1) * limit
+        # The RANK_WINDOW-th newest match bounds the ranking; a row after it means older matches are left out
+        window = conn.execute("SELECT rowid FROM ocr_text_fts WHERE ocr_text_fts MATCH ? "
+                              "ORDER BY rowid DESC LIMIT 2 OFFSET ?", (expression, RANK_WINDOW - 1)).fetchall()
+        min_rowid = window[0]['rowid'] if window else 0
+        truncated = len(window) > 1
+        # bm25() directly: ordering by the 'rank' column evaluates it twice per row
+        ranked = conn.execute("SELECT rowid, bm25(ocr_text_fts) AS rank FROM ocr_text_fts "
+                              "WHERE ocr_text_fts MATCH ? AND rowid >= ? ORDER BY rank LIMIT ? OFFSET ?",
+                              (expression, min_rowid, limit + 1, offset)).fetchall()
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+        if not ranked:
+            return [], False, truncated
+
+        ids = [row['rowid'] for row in ranked]
+        placeholders = ','.join('?' * len(ids))
+        snippets = dict(conn.execute(
+            f"SELECT rowid, snippet(ocr_text_fts, 0, ?, ?, '...', ?) FROM ocr_text_fts "
+            f"WHERE ocr_text_fts MATCH ? AND rowid IN ({placeholders})",
+            [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_TOKENS, expression] + ids).fetchall())
+        rows = {row['item_id']: row for row in conn.execute(
+            f"SELECT i.id AS item_id, i.document_id, i.text, i.confidence, i.is_handwritten, i.edited, "
+            f"d.document_name, d.filename, d.created_at FROM ocr_text_item i "
+            f"JOIN ocr_document d ON d.id = i.document_id WHERE i.id IN ({placeholders})", ids)}
+
+        results = []
+        for row in ranked:
+            item = rows.get(row['rowid'])
+            if item is None:
+                continue
+            result = dict(item)
+            result['score'] = -row['rank']
+            result['snippet'] = highlight(snippets.get(row['rowid'], ''))
+            results.append(result)
+        return results, has_more, truncated
+
+    def document_image_path(self, document_id):
+        row = self.conn.execute("SELECT image_path FROM ocr_document WHERE id = ?", (document_id,)).fetchone()
+        return row['image_path'] if row else None
+
+    def stats(self):
+        conn = self.conn
+        return {'documents': conn.execute("SELECT COUNT(*) FROM ocr_document").fetchone()[0],
+                'items': conn.execute("SELECT COUNT(*) FROM ocr_text_item").fetchone()[0],
+                'journal_mode': conn.execute("PRAGMA journal_mode").fetchone()[0]}
+
+
+def register_document_routes(app, store):
+    """
+    Add the saved-document routes to a Flask app.
+
+        GET /documents?limit=&cursor=   a page of documents plus next_cursor
+        GET /documents/<document_id>    the document and its text items
+        GET /search?q=&page=&limit=     ranked full-text matches with highlighted snippets,
+                                        plus has_more and truncated (older matches not ranked)
+    """
+    from flask import jsonify, request
+
+    def list_documents():
+        try:
+            documents, next_cursor = store.list_documents(request.args.get('limit', DEFAULT_PAGE_SIZE),
+                                                          request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'documents': documents, 'next_cursor': next_cursor})
+
+    def get_document(document_id):
+        document, items = store.get_document(document_id)
+        if document is None:
+            return jsonify({'success': False, 'error': 'Document not found'}), 404
+        return jsonify({'success': True, 'document': document, 'text_items': items})
+
+    def search():
+        query = request.args.get('q', '')
+        try:
+            results, has_more, truncated = store.search(query, request.args.get('limit', 20),
+                                                        request.args.get('page', 1))
+        except ValueError as e:
+            # Bad limit/page; match_query quotes every term, so FTS5 syntax errors cannot reach here
+            return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'query': query, 'results': results, 'has_more': has_more,
+                        'truncated': truncated})
+
+    app.add_url_rule('/documents', 'list_documents', list_documents, methods=['GET'])
+    app.add_url_rule('/search', 'search', search, methods=['GET'])
+    app.add_url_rule('/documents/<document_id>', 'get_document', get_document, methods=['GET'])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create or upgrade the OCR results database (indexes, WAL, '
+                                                 'full-text index) and optionally search it.')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB_PATH)
+    parser.add_argument('--search', type=str, default=None, help='Run a full-text query')
+    parser.add_argument('--optimize', action='store_true', help='Merge the full-text index segments')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = OCRStore(args.db)
+    print(f"{args.db}: {store.stats()} ready in {time.perf_counter() - start:.2f}s")
+    if args.optimize:
+        start = time.perf_counter()
+        store.optimize_search()
+        print(f"Optimized the full-text index in {time.perf_counter() - start:.2f}s")
+    if args.search:
+        start = time.perf_counter()
+        results, has_more, truncated = store.search(args.search)
+        print(f"{len(results)} results{' (more available)' if has_more else ''}"
+              f"{f' (only the newest {RANK_WINDOW} matches ranked)' if truncated else ''} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for result in results:
+            print(f"  {result['score']:.2f}  {result['document_name']}  {result['snippet']}")
+    store.close()
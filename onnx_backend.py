@@ -0,0 +1,116 @@
+import os
+import torch
+
+# onnxruntime is only needed for the "onnx" and "onnx-int8" backends
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_ONNX_DIR = os.environ.get('ONNX_MODEL_DIR', 'models/onnx')
+
+
+class DetectionOutput:
+    """Minimal stand-in for the Hugging Face DETR output (attribute and key access to logits/pred_boxes)."""
+
+    def __init__(self, logits, pred_boxes):
+        self.logits = logits
+        self.pred_boxes = pred_boxes
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class _DetectionHead(torch.nn.Module):
+    """Wraps a DETR-style model so only the detection outputs are exported."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        return outputs.logits, outputs.pred_boxes
+
+
+def onnx_path(onnx_dir, name, backend):
+    suffix = '.int8.onnx' if backend == 'onnx-int8' else '.onnx'
+    return os.path.join(onnx_dir, name + suffix)
+
+
+def export_onnx(model, path, sample_size=(800, 800), opset=17):
+    """Export the (logits, pred_boxes) graph of a DETR-style model with dynamic batch and image size."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    model = model.to('cpu').eval()
+    pixel_values = torch.randn(1, 3, *sample_size)
+    pixel_mask = torch.ones(1, *sample_size, dtype=torch.int64)
+    print(f"Exporting ONNX model to {path}...")
+    torch.onnx.export(
+        _DetectionHead(model), (pixel_values, pixel_mask), path,
+        input_names=['pixel_values', 'pixel_mask'],
+        output_names=['logits', 'pred_boxes'],
+        dynamic_axes={
+            'pixel_values': {0: 'batch', 2: 'height', 3: 'width'},
+            'pixel_mask': {0: 'batch', 1: 'height', 2: 'width'},
+            'logits': {0: 'batch'},
+            'pred_boxes': {0: 'batch'},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+    return path
+
+
+def quantize_onnx(src_path, dst_path):
+    """Dynamic int8 quantization of the MatMul/Gemm weights (the transformer layers)."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    print(f"Quantizing {src_path} to int8...")
+    quantize_dynamic(src_path, dst_path, weight_type=QuantType.QInt8,
+                     op_types_to_quantize=['MatMul', 'Gemm'])
+    return dst_path
+
+
+def prepare_onnx(model, onnx_dir, name, backend):
+    """Return the ONNX file for this backend, exporting/quantizing it on first use."""
+    fp32_path = onnx_path(onnx_dir, name, 'onnx')
+    if not os.path.exists(fp32_path):
+        export_onnx(model, fp32_path)
+    if backend == 'onnx':
+        return fp32_path
+    int8_path = onnx_path(onnx_dir, name, 'onnx-int8')
+    if not os.path.exists(int8_path):
+        quantize_onnx(fp32_path, int8_path)
+    return int8_path
+
+
+class OnnxDetectionModel:
+    """onnxruntime session called like the torch model: model(pixel_values=..., pixel_mask=...)."""
+
+    def __init__(self, path, num_threads=None):
+        if ort is None:
+            raise ImportError("onnxruntime is required for the ONNX backends (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, pixel_values, pixel_mask=None, **kwargs):
+        if pixel_mask is None:
+            pixel_mask = torch.ones(pixel_values.shape[0], *pixel_values.shape[2:], dtype=torch.int64)
+        logits, pred_boxes = self.session.run(None, {
+            'pixel_values': pixel_values.detach().cpu().numpy(),
+            'pixel_mask': pixel_mask.detach().cpu().numpy().astype('int64'),
+        })
+        return DetectionOutput(torch.from_numpy(logits), torch.from_numpy(pred_boxes))
+
+
+def build_runner(model, backend='torch', onnx_dir=DEFAULT_ONNX_DIR, name='model', num_threads=None):
+    """Callable that runs one preprocessed batch with the requested backend."""
+    if backend == 'torch':
+        return model
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    return OnnxDetectionModel(prepare_onnx(model, onnx_dir, name, backend), num_threads=num_threads)
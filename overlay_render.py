@@ -0,0 +1,197 @@
+import os
+import cv2
+import numpy as np
+from PIL import Image
+
+# Everything here works on private copies of the input and keeps no module
+# state, so renders can run concurrently from several threads.
+
+TABLE_COLORS = {
+    'table': (255, 0, 115),
+    'table rotated': (242, 153, 25),
+}
+TABLE_LEGEND = [('Table', TABLE_COLORS['table']), ('Table (rotated)', TABLE_COLORS['table rotated'])]
+
+
+def to_rgb_array(image):
+    """RGB uint8 copy of a PIL image or an RGB/gray numpy array."""
+    if isinstance(image, Image.Image):
+        return np.array(image.convert('RGB'))
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+    return np.array(image, dtype=np.uint8, copy=True)
+
+
+def default_line_width(image):
+    """Line width that stays visible on large scans."""
+    return max(2, int(round(max(image.shape[:2]) / 600)))
+
+
+def _clip_box(box, width, height):
+    x1, y1, x2, y2 = box
+    x1, y1 = max(0, int(round(x1))), max(0, int(round(y1)))
+    x2, y2 = min(width, int(round(x2))), min(height, int(round(y2)))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def _blend(roi, color, alpha, where=None):
+    """Alpha-blend a solid color into `roi` in place, optionally only where a bool mask is set."""
+    color = np.asarray(color, dtype=np.float32)
+    if where is None:
+        roi[:] = (roi * (1 - alpha) + color * alpha).astype(np.uint8)
+    else:
+        roi[where] = (roi[where] * (1 - alpha) + color * alpha).astype(np.uint8)
+
+
+def fill_box(image, box, color, alpha=0.1):
+    clipped = _clip_box(box, image.shape[1], image.shape[0])
+    if clipped is not None:
+        x1, y1, x2, y2 = clipped
+        _blend(image[y1:y2, x1:x2], color, alpha)
+    return image
+
+
+def hatch_box(image, box, color, alpha=0.2, spacing=8, thickness=1):
+    """Diagonal '//' hatching inside a box, drawn with one vectorized mask."""
+    clipped = _clip_box(box, image.shape[1], image.shape[0])
+    if clipped is not None:
+        x1, y1, x2, y2 = clipped
+        ys, xs = np.ogrid[y1:y2, x1:x2]
+        lines = (xs + ys) % spacing < thickness
+        _blend(image[y1:y2, x1:x2], color, alpha, where=lines)
+    return image
+
+
+def outline_box(image, box, color, alpha=1.0, line_width=2):
+    clipped = _clip_box(box, image.shape[1], image.shape[0])
+    if clipped is None:
+        return image
+    x1, y1, x2, y2 = clipped
+    if alpha >= 1.0:
+        cv2.rectangle(image, (x1, y1), (x2 - 1, y2 - 1), tuple(int(c) for c in color), line_width)
+        return image
+    # Only the outline band is blended, not the whole image
+    pad = line_width
+    bx1, by1 = max(0, x1 - pad), max(0, y1 - pad)
+    bx2, by2 = min(image.shape[1], x2 + pad), min(image.shape[0], y2 + pad)
+    band = np.zeros((by2 - by1, bx2 - bx1), np.uint8)
+    cv2.rectangle(band, (x1 - bx1, y1 - by1), (x2 - 1 - bx1, y2 - 1 - by1), 1, line_width)
+    _blend(image[by1:by2, bx1:bx2], color, alpha, where=band.astype(bool))
+    return image
+
+
+def overlay_mask(image, mask, color, alpha=0.5):
+    """Tint the pixels of a bool/0-1 mask the size of the image."""
+    mask = np.asarray(mask).astype(bool)
+    if mask.shape != image.shape[:2]:
+        mask = cv2.resize(mask.astype(np.uint8), (image.shape[1], image.shape[0]),
+                          interpolation=cv2.INTER_NEAREST).astype(bool)
+    _blend(image, color, alpha, where=mask)
+    return image
+
+
+def add_legend(image, entries, font_scale=None, hatch=True):
+    """Append a white strip under the image with one color swatch and label per (label, color) entry."""
+    if font_scale is None:
+        font_scale = max(0.5, image.shape[1] / 1600)
+    thickness = max(1, int(round(font_scale * 2)))
+    (_, text_h), baseline = cv2.getTextSize('Ag', cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    swatch = text_h + baseline
+    strip_h = 2 * swatch
+    strip = np.full((strip_h, image.shape[1], 3), 255, np.uint8)
+
+    widths = [2 * swatch + cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0][0]
+              for label, _ in entries]
+    x = max(0, (image.shape[1] - sum(widths) - swatch * (len(entries) - 1)) // 2)
+    y = (strip_h - swatch) // 2
+    for (label, color), width in zip(entries, widths):
+        box = (x, y, x + swatch, y + swatch)
+        fill_box(strip, box, color, alpha=0.3)
+        if hatch:
+            hatch_box(strip, box, color, alpha=0.6, spacing=max(4, swatch // 3))
+        outline_box(strip, box, color, line_width=1)
+        cv2.putText(strip, label, (x + swatch + swatch // 2, y + text_h), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+        x += width + swatch
+    return np.vstack([image, strip])
+
+
+def add_title(image, title, font_scale=None):
+    """Prepend a white strip with a centered title."""
+    if font_scale is None:
+        font_scale = max(0.5, image.shape[1] / 1600)
+    thickness = max(1, int(round(font_scale * 2)))
+    (text_w, text_h), baseline = cv2.getTextSize(title, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    strip = np.full((2 * (text_h + baseline), image.shape[1], 3), 255, np.uint8)
+    cv2.putText(strip, title, (max(0, (image.shape[1] - text_w) // 2), text_h + baseline // 2 + text_h // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+    return np.vstack([strip, image])
+
+
+def encode_image(image, ext='.png', quality=90):
+    """Encode an RGB array to PNG/JPEG/WebP bytes."""
+    params = []
+    if ext.lower() in ('.jpg', '.jpeg'):
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif ext.lower() == '.webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    ok, buf = cv2.imencode(ext, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buf.tobytes()
+
+
+def save_image(image, path, quality=90):
+    """Write an RGB array, choosing the encoding from the file extension."""
+    data = encode_image(image, os.path.splitext(path)[1] or '.png', quality=quality)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def render_table_detections(image, det_tables, legend=True, line_width=None):
+    """
+    Table-transformer detections drawn the way the pyplot version did: a
+    faint fill, a translucent outline and '//' hatching per table, with a
+    legend underneath. Returns a new RGB array.
+    """
+    canvas = to_rgb_array(image)
+    line_width = line_width or default_line_width(canvas)
+    spacing = max(6, 4 * line_width)
+    for det_table in det_tables:
+        color = TABLE_COLORS.get(det_table['label'])
+        if color is None:
+            continue
+        bbox = det_table['bbox']
+        fill_box(canvas, bbox, color, alpha=0.1)
+        hatch_box(canvas, bbox, color, alpha=0.2, spacing=spacing, thickness=max(1, line_width // 2))
+        outline_box(canvas, bbox, color, alpha=0.3, line_width=line_width)
+    if legend:
+        canvas = add_legend(canvas, TABLE_LEGEND)
+    return canvas
+
+
+def render_layout_detections(image, boxes, masks=(), title=None, box_color=(255, 0, 0),
+                             mask_color=(255, 215, 0), mask_alpha=0.5, line_width=None):
+    """
+    Layout boxes (xyxy) and optional masks (bool arrays or tensors) on the
+    image, with an optional title strip. Returns a new RGB array.
+    """
+    canvas = to_rgb_array(image)
+    line_width = line_width or default_line_width(canvas)
+    for mask in masks:
+        if hasattr(mask, 'numpy'):
+            mask = mask.squeeze().cpu().numpy()
+        overlay_mask(canvas, mask, mask_color, alpha=mask_alpha)
+    for box in boxes:
+        outline_box(canvas, [float(v) for v in box], box_color, line_width=line_width)
+    if title:
+        canvas = add_title(canvas, title)
+    return canvas
+
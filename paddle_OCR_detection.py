@@ -3,6 +3,11 @@ import cv2
 import argparse
 import traceback
 import json
+import threading
+import multiprocessing
+import multiprocessing.util
+import time
+from queue import Empty
 import numpy as np
 
 # Add a custom JSON encoder to handle numpy arrays
@@ -41,96 +46,273 @@ except ImportError:
 
 from PIL import Image
 
-# Helper function to sanitize OCR results for JSON serialization
-def sanitize_for_json(obj):
-    """
-    Recursively convert PaddleOCR objects to JSON-serializable types.
-    Handles numpy arrays, complex objects, and removes non-serializable fields.
-    """
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, (int, float, str, bool, type(None))):
-        return obj
-    elif isinstance(obj, list):
-        return [sanitize_for_json(item) for item in obj]
-    elif isinstance(obj, dict):
-        # Create a new dict without non-serializable items
-        sanitized = {}
-        for key, value in obj.items():
-            # Skip specific problematic fields
-            if key in ['img', 'image', '_PlaceholderType']:
-                continue
-            try:
-                # Test if the value is JSON serializable
-                json.dumps({key: value})
-                sanitized[key] = value
-            except (TypeError, OverflowError):
-                # If not serializable, try to convert it
-                sanitized[key] = sanitize_for_json(value)
-        return sanitized
-    else:
-        # For other types, convert to string representation
+import ocr_cache
+from ocr_serialization import sanitize_for_json, encode_result
+
+try:
+    import paddleocr
+    ENGINE_VERSION = getattr(paddleocr, '__version__', 'unknown')
+except ImportError:
+    ENGINE_VERSION = 'unknown'
+
+# Keyword arguments used for the PPStructure engine unless the caller overrides them
+DEFAULT_ENGINE_KWARGS = {'show_log': True, 'image_orientation': False}
+
+# Per-process registry of loaded engines, keyed by their constructor arguments.
+# Each entry holds the engine and a lock, since PPStructure is not safe to call
+# from several threads at the same time.
+_ENGINE_REGISTRY = {}
+_ENGINE_REGISTRY_LOCK = threading.Lock()
+
+
+def _engine_key(engine_kwargs):
+    return tuple(sorted(engine_kwargs.items()))
+
+
+def get_engine(**engine_kwargs):
+    """Return the (engine, lock) pair for these settings, loading the models only once per process."""
+    kwargs = dict(DEFAULT_ENGINE_KWARGS)
+    kwargs.update(engine_kwargs)
+    key = _engine_key(kwargs)
+    with _ENGINE_REGISTRY_LOCK:
+        entry = _ENGINE_REGISTRY.get(key)
+        if entry is None:
+            print(f"Initializing OCR engine (pid {os.getpid()})...")
+            entry = (PPStructure(**kwargs), threading.Lock())
+            _ENGINE_REGISTRY[key] = entry
+            print("OCR engine initialized successfully")
+    return entry
+
+
+def run_engine(img, **engine_kwargs):
+    """Run the shared engine on an already-decoded BGR image."""
+    engine, lock = get_engine(**engine_kwargs)
+    with lock:
+        return engine(img)
+
+
+def warm_up_engine(**engine_kwargs):
+    """Load the engine and push a small blank page through it so the first real call is fast."""
+    blank = np.full((64, 64, 3), 255, dtype=np.uint8)
+    run_engine(blank, **engine_kwargs)
+
+
+def clear_engines():
+    """Drop all engines loaded in this process."""
+    with _ENGINE_REGISTRY_LOCK:
+        _ENGINE_REGISTRY.clear()
+
+
+# Result encoding used when the caller does not pass one: "json" or "msgpack", optionally gzipped
+RESULT_FORMAT = os.environ.get('OCR_RESULT_FORMAT', 'json')
+RESULT_GZIP = os.environ.get('OCR_RESULT_GZIP', '').lower() in ('1', 'true', 'yes')
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _link_alias(target, alias):
+    """Point `alias` at `target` with a relative symlink (hard link as fallback), replacing it atomically."""
+    tmp_alias = f"{alias}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.symlink(os.path.relpath(target, os.path.dirname(alias) or '.'), tmp_alias)
+    except (OSError, NotImplementedError):
         try:
-            return str(obj)
-        except:
-            return "UNSERIALIZABLE_OBJECT"
+            os.link(target, tmp_alias)
+        except OSError as e:
+            print(f"Could not create alias {alias}: {e}")
+            return False
+    os.replace(tmp_alias, alias)
+    return True
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
 
 # Custom save function to ensure consistent file structure
-def enhanced_save_structure_res(result, save_folder, image_name):
-    """Save OCR results to multiple paths for redundancy"""
-    # Make sure the output directories exist
-    os.makedirs(save_folder, exist_ok=True)
+def enhanced_save_structure_res(result, save_folder, image_name, fmt=None, compress=None, legacy_links=True):
+    """
+    Save OCR results once, to <save_folder>/<image_name>/res_0.<ext>.
+
+    `fmt` is "json" (minified) or "msgpack", and `compress` gzips the payload.
+    For plain JSON the older locations (<save_folder>/res_0.json and
+    <save_folder>/<image_name>_res_0.json) are kept as links to that file
+    instead of being written again; for the other formats they are removed,
+    so no stale JSON from an earlier run is left behind. Results saved
+    earlier in another format are removed as well.
+    """
+    fmt = fmt or RESULT_FORMAT
+    compress = RESULT_GZIP if compress is None else compress
+
+    # Make sure the output directory exists
     os.makedirs(os.path.join(save_folder, image_name), exist_ok=True)
     
-    # Sanitize the result for JSON serialization
-    sanitized_result = sanitize_for_json(result)
-    
-    # Save to the standard PaddleOCR path
-    standard_path = os.path.join(save_folder, image_name, 'res_0.json')
-    with open(standard_path, 'w', encoding='utf-8') as f:
-        json.dump({'res': sanitized_result}, f, ensure_ascii=False, indent=4)
-    print(f"Results saved to {standard_path}")
+    # Sanitize the result for serialization; binary output keeps box arrays as raw buffers
+    sanitized_result = sanitize_for_json(result, keep_arrays=(fmt == 'msgpack'))
+    data, ext = encode_result({'res': sanitized_result}, fmt=fmt, compress=compress)
     
-    # Save to an alternative path directly in the output folder
-    alt_path = os.path.join(save_folder, 'res_0.json')
-    with open(alt_path, 'w', encoding='utf-8') as f:
-        json.dump({'res': sanitized_result}, f, ensure_ascii=False, indent=4)
-    print(f"Results also saved to {alt_path}")
+    # Single canonical artifact at the standard PaddleOCR path
+    standard_path = os.path.join(save_folder, image_name, f'res_0{ext}')
+    _atomic_write(standard_path, data)
+    print(f"Results saved to {standard_path} ({len(data)} bytes)")
+    for name in os.listdir(os.path.dirname(standard_path)):
+        if name.startswith('res_0.') and name != f'res_0{ext}' and not name.endswith('.tmp'):
+            _remove_if_exists(os.path.join(save_folder, image_name, name))
     
-    # Save with the image name prefix for easier identification
-    prefixed_path = os.path.join(save_folder, f"{image_name}_res_0.json")
-    with open(prefixed_path, 'w', encoding='utf-8') as f:
-        json.dump({'res': sanitized_result}, f, ensure_ascii=False, indent=4)
-    print(f"Results also saved to {prefixed_path}")
+    if legacy_links:
+        for alias in (os.path.join(save_folder, 'res_0.json'),
+                      os.path.join(save_folder, f"{image_name}_res_0.json")):
+            if ext != '.json':
+                _remove_if_exists(alias)
+            elif _link_alias(standard_path, alias):
+                print(f"Results also available at {alias}")
     
     return standard_path
 
+# Render result.jpg for programmatic calls only when asked to (OCR_VISUALIZE=1 or visualize=True)
+VISUALIZE_BY_DEFAULT = os.environ.get('OCR_VISUALIZE', '').lower() in ('1', 'true', 'yes')
+
+# Background renderer so OCR results are returned before the visualization is drawn
+_VIS_EXECUTOR = None
+_VIS_PENDING = {}
+_VIS_LOCK = threading.Lock()
+
+
+def visualization_path(output_folder, image_path):
+    base_name = os.path.basename(image_path).split('.')[0]
+    return os.path.join(output_folder, base_name, 'result.jpg')
+
+
+def render_visualization(source, result, result_path):
+    """Draw the structure result onto an already-decoded BGR image (or encoded image bytes) and save it."""
+    if isinstance(source, (bytes, bytearray)):
+        source = cv2.imdecode(np.frombuffer(source, np.uint8), cv2.IMREAD_COLOR)
+    font_path = '/System/Library/Fonts/Times.ttc'  # Adjust for your system
+    if not os.path.exists(font_path):
+        # Try alternate font path
+        font_path = None
+    image = Image.fromarray(cv2.cvtColor(source, cv2.COLOR_BGR2RGB))
+    im_show = draw_structure_result(image, result, font_path=font_path)
+    im_show = Image.fromarray(im_show)
+    
+    os.makedirs(os.path.dirname(result_path), exist_ok=True)
+    im_show.save(result_path)
+    print(f"Visualization saved to {result_path}")
+    return result_path
+
+
+def submit_visualization(source, result, result_path):
+    """Render a visualization on the background thread; returns a Future for the saved path."""
+    global _VIS_EXECUTOR
+    with _VIS_LOCK:
+        if _VIS_EXECUTOR is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _VIS_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('OCR_VIS_WORKERS', 1)),
+                                               thread_name_prefix='ocr-vis')
+        future = _VIS_EXECUTOR.submit(render_visualization, source, result, result_path)
+        _VIS_PENDING[result_path] = future
+
+    def _done(f, path=result_path):
+        with _VIS_LOCK:
+            if _VIS_PENDING.get(path) is f:
+                del _VIS_PENDING[path]
+        if f.exception() is not None:
+            print(f"Error creating visualization {path}: {f.exception()}")
+    future.add_done_callback(_done)
+    return future
+
+
+def wait_for_visualizations(timeout=None):
+    """Block until every queued visualization has been written."""
+    from concurrent.futures import wait as wait_futures
+    with _VIS_LOCK:
+        pending = list(_VIS_PENDING.values())
+    wait_futures(pending, timeout=timeout)
+
+
+def ensure_visualization(image_path, output_folder):
+    """
+    Return the path of result.jpg for this image, rendering it on first request.
+    Uses the results already saved by run_paddle_ocr instead of running OCR again.
+    """
+    result_path = visualization_path(output_folder, image_path)
+    with _VIS_LOCK:
+        pending = _VIS_PENDING.get(result_path)
+    if pending is not None:
+        return pending.result()
+    if os.path.exists(result_path):
+        return result_path
+
+    from ocr_serialization import decode_result
+    res_dir = os.path.dirname(result_path)
+    saved = [name for name in os.listdir(res_dir) if name.startswith('res_0.') and not name.endswith('.tmp')]
+    if not saved:
+        raise FileNotFoundError(f"No saved OCR results in {res_dir}")
+    # The newest save wins if results in several formats are lying around
+    latest = max(saved, key=lambda name: os.path.getmtime(os.path.join(res_dir, name)))
+    ext = latest[len('res_0'):]
+    with open(os.path.join(res_dir, latest), 'rb') as f:
+        result = decode_result(f.read(), ext)['res']
+    return render_visualization(cv2.imread(image_path), result, result_path)
+
+
 # Function to run OCR with input and output parameters
-def run_paddle_ocr(image_path, output_folder):
-    """Run PaddleOCR on an image and save results to the specified folder."""
+def run_paddle_ocr(image_path, output_folder, use_cache=True, visualize=None, **engine_kwargs):
+    """
+    Run PaddleOCR on an image and save results to the specified folder.
+    `engine_kwargs` override DEFAULT_ENGINE_KWARGS for the PPStructure engine.
+    Results are cached by image content and engine settings; pass use_cache=False to bypass the cache.
+    With visualize=True the annotated result.jpg is rendered on a background thread
+    (default: OCR_VISUALIZE); otherwise call ensure_visualization() when it is needed.
+    """
     # Make sure output directory exists
     os.makedirs(output_folder, exist_ok=True)
     
     try:
-        # Initialize the OCR engine
-        print("Initializing OCR engine...")
-        table_engine = PPStructure(show_log=True, image_orientation=False)
-        print("OCR engine initialized successfully")
-        
-        # Read the image
+        # Read the image bytes once: they are both hashed for the cache and decoded
         print(f"Reading image from {image_path}")
-        img = cv2.imread(image_path)
-        if img is None:
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+        except OSError:
             raise ValueError(f"Could not read image from {image_path}")
-        print(f"Image loaded successfully: shape={img.shape}")
-        
-        # Run OCR
-        print("Running OCR processing...")
-        result = table_engine(img)
-        print(f"OCR processing completed for {image_path}")
-        
-        # Sanitize the results to ensure they are JSON serializable
-        sanitized_result = sanitize_for_json(result)
+
+        cache = None
+        img = None
+        sanitized_result = None
+        if use_cache and not ocr_cache.cache_disabled():
+            cache = ocr_cache.get_cache('ocr')
+            kwargs = dict(DEFAULT_ENGINE_KWARGS)
+            kwargs.update(engine_kwargs)
+            cache_key = ocr_cache.make_key(data, kwargs, version=ENGINE_VERSION)
+            sanitized_result = cache.get_json(cache_key)
+            if sanitized_result is not None:
+                print(f"Using cached OCR results for {image_path}")
+                result = sanitized_result
+
+        if sanitized_result is None:
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError(f"Could not read image from {image_path}")
+            print(f"Image loaded successfully: shape={img.shape}")
+            
+            # Run OCR
+            print("Running OCR processing...")
+            result = run_engine(img, **engine_kwargs)
+            print(f"OCR processing completed for {image_path}")
+            
+            # Sanitize the results to ensure they are JSON serializable
+            sanitized_result = sanitize_for_json(result)
+            if cache is not None:
+                cache.put_json(cache_key, sanitized_result)
         
         # Process results - extract the text elements from the structure
         processed_results = []
@@ -139,16 +321,7 @@ def run_paddle_ocr(image_path, output_folder):
         print(f"Found {len(sanitized_result)} text regions")
         for i, line in enumerate(sanitized_result):
             print(f"Text region {i}: {line}")
-            
-            # Extract text entries from the "res" field if it exists
-            if 'res' in line:
-                # These are the actual text entries
-                for item in line['res']:
-                    # Ensure each item has a text value
-                    if 'text' not in item or item['text'] is None:
-                        item['text'] = ""
-                    # Add the item to processed results
-                    processed_results.append(item)
+            processed_results.extend(region_text_items(line))
         
         # Save results using our enhanced save function
         base_name = os.path.basename(image_path).split('.')[0]
@@ -159,23 +332,12 @@ def run_paddle_ocr(image_path, output_folder):
             print(f"Error saving OCR results to JSON: {e}")
             # We'll continue even if saving fails, as we'll return the results directly
         
-        # Create a visualization
-        print("Creating visualization...")
-        font_path = '/System/Library/Fonts/Times.ttc'  # Adjust for your system
-        if not os.path.exists(font_path):
-            # Try alternate font path
-            font_path = None
-            print("Default font not found, using system default")
-            
-        image = Image.open(image_path).convert('RGB')
-        im_show = draw_structure_result(image, result, font_path=font_path)
-        im_show = Image.fromarray(im_show)
-        
-        # Save the visualization
-        os.makedirs(os.path.join(output_folder, base_name), exist_ok=True)
-        result_path = os.path.join(output_folder, base_name, 'result.jpg')
-        im_show.save(result_path)
-        print(f"OCR results and visualization saved to {output_folder}")
+        # Visualization is optional and rendered off the OCR path
+        if visualize is None:
+            visualize = VISUALIZE_BY_DEFAULT
+        if visualize:
+            source = img if img is not None else data
+            submit_visualization(source, result, visualization_path(output_folder, image_path))
         
         # Return the processed OCR results
         if processed_results:
@@ -190,20 +352,317 @@ def run_paddle_ocr(image_path, output_folder):
         traceback.print_exc()
         raise
 
+def region_text_items(region):
+    """Text entries of one sanitized layout region, each guaranteed to have a 'text' value."""
+    items = []
+    # Text regions carry a list of entries in "res"; table regions carry a dict (html, cell boxes)
+    res = region.get('res')
+    if isinstance(res, list):
+        for item in res:
+            if not isinstance(item, dict):
+                continue
+            # Ensure each item has a text value
+            if item.get('text') is None:
+                item['text'] = ""
+            items.append(item)
+    return items
+
+
+# Markup the PubTabNet-trained recognizer can emit; StructureSystem strips it from text regions
+STYLE_TOKENS = ('<strike>', '<sup>', '</sub>', '<b>', '</b>', '<sub>', '</sup>', '<overline>', '</overline>',
+                '<underline>', '</underline>', '<i>', '</i>')
+
+
+def _iter_engine_regions(img, engine_kwargs):
+    """
+    Yield raw PPStructure regions one by one as they are recognised.
+
+    Follows StructureSystem's structure mode region by region (layout model,
+    then table recognition or OCR per region), so the regions are the ones a
+    full-page engine(img) call returns; the engine lock is released between
+    regions. Engines in another mode, with image orientation correction, or
+    without the StructureSystem attributes fall back to one full-page call.
+    """
+    engine, lock = get_engine(**engine_kwargs)
+    if (getattr(engine, 'mode', None) != 'structure'
+            or getattr(engine, 'image_orientation_predictor', None) is not None
+            or not all(hasattr(engine, name) for name in ('layout_predictor', 'text_system', 'table_system'))):
+        with lock:
+            regions = engine(img)
+        for region in regions:
+            yield region
+        return
+
+    ori_im = img.copy()
+    h, w = ori_im.shape[:2]
+    if engine.layout_predictor is not None:
+        with lock:
+            layout_res, _ = engine.layout_predictor(img)
+    else:
+        layout_res = [dict(bbox=None, label='table')]
+    recovery = getattr(engine, 'recovery', False)
+    for region in layout_res:
+        res = ''
+        if region['bbox'] is not None:
+            x1, y1, x2, y2 = [int(v) for v in region['bbox']]
+            roi_img = ori_im[y1:y2, x1:x2, :]
+        else:
+            x1, y1, x2, y2 = 0, 0, w, h
+            roi_img = ori_im
+        with lock:
+            if region['label'] == 'table':
+                # Without a table model the engine leaves table regions empty
+                if engine.table_system is not None:
+                    res, _ = engine.table_system(roi_img, False)
+            elif engine.text_system is not None:
+                if recovery:
+                    page = np.ones(ori_im.shape, dtype=ori_im.dtype)
+                    page[y1:y2, x1:x2, :] = roi_img
+                    boxes, rec_res = engine.text_system(page)[:2]
+                else:
+                    boxes, rec_res = engine.text_system(roi_img)[:2]
+                res = []
+                for box, (text, confidence) in zip(boxes, rec_res):
+                    for token in STYLE_TOKENS:
+                        text = text.replace(token, '')
+                    box = np.asarray(box)
+                    if not recovery:
+                        # Boxes are relative to the crop; move them back to page coordinates
+                        box = box + np.asarray([x1, y1], dtype=box.dtype)
+                    res.append({'text': text, 'confidence': float(confidence), 'text_region': box.tolist()})
+        yield {'type': region['label'].lower(), 'bbox': [x1, y1, x2, y2], 'img': roi_img, 'res': res, 'img_idx': 0}
+
+
+def iter_paddle_ocr(image_path, output_folder=None, use_cache=True, **engine_kwargs):
+    """
+    Streaming variant of run_paddle_ocr.
+
+    Yields {'event': 'region', 'index', 'region', 'items'} for each layout region as
+    soon as it is recognised, then one {'event': 'summary', ...} with all text
+    entries. Results are saved to `output_folder` (if given) and cached at the end.
+    """
+    start = time.perf_counter()
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        raise ValueError(f"Could not read image from {image_path}")
+
+    kwargs = dict(DEFAULT_ENGINE_KWARGS)
+    kwargs.update(engine_kwargs)
+    cache = None
+    regions = None
+    if use_cache and not ocr_cache.cache_disabled():
+        cache = ocr_cache.get_cache('ocr')
+        # Kept apart from run_paddle_ocr's entries, so neither path can serve the other's output
+        cache_key = ocr_cache.make_key(data, dict(kwargs, producer='iter_paddle_ocr'), version=ENGINE_VERSION)
+        regions = cache.get_json(cache_key)
+    cached = regions is not None
+
+    if cached:
+        region_iter = iter(regions)
+    else:
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Could not read image from {image_path}")
+        region_iter = (sanitize_for_json(region) for region in _iter_engine_regions(img, engine_kwargs))
+
+    sanitized_result = []
+    processed_results = []
+    for index, region in enumerate(region_iter):
+        items = region_text_items(region)
+        sanitized_result.append(region)
+        processed_results.extend(items)
+        yield {'event': 'region', 'index': index, 'region': region, 'items': items}
+
+    if cache is not None and not cached:
+        cache.put_json(cache_key, sanitized_result)
+    result_path = None
+    if output_folder is not None:
+        base_name = os.path.basename(image_path).split('.')[0]
+        try:
+            result_path = enhanced_save_structure_res(sanitized_result, output_folder, base_name)
+        except Exception as e:
+            print(f"Error saving OCR results: {e}")
+    yield {
+        'event': 'summary',
+        'regions': len(sanitized_result),
+        'items': processed_results if processed_results else sanitized_result,
+        'result_path': result_path,
+        'cached': cached,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+async def aiter_paddle_ocr(image_path, output_folder=None, use_cache=True, **engine_kwargs):
+    """Async-iterator form of iter_paddle_ocr; the OCR work runs on a background thread."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for event in iter_paddle_ocr(image_path, output_folder, use_cache, **engine_kwargs):
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    threading.Thread(target=produce, name='ocr-stream', daemon=True).start()
+    while True:
+        event = await queue.get()
+        if event is done:
+            return
+        if isinstance(event, Exception):
+            raise event
+        yield event
+
+
+def _init_pool_worker(engine_kwargs, warmup, ready):
+    """Load (and optionally warm up) this worker's own engine when the process starts."""
+    try:
+        if warmup:
+            warm_up_engine(**engine_kwargs)
+        else:
+            get_engine(**engine_kwargs)
+    except Exception as e:
+        # Report the failure so the parent stops waiting instead of blocking in start()
+        ready.put((os.getpid(), f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+        raise
+    # Finish queued visualizations before the worker process exits
+    multiprocessing.util.Finalize(None, wait_for_visualizations, exitpriority=10)
+    # Tell the parent this worker is ready to take jobs
+    ready.put((os.getpid(), None))
+
+
+def _pool_run(image_path, output_folder, visualize, engine_kwargs):
+    # Same settings as the worker's warm engine, so the job reuses it (and its cache entries)
+    return run_paddle_ocr(image_path, output_folder, visualize=visualize, **engine_kwargs)
+
+
+class OCREnginePool:
+    """
+    A pool of worker processes, each holding its own warm PPStructure engine.
+
+    Jobs can be submitted from several threads at once; each job runs on one
+    worker and its engine. Use it as a context manager or call shutdown() when done.
+    """
+
+    def __init__(self, pool_size=None, warmup=True, init_timeout=None, **engine_kwargs):
+        if pool_size is None:
+            pool_size = int(os.environ.get('OCR_POOL_SIZE', 2))
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if init_timeout is None:
+            init_timeout = float(os.environ.get('OCR_POOL_INIT_TIMEOUT', 600))
+        self.pool_size = pool_size
+        self.warmup = warmup
+        self.init_timeout = init_timeout
+        self.engine_kwargs = engine_kwargs
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker processes; each one loads its engine before taking work.
+        Raises RuntimeError if a worker fails to load its engine or the workers
+        are not ready within `init_timeout` seconds.
+        """
+        with self._lock:
+            if self._pool is None:
+                print(f"Starting OCR engine pool with {self.pool_size} workers...")
+                # spawn keeps the workers free of any threads/state from the parent process
+                ctx = multiprocessing.get_context('spawn')
+                ready = ctx.Queue()
+                self._pool = ctx.Pool(processes=self.pool_size,
+                                      initializer=_init_pool_worker,
+                                      initargs=(self.engine_kwargs, self.warmup, ready))
+                # Block until every worker has finished loading its engine (or one has failed)
+                deadline = time.monotonic() + self.init_timeout
+                for _ in range(self.pool_size):
+                    try:
+                        pid, error = ready.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except Empty:
+                        pid, error = None, f"workers not ready after {self.init_timeout:.0f}s"
+                    if error is not None:
+                        self._pool.terminate()
+                        self._pool.join()
+                        self._pool = None
+                        raise RuntimeError(f"OCR engine pool failed to start (worker {pid}): {error}")
+                print("OCR engine pool ready")
+        return self
+
+    def submit(self, image_path, output_folder, visualize=None):
+        """Queue one image and return an AsyncResult; call .get() for the OCR results."""
+        if self._pool is None:
+            self.start()
+        return self._pool.apply_async(_pool_run, (image_path, output_folder, visualize, self.engine_kwargs))
+
+    def run(self, image_path, output_folder, visualize=None):
+        """Run OCR on one image in the pool and wait for the result."""
+        return self.submit(image_path, output_folder, visualize).get()
+
+    def map(self, image_paths, output_folder, visualize=None):
+        """Run OCR on several images, returning results in input order."""
+        results = [self.submit(path, output_folder, visualize) for path in image_paths]
+        return [r.get() for r in results]
+
+    def shutdown(self, wait=True):
+        """Stop the workers. With wait=True, queued jobs are finished first."""
+        with self._lock:
+            if self._pool is None:
+                return
+            if wait:
+                self._pool.close()
+            else:
+                self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            print("OCR engine pool shut down")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=exc_type is None)
+
 # Keep the original code
 if __name__ == "__main__":
     # Check if arguments are provided
     if len(os.sys.argv) > 1:
         # Parse command line arguments
         parser = argparse.ArgumentParser(description='Run PaddleOCR on an image.')
-        parser.add_argument('--image', type=str, help='Path to input image')
+        parser.add_argument('--image', type=str, nargs='+', help='Path to input image(s)')
         parser.add_argument('--output', type=str, help='Path to save OCR results')
+        parser.add_argument('--pool-size', type=int, default=None,
+                            help='Number of warm OCR worker processes to use for several images')
+        parser.add_argument('--no-cache', action='store_true', help='Bypass the OCR result cache')
+        parser.add_argument('--format', type=str, choices=['json', 'msgpack'], default=None,
+                            help='Encoding of the saved results (default: json)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the saved results')
+        parser.add_argument('--no-visualize', action='store_true', help='Skip writing result.jpg')
         
         args = parser.parse_args()
         
         # If both image and output are provided, run OCR
         if args.image and args.output:
-            run_paddle_ocr(args.image, args.output)
+            if args.no_cache:
+                # Also reaches the pool workers, which inherit the environment
+                os.environ['OCR_CACHE_DISABLE'] = '1'
+            if args.format:
+                os.environ['OCR_RESULT_FORMAT'] = RESULT_FORMAT = args.format
+            if args.gzip:
+                os.environ['OCR_RESULT_GZIP'] = '1'
+                RESULT_GZIP = True
+            visualize = not args.no_visualize
+            if len(args.image) == 1 and args.pool_size is None:
+                run_paddle_ocr(args.image[0], args.output, visualize=visualize)
+                wait_for_visualizations()
+            else:
+                with OCREnginePool(pool_size=args.pool_size) as pool:
+                    pool.map(args.image, args.output, visualize=visualize)
         else:
             print("Both --image and --output arguments are required.")
     else:
@@ -212,11 +671,8 @@ if __name__ == "__main__":
         img_path = 'inputs/IMG_5069_template.png'
         img = cv2.imread(img_path)
         
-        # Initialize the OCR engine
-        table_engine = PPStructure(show_log=True, image_orientation=False)
-        
-        # Run OCR
-        result = table_engine(img)
+        # Run OCR with the shared engine
+        result = run_engine(img)
         print(result)
         # Use our enhanced save function instead of the standard one
         enhanced_save_structure_res(result, save_folder, os.path.basename(img_path).split('.')[0])
@@ -226,13 +682,5 @@ if __name__ == "__main__":
                 line.pop('img')
             print(line)
 
-        # Create a visualization
-        font_path = '/System/Library/Fonts/Times.ttc'
-        image = Image.open(img_path).convert('RGB')
-        im_show = draw_structure_result(image, result, font_path=font_path)
-        im_show = Image.fromarray(im_show)
-
-        # Save the result image
-        base_name = os.path.basename(img_path).split('.')[0]
-        result_path = os.path.join(save_folder, base_name, 'result.jpg')
-        im_show.save(result_path)
\ No newline at end of file
+        # Create a visualization from the image already in memory
+        render_visualization(img, result, visualization_path(save_folder, img_path))
\ No newline at end of file
@@ -18,6 +18,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const documentInfo = document.getElementById('documentInfo');
     const documentImage = document.getElementById('documentImage');
     const documentTextItems = document.getElementById('documentTextItems');
+    const documentSearch = document.getElementById('documentSearch');
     
     let ocrData = null;
     let editedItems = new Set();
@@ -52,20 +53,11 @@ document.addEventListener('DOMContentLoaded', function() {
             imageContainer.innerHTML = '<p class="text-muted">Processing image...</p>';
             originalImageContainer.innerHTML = '<p class="text-muted">Processing image...</p>';
             
-            fetch('/process_image', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => {
-                if (!response.ok) {
-                    return response.json().then(errorData => {
-                        throw new Error(errorData.error || 'Server error: ' + response.status);
-                    }).catch(() => {
-                        // If we can't parse the JSON, just throw the HTTP error
-                        throw new Error('Network response was not ok: ' + response.status);
-                    });
-                }
-                return response.json();
+            runOcrJob(formData, function(job) {
+                const percent = Math.round((job.progress || 0) * 100);
+                processResult.innerHTML = `<div class="alert alert-info">
+                    <i class="bi bi-hourglass-split"></i> Processing your image (${job.stage}, ${percent}%)...
+                </div>`;
             })
             .then(data => {
                 // Hide spinner
@@ -83,13 +75,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 ocrData = data.ocr_results;
                 
-                // Display original and annotated images
-                if (data.original_image) {
-                    displayOriginalImage(data.original_image);
+                // Display original and annotated images (served as binary URLs, base64 from older servers)
+                if (data.original_image_url || data.original_image) {
+                    displayOriginalImage(imageSource(data.original_image_url, data.original_image));
                 }
                 
-                if (data.image) {
-                    displayAnnotatedImage(data.image);
+                if (data.image_url || data.image) {
+                    displayAnnotatedImage(imageSource(data.image_url, data.image));
                 }
                 
                 // Display text results (only handwritten/editable text)
@@ -120,16 +112,93 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Submit an image to the job queue and resolve with the finished result.
+    // Progress is short-polled; servers that can hold streams open also send
+    // an events_url, which is followed with Server-Sent Events instead.
+    function runOcrJob(formData, onProgress) {
+        return fetch('/jobs', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            return response.json().catch(() => ({})).then(data => {
+                if (response.status === 429) {
+                    const wait = data.retry_after || response.headers.get('Retry-After') || 'a few';
+                    throw new Error(`The server is busy, please try again in ${wait} seconds`);
+                }
+                if (!response.ok || !data.success) {
+                    throw new Error(data.error || 'Server error: ' + response.status);
+                }
+                return data;
+            });
+        })
+        .then(submitted => {
+            onProgress({stage: 'queued', progress: 0});
+            return submitted.events_url && window.EventSource
+                ? followJobEvents(submitted, onProgress)
+                : pollJob(submitted, onProgress);
+        })
+        .then(job => {
+            if (job.state === 'failed') {
+                throw new Error(job.error || 'Processing failed');
+            }
+            return job.result;
+        });
+    }
+
+    function followJobEvents(submitted, onProgress) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(submitted.events_url);
+            const finish = event => {
+                source.close();
+                resolve(JSON.parse(event.data));
+            };
+            source.addEventListener('progress', event => onProgress(JSON.parse(event.data)));
+            source.addEventListener('done', finish);
+            source.addEventListener('failed', finish);
+            source.onerror = () => {
+                // Connection dropped (proxy, timeout): continue by polling
+                source.close();
+                pollJob(submitted, onProgress).then(resolve, reject);
+            };
+        });
+    }
+
+    function pollJob(submitted, onProgress) {
+        const interval = (submitted.poll_interval || 1) * 1000;
+        return fetch(submitted.status_url)
+            .then(response => response.json())
+            .then(job => {
+                if (!job.success) {
+                    throw new Error(job.error || 'Unknown job');
+                }
+                if (job.state === 'done' || job.state === 'failed') {
+                    return job;
+                }
+                onProgress(job);
+                return new Promise(resolve => setTimeout(resolve, interval))
+                    .then(() => pollJob(submitted, onProgress));
+            });
+    }
+
+    // Image src for a result image: its URL, or a data URI for a base64 payload
+    function imageSource(url, base64Image) {
+        if (url) {
+            return url;
+        }
+        return base64Image ? `data:image/jpeg;base64,${base64Image}` : null;
+    }
+
     // Display original image
-    function displayOriginalImage(base64Image) {
-        if (!base64Image) {
+    function displayOriginalImage(imageSrc) {
+        if (!imageSrc) {
             originalImageContainer.innerHTML = '<p class="text-danger">Unable to load original image</p>';
             return;
         }
         
         originalImageContainer.innerHTML = `
             <div class="img-container">
-                <img src="data:image/jpeg;base64,${base64Image}" alt="Original Image" class="img-fluid">
+                <img src="${imageSrc}" alt="Original Image" class="img-fluid">
                 <div class="image-controls mt-2">
                     <div class="form-check form-switch">
                         <input class="form-check-input toggle-fit" type="checkbox" id="toggleOriginalFit" checked>
@@ -154,15 +223,15 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Display annotated image
-    function displayAnnotatedImage(base64Image) {
-        if (!base64Image) {
+    function displayAnnotatedImage(imageSrc) {
+        if (!imageSrc) {
             imageContainer.innerHTML = '<p class="text-danger">Unable to load annotated image</p>';
             return;
         }
         
         imageContainer.innerHTML = `
             <div class="img-container">
-                <img src="data:image/jpeg;base64,${base64Image}" alt="Annotated Image" class="img-fluid">
+                <img src="${imageSrc}" alt="Annotated Image" class="img-fluid">
                 <div class="image-controls mt-2">
                     <div class="form-check form-switch">
                         <input class="form-check-input toggle-fit" type="checkbox" id="toggleAnnotatedFit" checked>
@@ -543,16 +612,121 @@ document.addEventListener('DOMContentLoaded', function() {
     // Document Viewer Functionality
     if (viewDocumentsBtn) {
         viewDocumentsBtn.addEventListener('click', function() {
+            if (documentSearch) {
+                documentSearch.value = '';
+            }
             loadDocumentsList();
             documentsModal.show();
         });
     }
     
+    // Full-text search over saved documents, shown in place of the list while there is a query
+    if (documentSearch) {
+        let searchTimer = null;
+        documentSearch.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            const query = this.value.trim();
+            searchTimer = setTimeout(() => {
+                if (query) {
+                    searchDocuments(query, 1);
+                } else {
+                    loadDocumentsList();
+                }
+            }, 250);
+        });
+    }
+    
+    function searchDocuments(query, page) {
+        const moreBtn = document.getElementById('moreSearchResults');
+        if (page > 1 && moreBtn) {
+            moreBtn.disabled = true;
+        } else {
+            documentsList.innerHTML = '<p class="text-center"><i class="bi bi-hourglass-split"></i> Searching...</p>';
+        }
+        
+        fetch(`/search?q=${encodeURIComponent(query)}&page=${page}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error || 'Unknown error while searching');
+                }
+                // Ignore responses for a query the user has already changed
+                if (documentSearch.value.trim() !== query) {
+                    return;
+                }
+                if (page === 1 && data.results.length === 0) {
+                    documentsList.innerHTML = `<div class="alert alert-info"><i class="bi bi-info-circle"></i> No text matches "${query.replace(/</g, '&lt;')}".</div>`;
+                    return;
+                }
+                if (page === 1) {
+                    documentsList.innerHTML = '<div class="list-group" id="searchResultsGroup"></div>';
+                }
+                
+                // Snippets arrive HTML-escaped with the matched words in <mark>
+                let html = '';
+                data.results.forEach(result => {
+                    html += `
+                        <div class="document-item search-result" data-document-id="${result.document_id}">
+                            <div class="d-flex justify-content-between">
+                                <h5>${result.document_name || 'Unnamed Document'}</h5>
+                                <span class="document-date">${new Date(result.created_at).toLocaleString()}</span>
+                            </div>
+                            <div class="search-snippet">${result.snippet}</div>
+                        </div>
+                    `;
+                });
+                const results = document.createElement('div');
+                results.innerHTML = html;
+                results.querySelectorAll('.search-result').forEach(item => {
+                    item.addEventListener('click', function() {
+                        loadDocumentDetails(this.getAttribute('data-document-id'));
+                    });
+                });
+                document.getElementById('searchResultsGroup').append(...results.children);
+                
+                if (moreBtn) {
+                    moreBtn.parentElement.remove();
+                }
+                if (data.has_more) {
+                    documentsList.insertAdjacentHTML('beforeend', `
+                        <div class="text-center mt-2">
+                            <button class="btn btn-outline-primary" id="moreSearchResults">More results</button>
+                        </div>
+                    `);
+                    document.getElementById('moreSearchResults')
+                        .addEventListener('click', () => searchDocuments(query, page + 1));
+                } else if (data.truncated) {
+                    // The server ranks only the newest matches of very common queries
+                    documentsList.insertAdjacentHTML('beforeend', `
+                        <div class="alert alert-secondary mt-2">
+                            <i class="bi bi-info-circle"></i> Only the most recent matches are shown. Add more words to find older documents.
+                        </div>
+                    `);
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                documentsList.innerHTML = `
+                    <div class="alert alert-danger">
+                        <i class="bi bi-exclamation-triangle"></i> 
+                        Error searching documents: ${error.message}
+                    </div>
+                `;
+            });
+    }
+    
     // Load the list of saved documents
-    function loadDocumentsList() {
-        documentsList.innerHTML = '<p class="text-center"><i class="bi bi-hourglass-split"></i> Loading documents...</p>';
+    // Pages are fetched with the server's keyset cursor; "Load more" appends the next page
+    function loadDocumentsList(cursor) {
+        const loadMoreBtn = document.getElementById('loadMoreDocuments');
+        if (cursor && loadMoreBtn) {
+            loadMoreBtn.disabled = true;
+            loadMoreBtn.innerHTML = '<i class="bi bi-hourglass-split"></i> Loading...';
+        } else {
+            documentsList.innerHTML = '<p class="text-center"><i class="bi bi-hourglass-split"></i> Loading documents...</p>';
+        }
         
-        fetch('/documents')
+        fetch(cursor ? `/documents?cursor=${encodeURIComponent(cursor)}` : '/documents')
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Failed to fetch documents');
@@ -564,13 +738,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     throw new Error(data.error || 'Unknown error loading documents');
                 }
                 
-                if (!data.documents || data.documents.length === 0) {
+                if (!cursor && (!data.documents || data.documents.length === 0)) {
                     documentsList.innerHTML = '<div class="alert alert-info"><i class="bi bi-info-circle"></i> No documents have been saved yet.</div>';
                     return;
                 }
                 
                 // Display documents list
-                let html = '<div class="list-group">';
+                let html = '';
                 
                 data.documents.forEach(doc => {
                     const createdDate = new Date(doc.created_at);
@@ -578,6 +752,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     
                     html += `
                         <div class="document-item" data-document-id="${doc.id}">
+                            <img class="document-thumbnail float-end ms-3" loading="lazy" alt=""
+                                 src="/documents/${doc.id}/image?size=thumb"
+                                 onerror="this.remove()">
                             <div class="d-flex justify-content-between">
                                 <h5>${doc.document_name || 'Unnamed Document'}</h5>
                                 <span class="document-text-count">${doc.text_items_count} text items</span>
@@ -593,11 +770,29 @@ document.addEventListener('DOMContentLoaded', function() {
                     `;
                 });
                 
-                html += '</div>';
-                documentsList.innerHTML = html;
+                if (!cursor) {
+                    documentsList.innerHTML = '<div class="list-group" id="documentsListGroup"></div>';
+                }
+                const page = document.createElement('div');
+                page.innerHTML = html;
+                document.getElementById('documentsListGroup').append(...page.children);
+                
+                if (loadMoreBtn) {
+                    loadMoreBtn.parentElement.remove();
+                }
+                if (data.next_cursor) {
+                    documentsList.insertAdjacentHTML('beforeend', `
+                        <div class="text-center mt-2">
+                            <button class="btn btn-outline-primary" id="loadMoreDocuments">Load more</button>
+                        </div>
+                    `);
+                    const nextBtn = document.getElementById('loadMoreDocuments');
+                    nextBtn.addEventListener('click', () => loadDocumentsList(data.next_cursor));
+                }
                 
                 // Add event listeners to view buttons
-                document.querySelectorAll('.view-document').forEach(btn => {
+                document.querySelectorAll('.view-document:not([data-bound])').forEach(btn => {
+                    btn.setAttribute('data-bound', 'true');
                     btn.addEventListener('click', function() {
                         const docId = this.getAttribute('data-document-id');
                         loadDocumentDetails(docId);
@@ -605,7 +800,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
                 
                 // Make entire document item clickable
-                document.querySelectorAll('.document-item').forEach(item => {
+                document.querySelectorAll('.document-item:not([data-bound])').forEach(item => {
+                    item.setAttribute('data-bound', 'true');
                     item.addEventListener('click', function(e) {
                         // But not if they clicked a button inside it
                         if (!e.target.closest('button')) {
@@ -709,59 +905,55 @@ document.addEventListener('DOMContentLoaded', function() {
     function loadDocumentImage(imagePath) {
         documentImage.innerHTML = '<p class="text-center"><i class="bi bi-hourglass-split"></i> Loading image...</p>';
         
-        // Use our new endpoint to get the image
-        fetch(`/documents/${currentDocumentId}/image`)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Failed to fetch image');
-                }
-                return response.json();
-            })
-            .then(data => {
-                if (!data.success) {
-                    throw new Error(data.error || 'Unknown error loading image');
-                }
-                
-                // Display the image
-                documentImage.innerHTML = `
-                    <div class="img-container">
-                        <img src="data:image/jpeg;base64,${data.image_base64}" alt="Document Image" class="img-fluid">
-                        <div class="image-controls mt-2">
-                            <div class="form-check form-switch">
-                                <input class="form-check-input toggle-fit" type="checkbox" id="toggleDocumentFit" checked>
-                                <label class="form-check-label" for="toggleDocumentFit">Fit to view</label>
-                            </div>
-                        </div>
-                        <div class="mt-2 text-muted small">
-                            <i class="bi bi-info-circle"></i> Image path: ${data.image_path}
-                        </div>
-                    </div>
-                `;
-                
-                // Add toggle functionality
-                const toggleFit = document.getElementById('toggleDocumentFit');
-                if (toggleFit) {
-                    toggleFit.addEventListener('change', function() {
-                        const imgContainer = this.closest('.img-container');
-                        if (this.checked) {
-                            imgContainer.classList.remove('actual-size');
-                        } else {
-                            imgContainer.classList.add('actual-size');
-                        }
-                    });
-                }
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                documentImage.innerHTML = `
-                    <div class="alert alert-warning">
-                        <i class="bi bi-exclamation-triangle"></i> 
-                        Could not load image: ${error.message}
-                        <br>
-                        <small>Path: ${imagePath}</small>
+        // The image endpoint streams a cacheable JPEG/WebP rendition; "Fit to view" uses
+        // the preview size and "actual size" switches to the full-resolution image
+        const imageUrl = `/documents/${currentDocumentId}/image`;
+        const img = new Image();
+        img.alt = 'Document Image';
+        img.className = 'img-fluid';
+        img.onload = () => {
+            const container = document.createElement('div');
+            container.className = 'img-container';
+            container.appendChild(img);
+            container.insertAdjacentHTML('beforeend', `
+                <div class="image-controls mt-2">
+                    <div class="form-check form-switch">
+                        <input class="form-check-input toggle-fit" type="checkbox" id="toggleDocumentFit" checked>
+                        <label class="form-check-label" for="toggleDocumentFit">Fit to view</label>
                     </div>
-                `;
-            });
+                </div>
+                <div class="mt-2 text-muted small">
+                    <i class="bi bi-info-circle"></i> Image path: ${imagePath}
+                </div>
+            `);
+            documentImage.innerHTML = '';
+            documentImage.appendChild(container);
+            img.onload = null;
+            
+            // Add toggle functionality
+            const toggleFit = document.getElementById('toggleDocumentFit');
+            if (toggleFit) {
+                toggleFit.addEventListener('change', function() {
+                    if (this.checked) {
+                        container.classList.remove('actual-size');
+                    } else {
+                        container.classList.add('actual-size');
+                        img.src = imageUrl;
+                    }
+                });
+            }
+        };
+        img.onerror = () => {
+            documentImage.innerHTML = `
+                <div class="alert alert-warning">
+                    <i class="bi bi-exclamation-triangle"></i> 
+                    Could not load image
+                    <br>
+                    <small>Path: ${imagePath}</small>
+                </div>
+            `;
+        };
+        img.src = `${imageUrl}?size=preview`;
     }
     
     // Display document text items
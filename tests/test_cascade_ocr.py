@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+
+import cascade_ocr  # noqa: E402
+
+
+class FakeTableDetector:
+    """Stands in for TableDetector: takes a list of images, returns one object list per image."""
+
+    def __init__(self):
+        self.calls = []
+
+    def detect(self, images):
+        images = list(images)
+        self.calls.append(images)
+        return [[{'label': 'table', 'score': 0.9, 'bbox': [10.0, 20.0, 110.0, 220.0]},
+                 {'label': 'table rotated', 'score': 0.6, 'bbox': [5.0, 5.0, 50.0, 50.0]}]
+                for _ in images]
+
+
+@pytest.fixture
+def table_detector(monkeypatch):
+    detector = FakeTableDetector()
+    monkeypatch.setattr(cascade_ocr, '_get_table_detector', lambda: detector)
+    return detector
+
+
+def test_table_detector_regions(table_detector):
+    img = np.full((300, 200, 3), 255, np.uint8)
+    regions = cascade_ocr._detector_regions(img, 'table')
+    assert len(table_detector.calls) == 1 and len(table_detector.calls[0]) == 1
+    assert [r['label'] for r in regions] == ['table', 'table rotated']
+    assert regions[0]['bbox'] == [10.0, 20.0, 110.0, 220.0]
+
+
+def test_propose_regions_with_table(table_detector):
+    img = np.full((300, 200, 3), 255, np.uint8)
+    assert cascade_ocr.propose_regions(img, 'table') == [[10.0, 20.0, 110.0, 220.0], [5.0, 5.0, 50.0, 50.0]]
+    merged = cascade_ocr.propose_regions(img, ['table', lambda _: [[12, 22, 108, 218]]])
+    assert [10.0, 20.0, 110.0, 220.0] in merged and len(merged) == 2
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_preprocess import find_document_corners, order_points
+
+PAGE = np.array([[412, 287], [2561, 371], [2688, 3602], [297, 3498]], dtype=np.float32)
+
+
+@pytest.fixture
+def warped_page():
+    """A ruled white page warped onto a dark background, large enough to take the downscaled path."""
+    page = np.full((2970, 2100, 3), 245, np.uint8)
+    for y in range(200, 2800, 90):
+        cv2.line(page, (150, y), (1950, y), (60, 60, 60), 3)
+    src = np.array([[0, 0], [2099, 0], [2099, 2969], [0, 2969]], dtype=np.float32)
+    M = cv2.getPerspectiveTransform(src, PAGE)
+    background = np.full((3900, 3000, 3), 40, np.uint8)
+    return cv2.warpPerspective(page, M, (3000, 3900), dst=background, borderMode=cv2.BORDER_TRANSPARENT)
+
+
+def test_downscaled_corners_match_full_resolution(warped_page):
+    full = find_document_corners(warped_page, scale=1.0)
+    fast = find_document_corners(warped_page, scale=None)
+    assert full is not None and fast is not None
+    full, fast = order_points(full.astype(np.float32)), order_points(fast)
+    assert np.abs(full - fast).max() <= 1.0
+    assert np.abs(fast - PAGE).max() <= 1.0
+
+
+def test_small_images_skip_downscaling(warped_page):
+    small = cv2.resize(warped_page, (750, 975), interpolation=cv2.INTER_AREA)
+    np.testing.assert_array_equal(find_document_corners(small, scale=None), find_document_corners(small))
+
+
+def quad_frame(dx):
+    """A bright page on a dark table, shifted right by `dx` pixels; corners in reorder() order."""
+    corners = np.float32([[98, 120], [380, 110], [90, 540], [395, 530]]) + [dx, 0]
+    frame = np.full((640, 480), 40, np.uint8)
+    cv2.fillConvexPoly(frame, np.int32(np.round(corners[[0, 1, 3, 2]] * 16)), 230, cv2.LINE_AA, shift=4)
+    return frame, corners
+
+
+@pytest.mark.parametrize('speed', [0.5, 1, 2])
+def test_tracker_follows_slow_drift(speed):
+    from Doc_Scanner_Static import CornerTracker
+    tracker = CornerTracker()
+    frame, corners = quad_frame(0)
+    tracker.lock(frame, corners)
+    for n in range(1, 41):
+        frame, corners = quad_frame(n * speed)
+        tracked = tracker.track(frame)
+        assert tracked is not None, f"lost the page at frame {n}"
+        assert np.abs(tracked.reshape(4, 2) - corners).max() <= 2.5, f"drifted at frame {n}"
@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_delivery import ImageDelivery, load_token_secret
+from ocr_cache import ResultCache
+
+
+@pytest.fixture
+def image_root(tmp_path):
+    root = tmp_path / 'uploads'
+    root.mkdir()
+    cv2.imwrite(str(root / 'scan.jpg'), np.full((600, 400, 3), 180, np.uint8))
+    return root
+
+
+def make_delivery(tmp_path, root):
+    return ImageDelivery(cache=ResultCache(str(tmp_path / 'cache')), roots=[str(root)],
+                         secret=load_token_secret(str(tmp_path / 'token.key')))
+
+
+def test_file_tokens_survive_a_restart(tmp_path, image_root):
+    token = make_delivery(tmp_path, image_root).register_file(str(image_root / 'scan.jpg'))
+    # A new instance (another worker, or after a restart) has no state but the key file
+    rendition = make_delivery(tmp_path, image_root).get(token, 'thumb')
+    assert rendition is not None
+    assert cv2.imdecode(np.frombuffer(rendition.data, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (320, 213)
+
+
+def test_file_tokens_are_checked(tmp_path, image_root):
+    delivery = make_delivery(tmp_path, image_root)
+    token = delivery.register_file(str(image_root / 'scan.jpg'))
+    prefix, encoded, signature = token.split('.')
+    assert delivery.etag(f"{prefix}.{encoded}.{'0' * len(signature)}") is None
+    other = ImageDelivery(cache=delivery.cache, roots=[str(image_root)], secret='another key')
+    assert other.etag(token) is None
+    (tmp_path / 'secret.jpg').write_bytes((image_root / 'scan.jpg').read_bytes())
+    with pytest.raises(ValueError):
+        delivery.register_file(str(tmp_path / 'secret.jpg'))
@@ -0,0 +1,113 @@
+import json
+import sys
+import threading
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+try:
+    import paddleocr  # noqa: F401
+except ImportError:
+    # Just enough of the package for paddle_OCR_detection to import; the engine is replaced below
+    sys.modules['paddleocr'] = types.SimpleNamespace(PPStructure=None, draw_structure_result=None,
+                                                     save_structure_res=None)
+
+import ocr_cache  # noqa: E402
+import paddle_OCR_detection  # noqa: E402
+
+try:
+    from paddleocr.ppstructure.predict_system import StructureSystem
+except ImportError:
+    StructureSystem = None
+
+
+def reference_structure_call(engine, img, return_ocr_result_in_table=False, img_idx=0):
+    """StructureSystem.__call__ in structure mode (paddleocr 2.7), trimmed to what the fake engine uses."""
+    ori_im = img.copy()
+    h, w = ori_im.shape[:2]
+    layout_res, _ = engine.layout_predictor(img)
+    res_list = []
+    for region in layout_res:
+        res = ''
+        x1, y1, x2, y2 = [int(v) for v in region['bbox']]
+        roi_img = ori_im[y1:y2, x1:x2, :]
+        if region['label'] == 'table':
+            if engine.table_system is not None:
+                res, _ = engine.table_system(roi_img, return_ocr_result_in_table)
+        else:
+            filter_boxes, filter_rec_res, _ = engine.text_system(roi_img)
+            res = []
+            for box, (rec_str, rec_conf) in zip(filter_boxes, filter_rec_res):
+                rec_str = rec_str.replace('<b>', '').replace('</b>', '')
+                box += [x1, y1]
+                res.append({'text': rec_str, 'confidence': float(rec_conf), 'text_region': box.tolist()})
+        res_list.append({'type': region['label'].lower(), 'bbox': [x1, y1, x2, y2], 'img': roi_img,
+                         'res': res, 'img_idx': img_idx})
+    return res_list, {}
+
+
+class FakeStructureEngine:
+    """A PPStructure with stand-in models: two text regions and a table, fixed OCR output per crop."""
+
+    mode = 'structure'
+    image_orientation_predictor = None
+    recovery = False
+
+    def __init__(self, with_table_model):
+        self.table_system = self._table if with_table_model else None
+
+    def layout_predictor(self, img):
+        return [{'bbox': np.array([10.0, 12.0, 150.0, 60.0]), 'label': 'title'},
+                {'bbox': np.array([10.0, 70.0, 190.0, 140.0]), 'label': 'table'},
+                {'bbox': np.array([20.5, 150.0, 180.0, 190.0]), 'label': 'text'}], 0.0
+
+    def text_system(self, roi_img):
+        h, w = roi_img.shape[:2]
+        boxes = [np.array([[1, 2], [w - 3, 2], [w - 3, h - 4], [1, h - 4]], dtype=np.float32)]
+        return boxes, [(f"<b>crop</b> {w}x{h}", np.float32(0.875))], {'det': 0.0, 'rec': 0.0}
+
+    def _table(self, roi_img, return_ocr_result_in_table=False):
+        return {'html': f"<table><tr><td>{roi_img.shape[1]}</td></tr></table>"}, \
+            {'table': 0.0, 'match': 0.0, 'det': 0.0, 'rec': 0.0}
+
+    def __call__(self, img):
+        call = StructureSystem.__call__ if StructureSystem is not None else reference_structure_call
+        return call(self, img)[0]
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = str(tmp_path / 'page.jpg')
+    cv2.imwrite(path, np.full((200, 200, 3), 230, np.uint8))
+    return path
+
+
+@pytest.fixture
+def ocr_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(ocr_cache._CACHES, 'ocr', ocr_cache.ResultCache(str(tmp_path / 'cache')))
+
+
+@pytest.mark.parametrize('with_table_model', [True, False])
+def test_streaming_matches_full_page_call(page, tmp_path, monkeypatch, with_table_model):
+    engine = FakeStructureEngine(with_table_model)
+    monkeypatch.setattr(paddle_OCR_detection, 'get_engine', lambda **kw: (engine, threading.Lock()))
+    batch = paddle_OCR_detection.run_paddle_ocr(page, str(tmp_path / 'batch'), use_cache=False)
+    events = list(paddle_OCR_detection.iter_paddle_ocr(page, str(tmp_path / 'stream'), use_cache=False))
+    assert events[-1]['items'] == batch
+    with open(tmp_path / 'batch' / 'page' / 'res_0.json') as f, \
+            open(tmp_path / 'stream' / 'page' / 'res_0.json') as g:
+        assert json.load(f) == json.load(g)
+    regions = [event['region'] for event in events[:-1]]
+    assert [r['img_idx'] for r in regions] == [0, 0, 0]
+    assert regions[1]['res'] == ({'html': '<table><tr><td>180</td></tr></table>'} if with_table_model else '')
+
+
+def test_streaming_and_batch_results_are_cached_apart(page, tmp_path, monkeypatch, ocr_cache_dir):
+    engine = FakeStructureEngine(True)
+    monkeypatch.setattr(paddle_OCR_detection, 'get_engine', lambda **kw: (engine, threading.Lock()))
+    list(paddle_OCR_detection.iter_paddle_ocr(page))
+    paddle_OCR_detection.run_paddle_ocr(page, str(tmp_path / 'out'))
+    assert ocr_cache.get_cache('ocr').stats()['entries'] == 2
+    assert list(paddle_OCR_detection.iter_paddle_ocr(page))[-1]['cached']
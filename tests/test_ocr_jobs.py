@@ -0,0 +1,106 @@
+import base64
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr_jobs import JobQueue, QueueFull, process_image_response
+
+
+@pytest.fixture
+def job_result(tmp_path):
+    original = str(tmp_path / 'upload.jpg')
+    annotated = str(tmp_path / 'upload_processed' / 'result.jpg')
+    cv2.imwrite(original, np.full((40, 60, 3), 200, np.uint8))
+    (tmp_path / 'upload_processed').mkdir()
+    cv2.imwrite(annotated, np.full((40, 60, 3), 50, np.uint8))
+    return {'ocr_results': [{'text': 'Data', 'confidence': 0.9}], 'regions': 1,
+            'original_image_path': original, 'processed_image_path': original,
+            'annotated_image_path': annotated, 'result_path': None, 'elapsed': 0.1}
+
+
+def test_process_image_response_base64(job_result):
+    data = process_image_response(job_result)
+    assert data['success'] and data['ocr_results'] == job_result['ocr_results']
+    with open(job_result['annotated_image_path'], 'rb') as f:
+        assert base64.b64decode(data['image']) == f.read()
+    assert data['original_image']
+
+
+def test_process_image_response_urls(job_result, tmp_path):
+    from image_delivery import ImageDelivery
+    from ocr_cache import ResultCache
+    delivery = ImageDelivery(cache=ResultCache(str(tmp_path / 'cache')), roots=[str(tmp_path)],
+                             secret='test')
+    data = process_image_response(job_result, delivery)
+    assert data['image_url'].startswith('/images/') and data['original_image_url'].startswith('/images/')
+    assert 'image' not in data and 'original_image' not in data
+
+
+def test_queue_rejects_when_full():
+    queue = JobQueue(workers=1, max_queue=1)
+    try:
+        jobs = [queue.submit(lambda progress: time.sleep(0.2)) for _ in range(2)]
+        assert queue.check_capacity() is not None
+        with pytest.raises(QueueFull):
+            queue.submit(lambda progress: None)
+        for job in jobs:
+            job.wait(10 ** 9, timeout=5)
+        assert queue.check_capacity() is None
+    finally:
+        queue.shutdown()
+
+
+def test_failed_job_keeps_traceback():
+    queue = JobQueue(workers=1, max_queue=1)
+    try:
+        job = queue.submit(lambda progress: 1 / 0)
+        job.wait(10 ** 9, timeout=5)
+        assert job.state == 'failed' and 'division' in job.error
+        assert 'ZeroDivisionError' in job.traceback
+        assert 'traceback' not in job.to_dict()
+    finally:
+        queue.shutdown()
+
+
+def test_finished_jobs_expire_behind_a_running_job():
+    queue = JobQueue(workers=2, max_queue=2, ttl=0)
+    release = threading.Event()
+    try:
+        stuck = queue.submit(lambda progress: release.wait(5))
+        finished = queue.submit(lambda progress: 'ok')
+        finished.wait(10 ** 9, timeout=5)
+        queue.submit(lambda progress: None).wait(10 ** 9, timeout=5)
+        assert queue.get(finished.id) is None
+        assert queue.get(stuck.id) is stuck
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_job_keeps_paths_and_builds_images_on_request(job_result):
+    queue = JobQueue(workers=1, max_queue=1)
+    try:
+        job = queue.submit(lambda progress: job_result)
+        job.wait(10 ** 9, timeout=5)
+        assert 'image' not in job.result
+        data = job.to_dict(build_result=process_image_response)
+        assert data['result']['image'] and data['result']['original_image']
+    finally:
+        queue.shutdown()
+
+
+@pytest.mark.parametrize('concurrency, expected', [(1, 20), (2, 10)])
+def test_retry_after_uses_concurrency(concurrency, expected):
+    queue = JobQueue(workers=2, max_queue=1, concurrency=concurrency)
+    release = threading.Event()
+    try:
+        queue._durations = [10.0]
+        for _ in range(3):
+            queue.submit(lambda progress: release.wait(5))
+        assert queue.check_capacity() == expected
+    finally:
+        release.set()
+        queue.shutdown()
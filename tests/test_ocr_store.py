@@ -0,0 +1,36 @@
+import pytest
+
+import ocr_store
+from ocr_store import OCRStore
+
+
+def text_items(*texts):
+    return [{'text': text, 'confidence': 0.9, 'is_handwritten': False, 'text_region': [[0, 0], [1, 1]]}
+            for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OCRStore(str(tmp_path / 'ocr.db'))
+    yield store
+    store.close()
+
+
+def test_last_word_matches_as_prefix_even_when_indexed(store):
+    store.save_document(text_items('nome do paciente', 'pa', 'data de retorno'), 'ficha')
+    results, _, _ = store.search('pa')
+    assert sorted(r['text'] for r in results) == ['nome do paciente', 'pa']
+    results, _, _ = store.search('pa', prefix=False)
+    assert [r['text'] for r in results] == ['pa']
+
+
+def test_search_reports_matches_outside_the_rank_window(store, monkeypatch):
+    monkeypatch.setattr(ocr_store, 'RANK_WINDOW', 3)
+    store.save_document(text_items(*(f'controle {n}' for n in range(5))), 'ficha')
+    first, has_more, truncated = store.search('controle', limit=2)
+    assert len(first) == 2 and has_more and truncated
+    second, has_more, truncated = store.search('controle', limit=2, page=2)
+    assert len(second) == 1 and not has_more and truncated
+    # Only the three newest matches are ranked
+    assert sorted(r['text'] for r in first + second) == ['controle 2', 'controle 3', 'controle 4']
+    assert store.search('controle 4')[2] is False
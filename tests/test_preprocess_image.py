@@ -0,0 +1,19 @@
+import cv2
+import numpy as np
+import pytest
+
+import ocr_cache
+from image_preprocess import preprocess_image
+
+
+@pytest.mark.parametrize('ext', ['.jpg', '.png'])
+def test_cache_hit_and_miss_return_the_same_pixels(tmp_path, monkeypatch, ext):
+    monkeypatch.setitem(ocr_cache._CACHES, 'preprocess', ocr_cache.ResultCache(str(tmp_path / 'cache')))
+    rng = np.random.default_rng(0)
+    source = str(tmp_path / 'scan.png')
+    cv2.imwrite(source, rng.integers(0, 255, (120, 90, 3), dtype=np.uint8))
+    output = str(tmp_path / 'out' / f'scan{ext}')
+    miss = preprocess_image(source, output)
+    hit = preprocess_image(source, output)
+    np.testing.assert_array_equal(miss, hit)
+    np.testing.assert_array_equal(miss, cv2.imread(output))
@@ -31,7 +31,6 @@ def stackImages(imgArray,scale,lables=[]):
     if len(lables) != 0:
         eachImgWidth= int(ver.shape[1] / cols)
         eachImgHeight = int(ver.shape[0] / rows)
-        print(eachImgHeight)
         for d in range(0, rows):
             for c in range (0,cols):
                 cv2.rectangle(ver,(c*eachImgWidth,eachImgHeight*d),(c*eachImgWidth+len(lables[d])*13+27,30+eachImgHeight*d),(255,255,255),cv2.FILLED)
@@ -53,18 +52,19 @@ def reorder(myPoints):
     return myPointsNew
  
  
-def biggestContour(contours):
-    biggest = np.array([])
-    max_area = 0
-    for i in contours:
-        area = cv2.contourArea(i)
-        if area > 5000:
-            peri = cv2.arcLength(i, True)
-            approx = cv2.approxPolyDP(i, 0.02 * peri, True)
-            if area > max_area and len(approx) == 4:
-                biggest = approx
-                max_area = area
-    return biggest,max_area
+def biggestContour(contours, min_area=5000):
+    # Largest first: the first 4-corner contour is the answer, and nothing
+    # below min_area needs arcLength/approxPolyDP at all
+    areas = [cv2.contourArea(i) for i in contours]
+    for idx in sorted(range(len(contours)), key=areas.__getitem__, reverse=True):
+        area = areas[idx]
+        if area <= min_area:
+            break
+        peri = cv2.arcLength(contours[idx], True)
+        approx = cv2.approxPolyDP(contours[idx], 0.02 * peri, True)
+        if len(approx) == 4:
+            return approx, area
+    return np.array([]), 0
 def drawRectangle(img,biggest,thickness):
     cv2.line(img, (biggest[0][0][0], biggest[0][0][1]), (biggest[1][0][0], biggest[1][0][1]), (0, 255, 0), thickness)
     cv2.line(img, (biggest[0][0][0], biggest[0][0][1]), (biggest[2][0][0], biggest[2][0][1]), (0, 255, 0), thickness)